@@ -0,0 +1,70 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the cold-start time of importing text2array.
+
+Every statement is run in a fresh interpreter several times, and the best wall time is
+reported along with the heavy third-party modules it ended up importing. Run it with::
+
+    python benchmarks/import_time.py
+"""
+
+from typing import List, Tuple
+import argparse
+import json
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import text2array",
+    "from text2array import StringStore",
+    "from text2array import Vocab",
+    "from text2array import Batch",
+    "from text2array import BucketIterator",
+]
+HEAVY_MODULES = ["numpy", "tqdm", "ordered_set"]
+
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+exec({stmt!r})
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def measure(stmt: str, repeat: int = 5) -> Tuple[float, List[str]]:
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        script = _SCRIPT.format(stmt=stmt, heavy=HEAVY_MODULES)
+        out = subprocess.run(
+            [sys.executable, "-c", script], check=True, stdout=subprocess.PIPE
+        ).stdout
+        elapsed, loaded = json.loads(out)
+        best = min(best, elapsed)
+    return best, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="runs per statement")
+    args = parser.parse_args()
+
+    for stmt in STATEMENTS:
+        best, loaded = measure(stmt, args.repeat)
+        print(f"{stmt:<40} {best * 1000:8.1f} ms  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure how padding nested fields with `Batch.to_array` scales.
+
+Random batches are made for every combination of batch size and nesting depth, and each
+is converted both by `Batch.to_array` and by the recursive padding algorithm it used to
+have, which is kept here for reference. The outputs are checked to be equal, and the best
+wall time of each per conversion, in microseconds, is reported along with the number of
+values in the batch. Small batches, e.g. the single samples of online inference, are
+converted many times in a row so that their times are measurable. With text2array
+installed, run it with::
+
+    python benchmarks/to_array_scaling.py
+
+Combinations for which the old algorithm is slower than ``--max-seconds`` are not
+repeated, and larger batches of the same depth skip it altogether.
+"""
+
+from functools import reduce
+from random import Random
+from typing import Any, List, Optional, Sequence, Tuple
+import argparse
+import time
+
+import numpy as np  # type: ignore
+
+from text2array import Batch
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+DEPTHS = [1, 2, 3, 4]
+# Maximum sequence length at every level, per depth, so that samples have tens of values
+MAX_LENS = {1: 64, 2: 12, 3: 6, 4: 4}
+
+
+def make_value(rng: Random, depth: int, max_len: int) -> Any:
+    if depth == 0:
+        return rng.randrange(1000)
+    return [make_value(rng, depth - 1, max_len) for _ in range(rng.randint(1, max_len))]
+
+
+def count_leaves(value: Any) -> int:
+    if not isinstance(value, list):
+        return 1
+    return sum(count_leaves(v) for v in value)
+
+
+def old_to_array(values: Sequence[Any], pad: int = 0) -> Tuple[np.ndarray, List[np.ndarray]]:
+    maxlens = _old_get_maxlens(values)
+    paddings = _old_get_paddings(maxlens, pad)
+    lens = [np.zeros(maxlens[:d], dtype=int) for d in range(1, len(maxlens))]
+    return np.array(_old_pad(values, maxlens, paddings, 0, lens)), lens
+
+
+def _old_get_maxlens(values: Sequence[Any]) -> List[int]:
+    if not isinstance(values[0], list):
+        return [len(values)]
+    maxlenss = [_old_get_maxlens(x) for x in values]
+    maxlens = reduce(lambda ml1, ml2: [max(l1, l2) for l1, l2 in zip(ml1, ml2)], maxlenss)
+    maxlens.insert(0, len(values))
+    return maxlens
+
+
+def _old_get_paddings(maxlens: List[int], with_: int) -> List[Any]:
+    res: list = [with_]
+    for maxlen in reversed(maxlens[1:]):
+        res.append([res[-1] for _ in range(maxlen)])
+    res.reverse()
+    return res
+
+
+def _old_pad(
+    values: Sequence[Any],
+    maxlens: List[int],
+    paddings: List[Any],
+    depth: int,
+    lens: List[np.ndarray],
+    index: Tuple[int, ...] = (),
+) -> List[Any]:
+    if depth > 0:
+        lens[depth - 1][index] = len(values)
+    if depth == len(maxlens) - 1:
+        values_ = list(values)
+    else:
+        values_ = [
+            _old_pad(x, maxlens, paddings, depth + 1, lens, index + (i,))
+            for i, x in enumerate(values)
+        ]
+    for _ in range(maxlens[depth] - len(values)):
+        values_.append(paddings[depth])
+    return values_
+
+
+def best_time(fn: Any, repeat: int, min_seconds: float = 0.01) -> Tuple[float, Any]:
+    # Time runs of as many calls as take at least min_seconds, as timeit does
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            res = fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+        number *= 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            res = fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best, res
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="runs per combination")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=30.0,
+        help="skip the old algorithm for larger batches once it takes longer than this",
+    )
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=BATCH_SIZES, help="batch sizes"
+    )
+    parser.add_argument("--depths", type=int, nargs="+", default=DEPTHS, help="depths")
+    args = parser.parse_args()
+
+    rng = Random(args.seed)
+    fmt = "{:>5} {:>7} {:>10} {:>13} {:>13} {:>8}"
+    print(fmt.format("depth", "batch", "values", "new (us)", "old (us)", "speedup"))
+    for depth in args.depths:
+        skip_old = False
+        for bsz in args.batch_sizes:
+            max_len = MAX_LENS.get(depth, 3)
+            samples = [{"x": make_value(rng, depth, max_len)} for _ in range(bsz)]
+            batch = Batch(samples)
+            nvalues = sum(count_leaves(s["x"]) for s in samples)
+
+            new, res = best_time(lambda: batch.to_array(with_lengths=True), args.repeat)
+            old: Optional[float] = None
+            if not skip_old:
+                values = [s["x"] for s in samples]
+                old, (data, lens) = best_time(lambda: old_to_array(values), 1)
+                if old <= args.max_seconds:
+                    old, (data, lens) = best_time(lambda: old_to_array(values), args.repeat)
+                else:
+                    skip_old = True
+                assert data.dtype == res["x"].dtype and np.array_equal(data, res["x"])
+                for d, ls in enumerate(lens, 1):
+                    assert np.array_equal(ls, res[f"x_len{d}"])
+
+            old_s = "-" if old is None else f"{old * 1e6:.1f}"
+            speedup = "-" if old is None else f"{old / new:.1f}x"
+            print(fmt.format(depth, bsz, nvalues, f"{new * 1e6:.1f}", old_s, speedup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+
+import pytest
+
+from text2array import AsyncBatchIterator, AsyncBucketIterator, Batch, MicroBatcher
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def source(samples):
+    for s in samples:
+        await asyncio.sleep(0)
+        yield s
+
+
+async def collect(aiterable):
+    return [x async for x in aiterable]
+
+
+class TestAsyncBatchIterator:
+    def test_ok(self):
+        ss = [{"i": i} for i in range(5)]
+        iter_ = AsyncBatchIterator(source(ss), batch_size=2)
+        assert iter_.batch_size == 2
+
+        bs = run(collect(iter_))
+        assert all(isinstance(b, Batch) for b in bs)
+        assert [list(b) for b in bs] == [ss[:2], ss[2:4], ss[4:]]
+
+    def test_convert(self):
+        ss = [{"is": list(range(i + 1))} for i in range(5)]
+        threads = set()
+
+        def convert(b):
+            threads.add(threading.get_ident())
+            return b.to_array()
+
+        with ThreadPoolExecutor(2) as executor:
+            iter_ = AsyncBatchIterator(
+                source(ss), batch_size=2, convert=convert, executor=executor, max_pending=3
+            )
+            arrs = run(collect(iter_))
+
+        assert threading.get_ident() not in threads
+        assert [a["is"].tolist() for a in arrs] == [
+            [[0, 0], [0, 1]],
+            [[0, 1, 2, 0], [0, 1, 2, 3]],
+            [[0, 1, 2, 3, 4]],
+        ]
+
+    def test_stop_early(self):
+        ss = [{"i": i} for i in range(5)]
+        iter_ = AsyncBatchIterator(source(ss), convert=Batch.to_array, max_pending=3)
+
+        async def first():
+            it = iter_.__aiter__()
+            arr = await it.__anext__()
+            await it.aclose()
+            return arr
+
+        assert run(first())["i"].tolist() == [0]
+
+    @pytest.mark.parametrize(
+        "kwargs,msg",
+        [
+            (dict(batch_size=0), "batch size must be greater than 0"),
+            (dict(max_pending=0), "max pending must be greater than 0"),
+        ],
+    )
+    def test_invalid_args(self, kwargs, msg):
+        with pytest.raises(ValueError) as exc:
+            AsyncBatchIterator(source([]), **kwargs)
+        assert msg in str(exc.value)
+
+
+class TestAsyncBucketIterator:
+    def test_ok(self):
+        ss = [{"ws": ["a"] * n} for n in [1, 2, 1, 1, 2]]
+        key = lambda s: len(s["ws"])
+        iter_ = AsyncBucketIterator(source(ss), key, batch_size=2)
+        assert iter_.batch_size == 2
+
+        bs = run(collect(iter_))
+        assert [[key(s) for s in b] for b in bs] == [[1, 1], [1], [2, 2]]
+
+    def test_convert(self):
+        ss = [{"ws": [1] * n} for n in [1, 2, 1, 1, 2]]
+        iter_ = AsyncBucketIterator(
+            source(ss), lambda s: len(s["ws"]), batch_size=2, convert=Batch.to_array
+        )
+        arrs = run(collect(iter_))
+        assert [a["ws"].shape for a in arrs] == [(2, 1), (1, 1), (2, 2)]
+
+    def test_invalid_max_pending(self):
+        with pytest.raises(ValueError) as exc:
+            AsyncBucketIterator(source([]), len, max_pending=0)
+        assert "max pending must be greater than 0" in str(exc.value)
+
+
+class TestMicroBatcher:
+    def test_batch_size(self):
+        batches = []
+
+        def process(b):
+            batches.append(list(b))
+            return [s["i"] * 10 for s in b]
+
+        async def main():
+            async with MicroBatcher(process, batch_size=2) as batcher:
+                assert batcher.batch_size == 2
+                return await asyncio.gather(*(batcher.submit({"i": i}) for i in range(5)))
+
+        assert run(main()) == [0, 10, 20, 30, 40]
+        assert batches == [[{"i": 0}, {"i": 1}], [{"i": 2}, {"i": 3}], [{"i": 4}]]
+
+    def test_mapping_result(self):
+        async def main():
+            batcher = MicroBatcher(Batch.to_array, batch_size=2)
+            res = await asyncio.gather(
+                batcher.submit({"is": [1]}), batcher.submit({"is": [2, 3]})
+            )
+            await batcher.close()
+            return res
+
+        res = run(main())
+        assert [r["is"].tolist() for r in res] == [[1, 0], [2, 3]]
+
+    def test_max_delay(self):
+        batches = []
+
+        def process(b):
+            batches.append(len(b))
+            return list(b)
+
+        async def main():
+            batcher = MicroBatcher(process, batch_size=10, max_delay=0.01)
+            first = asyncio.ensure_future(batcher.submit({"i": 0}))
+            await asyncio.sleep(0.1)
+            second = await batcher.submit({"i": 1})
+            return await first, second
+
+        assert run(main()) == ({"i": 0}, {"i": 1})
+        assert batches == [1, 1]
+
+    def test_key(self):
+        batches = []
+
+        def process(b):
+            batches.append([s["n"] for s in b])
+            return list(b)
+
+        async def main():
+            key = lambda s: s["n"] // 10
+            async with MicroBatcher(process, batch_size=2, key=key) as batcher:
+                await asyncio.gather(*(batcher.submit({"n": n}) for n in [1, 11, 2, 12, 3]))
+
+        run(main())
+        assert batches == [[1, 2], [11, 12], [3]]
+
+    def test_max_tokens(self):
+        batches = []
+
+        def process(b):
+            batches.append([len(s["ws"]) for s in b])
+            return list(b)
+
+        async def main():
+            async with MicroBatcher(
+                process, batch_size=10, max_tokens=6, length=lambda s: len(s["ws"])
+            ) as batcher:
+                ss = [{"ws": [0] * n} for n in [1, 2, 3, 7, 2]]
+                await asyncio.gather(*(batcher.submit(s) for s in ss))
+
+        run(main())
+        assert batches == [[1, 2], [3], [7], [2]]
+
+    def test_error(self):
+        def process(b):
+            raise RuntimeError("foo")
+
+        async def main():
+            async with MicroBatcher(process, batch_size=2) as batcher:
+                return await asyncio.gather(
+                    batcher.submit({"i": 0}), batcher.submit({"i": 1}), return_exceptions=True
+                )
+
+        res = run(main())
+        assert all(isinstance(r, RuntimeError) for r in res)
+
+    @pytest.mark.parametrize(
+        "kwargs,msg",
+        [
+            (dict(batch_size=0), "batch size must be greater than 0"),
+            (dict(max_tokens=10), "length must be given if max_tokens is given"),
+            (dict(max_delay=-1), "max delay cannot be less than 0"),
+        ],
+    )
+    def test_invalid_args(self, kwargs, msg):
+        with pytest.raises(ValueError) as exc:
+            MicroBatcher(list, **kwargs)
+        assert msg in str(exc.value)
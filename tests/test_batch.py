@@ -3,7 +3,7 @@ from typing import Mapping, MutableSequence
 import numpy as np  # type: ignore
 import pytest
 
-from text2array import Batch
+from text2array import Batch, FieldSchema, Schema, StringStore, Vocab
 
 
 def test_init(samples):
@@ -14,6 +14,116 @@ def test_init(samples):
         assert b[i] == samples[i]
 
 
+def test_init_iterable(samples):
+    b = Batch(iter(samples))
+    assert len(b) == len(samples)
+    assert b == samples
+
+
+def test_slots(samples):
+    b = Batch(samples)
+    assert not hasattr(b, "__dict__")
+
+
+def test_mutate(samples):
+    b = Batch(samples)
+    b.append({"i": 5})
+    b[0] = {"i": -1}
+    del b[1]
+    assert b == [{"i": -1}, *samples[2:], {"i": 5}]
+    assert len(samples) == 5
+
+
+def test_slice(samples):
+    b = Batch(samples)
+    assert isinstance(b[1:3], Batch)
+    assert b[1:3] == samples[1:3]
+
+
+def test_list_methods(samples):
+    b = Batch(samples)
+    assert b.data == samples
+    b.data.append({"i": 5})
+    assert len(b) == len(samples) + 1
+    b.data = [{"i": 0}]
+    assert b == [{"i": 0}]
+    b.data = [*samples, {"i": 5}]
+
+    b.sort(key=lambda s: -s["i"])
+    assert [s["i"] for s in b] == [5, 4, 3, 2, 1, 0]
+
+    c = b.copy()
+    assert isinstance(c, Batch) and c == b
+    c.pop()
+    assert len(b) == 6
+
+    assert isinstance(b[:1] + b[1:2], Batch)
+    assert b[:1] + b[1:2] == [b[0], b[1]]
+    assert isinstance([{"i": 9}] + b[:1], Batch)
+    assert [{"i": 9}] + b[:1] == [{"i": 9}, b[0]]
+    assert b[:1] * 2 == 2 * b[:1] == [b[0], b[0]]
+
+    c = b[:2]
+    c += c
+    assert c == [b[0], b[1], b[0], b[1]]
+    c *= 2
+    assert len(c) == 8
+
+
+class TestView:
+    def test_ok(self, samples):
+        b = Batch.view(samples, 1, 3)
+        assert isinstance(b, Batch)
+        assert len(b) == 2
+        assert b == samples[1:3]
+        assert list(b) == samples[1:3]
+        assert b[-1] is samples[2]
+        assert b[::-1] == [samples[2], samples[1]]
+
+    def test_out_of_range(self, samples):
+        b = Batch.view(samples, 3, 10)
+        assert b == samples[3:]
+
+    def test_sees_source_changes(self, samples):
+        b = Batch.view(samples, 0, 2)
+        samples[0] = {"i": -1}
+        assert b[0] == {"i": -1}
+
+    def test_copy_on_write(self, samples):
+        orig = list(samples)
+        b = Batch.view(samples, 0, 2)
+        b.append({"i": 5})
+        b[0] = {"i": -1}
+        assert samples == orig
+        assert b == [{"i": -1}, samples[1], {"i": 5}]
+
+    def test_set_data(self, samples):
+        b = Batch.view(samples, 1, 3)
+        b.data = [{"i": 9}]
+        assert b == [{"i": 9}]
+        assert len(samples) == 5
+
+    def test_list_methods(self, samples):
+        orig = list(samples)
+        b = Batch.view(samples, 0, 3)
+        assert b + b == orig[:3] * 2
+        b.sort(key=lambda s: -s["i"])
+        assert b == orig[2::-1]
+        assert samples == orig
+
+    def test_pickle(self, samples):
+        import pickle
+
+        b = pickle.loads(pickle.dumps(Batch.view(samples, 1, 3)))
+        assert b == samples[1:3]
+        assert b._range is None
+        assert len(b._source) == 2
+
+    def test_to_array(self, samples):
+        arr = Batch.view(samples, 1, 3).to_array()
+        assert arr["i"].tolist() == [1, 2]
+
+
 class TestToArray:
     def test_ok(self):
         ss = [
@@ -172,3 +282,257 @@ class TestToArray:
         arr = b.to_array()
         assert isinstance(arr["w"], np.ndarray)
         assert arr["w"].tolist() == ["a", "b"]
+
+    def test_max_len(self):
+        ss = [{"is": [1, 2, 3, 4]}, {"is": [1]}]
+        b = Batch(ss)
+        arr = b.to_array(max_len={"is": 2})
+        assert arr["is"].tolist() == [[1, 2], [1, 0]]
+
+    def test_max_len_nested(self):
+        ss = [{"iss": [[1, 2, 3, 4, 5], [1]], "is": [1, 2, 3]}, {"iss": [[1, 2]], "is": [1]}]
+        b = Batch(ss)
+        arr = b.to_array(max_len={"iss": [None, 3]})
+        assert arr["iss"].shape == (2, 2, 3)
+        assert arr["iss"].tolist() == [[[1, 2, 3], [1, 0, 0]], [[1, 2, 0], [0, 0, 0]]]
+        assert arr["is"].tolist() == [[1, 2, 3], [1, 0, 0]]
+
+        arr = b.to_array(max_len={"iss": [1, 1]})
+        assert arr["iss"].tolist() == [[[1]], [[1]]]
+
+    def test_truncate(self):
+        ss = [{"is": [1, 2, 3, 4, 5]}, {"is": [1, 2]}]
+        b = Batch(ss)
+        assert b.to_array(max_len={"is": 2})["is"].tolist() == [[1, 2], [1, 2]]
+        arr = b.to_array(max_len={"is": 2}, truncate="head")
+        assert arr["is"].tolist() == [[4, 5], [1, 2]]
+        arr = b.to_array(max_len={"is": 3}, truncate={"is": "both"})
+        assert arr["is"].tolist() == [[2, 3, 4], [1, 2, 0]]
+
+    def test_invalid_truncate(self):
+        b = Batch([{"is": [1, 2]}])
+        with pytest.raises(ValueError) as exc:
+            b.to_array(truncate="middle")
+        assert "invalid truncation 'middle' for field 'is'" in str(exc.value)
+
+    def test_nonpositive_max_len(self):
+        b = Batch([{"is": [1, 2]}])
+        with pytest.raises(ValueError) as exc:
+            b.to_array(max_len={"is": 0})
+        assert "max_len must be greater than 0" in str(exc.value)
+
+    def test_max_len_too_deep(self):
+        b = Batch([{"is": [1, 2]}])
+        with pytest.raises(ValueError) as exc:
+            b.to_array(max_len={"is": [2, 2]})
+        assert "field 'is' has fewer nesting levels than max_len" in str(exc.value)
+
+    def test_empty_seqs(self):
+        b = Batch([{"iss": [[1, 2], []]}, {"iss": []}, {"iss": [[], [3]]}])
+        arr = b.to_array(pad_with=-1, with_lengths=True)
+        assert arr["iss"].tolist() == [
+            [[1, 2], [-1, -1]],
+            [[-1, -1], [-1, -1]],
+            [[-1, -1], [3, -1]],
+        ]
+        assert arr["iss_len1"].tolist() == [2, 0, 2]
+        assert arr["iss_len2"].tolist() == [[2, 0], [0, 0], [0, 1]]
+
+    @pytest.mark.parametrize("depth", [1, 2, 3, 4])
+    def test_deep_random(self, rng, depth):
+        def make(d):
+            if d == 0:
+                return rng.randrange(1, 100)
+            return [make(d - 1) for _ in range(rng.randint(1, 4))]
+
+        def pad(x, shape):
+            if not shape:
+                return x
+            return [pad(v, shape[1:]) for v in x] + [pad_all(shape[1:])] * (shape[0] - len(x))
+
+        def pad_all(shape):
+            return 0 if not shape else [pad_all(shape[1:])] * shape[0]
+
+        ss = [{"x": make(depth)} for _ in range(20)]
+        arr = Batch(ss).to_array()
+        assert arr["x"].ndim == depth + 1
+        assert arr["x"].tolist() == pad([s["x"] for s in ss], arr["x"].shape)
+
+    def test_float_padding(self):
+        b = Batch([{"fs": [0.5]}, {"fs": [0.5, 1.5]}])
+        arr = b.to_array(pad_with=-1.0)
+        assert arr["fs"].tolist() == [[0.5, -1.0], [0.5, 1.5]]
+
+    def test_string_padding(self):
+        arr = Batch([{"ws": ["ab"]}, {"ws": ["ab", "c"]}]).to_array(pad_with="x")
+        assert arr["ws"].dtype == np.dtype("<U2")
+        assert arr["ws"].tolist() == [["ab", "x"], ["ab", "c"]]
+
+    @pytest.mark.parametrize(
+        "values,pad",
+        [
+            ([[1], [1, 2]], 0),
+            ([[1], [1, 2]], 0.5),
+            ([[0.5], [1, 2]], "-"),
+            ([[True], [False, True]], 0),
+            ([["ab"], ["c", "d"]], "x"),
+            ([[], []], 0),
+            ([[1, 2], [3, 4]], "x"),
+            ([[[1, 2], [3]], [[4]], []], 0),
+            ([[[1, 2], [3]], [[4]], []], "x"),
+            ([[[]], [[], []]], 0),
+            ([[], []], -1),
+            ([[[[1]], [[2, 3], [4]]], [[[5]]]], 0),
+        ],
+    )
+    def test_nested_padding(self, monkeypatch, values, pad):
+        b = Batch([{"xs": v} for v in values])
+        arr = b.to_array(pad_with=pad, with_mask=True, with_lengths=True)
+        monkeypatch.setattr(Batch, "_MAX_NESTED_PADDING_VALUES", -1)
+        expected = b.to_array(pad_with=pad, with_mask=True, with_lengths=True)
+
+        assert set(arr) == set(expected)
+        for name in expected:
+            assert arr[name].dtype == expected[name].dtype
+            assert arr[name].shape == expected[name].shape
+            assert arr[name].tolist() == expected[name].tolist()
+
+    def test_nested_padding_with_schema(self, monkeypatch):
+        b = Batch([{"xss": [[1, 2], [3]]}, {"xss": [[4]]}])
+        schema = Schema({"xss": FieldSchema(2, "uint16", 9)})
+        arr = b.to_array(schema=schema)
+        monkeypatch.setattr(Batch, "_MAX_NESTED_PADDING_VALUES", -1)
+        expected = b.to_array(schema=schema)
+
+        assert arr["xss"].dtype == expected["xss"].dtype == np.uint16
+        assert arr["xss"].tolist() == expected["xss"].tolist()
+        assert arr["xss"].tolist() == [[[1, 2], [3, 9]], [[4, 9], [9, 9]]]
+
+    def test_string_padding_without_padding(self):
+        arr = Batch([{"x": [1, 2]}, {"x": [3, 4]}]).to_array(pad_with={"x": "PAD"})
+        assert arr["x"].dtype == np.dtype(int)
+        assert arr["x"].tolist() == [[1, 2], [3, 4]]
+
+    @pytest.mark.parametrize(
+        "values,expected",
+        [
+            ([[1], [1, 2]], [["1", "-"], ["1", "2"]]),
+            ([[0.5], [0.5, 2]], [["0.5", "-"], ["0.5", "2"]]),
+            ([[True], [True, False]], [["True", "-"], ["True", "False"]]),
+        ],
+    )
+    def test_string_padding_of_non_strings(self, values, expected):
+        arr = Batch([{"xs": v} for v in values]).to_array(pad_with="-")
+        assert arr["xs"].dtype.kind == "U"
+        assert arr["xs"].tolist() == expected
+
+    def test_with_lengths(self):
+        ss = [{"is": [1, 2], "i": 1}, {"is": [1], "i": 2}, {"is": [1, 2, 3], "i": 3}]
+        b = Batch(ss)
+        arr = b.to_array(with_lengths=True)
+        assert set(arr) == {"is", "i", "is_len1"}
+        assert arr["is_len1"].tolist() == [2, 1, 3]
+
+        arr = b.to_array(with_lengths=True, max_len={"is": 2})
+        assert arr["is_len1"].tolist() == [2, 1, 2]
+
+    def test_with_lengths_nested(self):
+        ss = [{"iss": [[1, 2], [1]]}, {"iss": [[1, 2, 3]]}]
+        b = Batch(ss)
+        arr = b.to_array(with_lengths=True)
+        assert arr["iss_len1"].tolist() == [2, 1]
+        assert arr["iss_len2"].shape == (2, 2)
+        assert arr["iss_len2"].tolist() == [[2, 1], [3, 0]]
+
+    def test_with_mask(self):
+        ss = [{"is": [0, 0]}, {"is": [0]}]
+        b = Batch(ss)
+        arr = b.to_array(with_mask=True)
+        assert set(arr) == {"is", "is_mask"}
+        assert arr["is_mask"].dtype == bool
+        assert arr["is_mask"].tolist() == [[True, True], [True, False]]
+
+        ss = [{"iss": [[1, 2], [1]]}, {"iss": [[1, 2, 3]]}]
+        b = Batch(ss)
+        arr = b.to_array(with_mask=True)
+        assert arr["iss_mask"].shape == arr["iss"].shape
+        assert arr["iss_mask"].tolist() == [
+            [[True, True, False], [True, False, False]],
+            [[True, True, True], [False, False, False]],
+        ]
+
+    def test_with_lengths_name_clash(self):
+        b = Batch([{"is": [1], "is_len1": 1}])
+        with pytest.raises(ValueError) as exc:
+            b.to_array(with_lengths=True)
+        assert "cannot add 'is_len1' since a field with that name exists" in str(exc.value)
+
+    def test_packed(self):
+        ss = [{"is": [1, 2], "i": 1}, {"is": [3], "i": 2}, {"is": [4, 5, 6], "i": 3}]
+        b = Batch(ss)
+        arr = b.to_array(packed=True)
+        assert set(arr) == {"is", "is_offsets1", "i"}
+        assert arr["is"].tolist() == [1, 2, 3, 4, 5, 6]
+        assert arr["is_offsets1"].tolist() == [0, 2, 3, 6]
+        assert arr["i"].tolist() == [1, 2, 3]
+
+    def test_packed_nested(self):
+        ss = [{"iss": [[1, 2], [3]]}, {"iss": [[4, 5, 6]]}]
+        b = Batch(ss)
+        arr = b.to_array(packed=True, with_lengths=True)
+        assert arr["iss"].tolist() == [1, 2, 3, 4, 5, 6]
+        assert arr["iss_offsets1"].tolist() == [0, 2, 3]
+        assert arr["iss_offsets2"].tolist() == [0, 2, 3, 6]
+        assert arr["iss_len1"].tolist() == [2, 1]
+        assert arr["iss_len2"].tolist() == [2, 1, 3]
+
+    def test_packed_max_len(self):
+        ss = [{"iss": [[1, 2], [3]]}, {"iss": [[4, 5, 6]]}]
+        b = Batch(ss)
+        arr = b.to_array(packed=True, max_len={"iss": [1, 2]}, truncate="head")
+        assert arr["iss"].tolist() == [3, 5, 6]
+        assert arr["iss_offsets1"].tolist() == [0, 1, 2]
+        assert arr["iss_offsets2"].tolist() == [0, 1, 3]
+
+        with pytest.raises(ValueError) as exc:
+            b.to_array(packed=True, max_len={"iss": [1, 2, 3]})
+        assert "field 'iss' has fewer nesting levels than max_len" in str(exc.value)
+
+    def test_packed_inconsistent_depth(self):
+        b = Batch([{"ws": [1, 2]}, {"ws": [[1, 2], [3, 4]]}])
+        with pytest.raises(ValueError) as exc:
+            b.to_array(packed=True)
+        assert "field 'ws' has inconsistent nesting depth" in str(exc.value)
+
+    def test_packed_with_mask(self):
+        b = Batch([{"is": [1, 2]}])
+        with pytest.raises(ValueError) as exc:
+            b.to_array(packed=True, with_mask=True)
+        assert "cannot return masks for packed fields" in str(exc.value)
+
+    def test_schema(self):
+        ss = [{"iss": [[1, 2], [1]], "is": [1], "i": 1}, {"iss": [[1]], "is": [1, 2], "i": 2}]
+        b = Batch(ss)
+        schema = Schema({"iss": FieldSchema(2, "int8", pad=-1), "i": FieldSchema(0, "float64")})
+        arr = b.to_array(schema=schema, pad_with=9, with_mask=True)
+        assert arr["iss"].dtype == np.int8
+        assert arr["iss"].tolist() == [[[1, 2], [1, -1]], [[1, -1], [-1, -1]]]
+        assert arr["iss_mask"].tolist() == [
+            [[True, True], [True, False]],
+            [[True, False], [False, False]],
+        ]
+        assert arr["is"].tolist() == [[1, 9], [1, 2]]
+        assert arr["i"].dtype == np.float64
+
+        arr = b.to_array(schema=schema, packed=True)
+        assert arr["iss"].dtype == np.int8
+        assert arr["iss"].tolist() == [1, 2, 1, 1]
+        assert arr["iss_offsets2"].tolist() == [0, 2, 3, 4]
+
+    def test_schema_with_vocab(self):
+        ss = [{"ws": ["a", "b"]}, {"ws": ["b"]}]
+        vocab = Vocab({"ws": StringStore(["<pad>", "a", "b"])})
+        schema = Schema.from_samples(ss, vocab=vocab)
+        arr = Batch(vocab.stoi(ss)).to_array(schema=schema)
+        assert arr["ws"].dtype == np.uint16
+        assert arr["ws"].tolist() == [[1, 2], [2, 0]]
@@ -35,6 +35,28 @@ def test_init_kwargs():
     assert list(bs[2]) == [ss[4]]
 
 
+def test_stream_batches(stream_cls):
+    ss = [{"i": i} for i in range(5)]
+    bs = list(BatchIterator(stream_cls(ss), batch_size=2))
+    assert [list(b) for b in bs] == [ss[:2], ss[2:4], ss[4:]]
+
+
+def test_batches_are_copies(rng):
+    ss = [{"i": i} for i in range(5)]
+    bs = list(BatchIterator(ss, batch_size=2))
+    rng.shuffle(ss)
+    ss[0] = {"i": -1}
+    assert [list(b) for b in bs] == [[{"i": 0}, {"i": 1}], [{"i": 2}, {"i": 3}], [{"i": 4}]]
+
+
+def test_views():
+    ss = [{"i": i} for i in range(5)]
+    bs = list(BatchIterator(ss, batch_size=2, views=True))
+    assert [list(b) for b in bs] == [ss[:2], ss[2:4], ss[4:]]
+    ss[0] = {"i": -1}
+    assert bs[0][0] == {"i": -1}
+
+
 def test_init_nonpositive_batch_size(samples):
     with pytest.raises(ValueError) as exc:
         BatchIterator(samples, batch_size=0)
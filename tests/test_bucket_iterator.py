@@ -2,7 +2,7 @@ from typing import Iterable, Sized
 
 import pytest
 
-from text2array import Batch, BucketIterator
+from text2array import Batch, BucketIterator, BucketStats
 
 
 def test_init():
@@ -52,3 +52,21 @@ def test_sort_bucket():
 def test_shuffle_and_sort_bucket():
     with pytest.warns(UserWarning):
         BucketIterator([], len, shuffle_bucket=True, sort_bucket=True)
+
+
+def test_init_stream(stream_cls):
+    samples = [{"n": n} for n in range(10)]
+    iter_ = BucketIterator(stream_cls(samples), lambda s: s["n"] % 3, batch_size=2)
+    assert len(iter_) == 6
+    assert len(list(iter_)) == 6
+
+
+def test_bucket_stats():
+    samples = [{"n": n} for n in range(10)]
+    iter_ = BucketIterator(samples, lambda s: s["n"] % 3, batch_size=3)
+
+    stats = iter_.bucket_stats()
+    assert all(isinstance(st, BucketStats) for st in stats)
+    assert stats == [(0, 4, 2), (1, 3, 1), (2, 3, 1)]
+    assert [st.key for st in stats] == [0, 1, 2]
+    assert sum(st.num_batches for st in stats) == len(iter_)
@@ -0,0 +1,155 @@
+import os
+import time
+
+import pytest
+
+from text2array import ConversionCache, StringStore, Vocab
+
+
+@pytest.fixture
+def vocab():
+    return Vocab({"ws": StringStore(["<pad>", "<unk>", "a", "b"], default="<unk>")})
+
+
+@pytest.fixture
+def samples():
+    return [
+        {"ws": ["a", "b", "c"], "cs": [["a"], ["b", "c"]], "i": 1, "f": 0.5, "t": True},
+        {"ws": ["b"], "cs": [["d"]], "i": 2, "f": 1.5, "t": False},
+    ]
+
+
+def files(tmp_path):
+    return sorted(os.listdir(str(tmp_path)))
+
+
+def test_init(tmp_path, vocab, samples):
+    cache = ConversionCache(str(tmp_path))
+    expected = list(vocab.stoi(samples))
+
+    assert cache.stoi(vocab, samples) == expected
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert len(files(tmp_path)) == 1
+    assert cache.stoi(vocab, samples) == expected
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_persists(tmp_path, vocab, samples):
+    ConversionCache(str(tmp_path)).stoi(vocab, samples)
+    cache = ConversionCache(str(tmp_path))
+
+    assert cache.stoi(vocab, samples) == list(vocab.stoi(samples))
+    assert cache.hits == 1
+
+
+def test_types_preserved(tmp_path, vocab, samples):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, samples)
+    res = cache.stoi(vocab, samples)
+
+    assert [type(s["i"]) for s in res] == [int, int]
+    assert [type(s["f"]) for s in res] == [float, float]
+    assert [type(s["t"]) for s in res] == [bool, bool]
+    assert res[0]["cs"] == [["a"], ["b", "c"]]
+
+
+@pytest.mark.parametrize(
+    "ss",
+    [
+        [{"x": 1}, {"x": 1.5}],
+        [{"x": [1, 2]}, {"x": [[1], [2]]}],
+        [{"x": 1}, {"y": 2}],
+        [{"x": 2 ** 70}],
+        [{"x": None}],
+        [{"x": []}, {"x": []}],
+    ],
+)
+def test_fallback(tmp_path, vocab, ss):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, ss)
+
+    assert cache.stoi(vocab, ss) == ss
+    assert cache.hits == 1
+
+
+def test_empty(tmp_path, vocab):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, [])
+
+    assert cache.stoi(vocab, []) == []
+
+
+def test_vocab_change(tmp_path, vocab, samples):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, samples)
+    vocab["ws"].add("c")
+
+    assert cache.stoi(vocab, samples) == list(vocab.stoi(samples))
+    assert cache.misses == 2
+    vocab["ws"].default = "<pad>"
+    cache.stoi(vocab, samples)
+    assert cache.misses == 3
+
+
+def test_input_change(tmp_path, vocab, samples):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, samples)
+    samples[1]["ws"].append("a")
+
+    assert cache.stoi(vocab, samples) == list(vocab.stoi(samples))
+    assert cache.misses == 2
+
+
+def test_source(tmp_path, vocab, samples):
+    cache_dir, src = tmp_path / "cache", tmp_path / "data.txt"
+    src.write_text("foo")
+    cache = ConversionCache(str(cache_dir))
+    cache.stoi(vocab, samples, source=str(src))
+
+    def fail():
+        raise AssertionError("samples should not be read")
+        yield
+
+    assert cache.stoi(vocab, fail(), source=str(src)) == list(vocab.stoi(samples))
+    assert cache.hits == 1
+
+    src.write_text("foobar")
+    cache.stoi(vocab, samples[:1], source=[str(src)])
+    assert cache.misses == 2
+    # Entry for the old contents is removed
+    assert len(files(cache_dir)) == 1
+
+
+def test_max_bytes(tmp_path, vocab, samples):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, samples)
+    size = os.path.getsize(os.path.join(str(tmp_path), files(tmp_path)[0]))
+    cache.clear()
+
+    cache = ConversionCache(str(tmp_path), max_bytes=int(2.5 * size))
+    for i in range(3):
+        cache.stoi(vocab, [dict(s, i=i) for s in samples])
+        time.sleep(0.01)
+    assert len(files(tmp_path)) == 2
+
+    cache.stoi(vocab, [dict(s, i=1) for s in samples])
+    assert cache.hits == 1
+    time.sleep(0.01)
+    cache.stoi(vocab, [dict(s, i=3) for s in samples])
+    # Least recently used entry (i=2) is evicted, not i=1
+    cache.stoi(vocab, [dict(s, i=1) for s in samples])
+    assert cache.hits == 2
+
+
+def test_clear(tmp_path, vocab, samples):
+    cache = ConversionCache(str(tmp_path))
+    cache.stoi(vocab, samples)
+    cache.clear()
+
+    assert files(tmp_path) == []
+
+
+def test_nonpositive_max_bytes(tmp_path):
+    with pytest.raises(ValueError) as exc:
+        ConversionCache(str(tmp_path), max_bytes=0)
+    assert "max bytes must be greater than 0" in str(exc.value)
@@ -0,0 +1,75 @@
+from typing import Iterable, Sized
+from unittest.mock import Mock
+
+from text2array import Batch, BucketIterator, CurriculumIterator
+
+
+def make_buckets(**kwargs):
+    samples = [{"ns": list(range(n))} for n in range(1, 31)]
+    return BucketIterator(samples, lambda s: (len(s["ns"]) - 1) // 10, batch_size=3, **kwargs)
+
+
+def test_init():
+    iter_ = CurriculumIterator(make_buckets())
+
+    assert isinstance(iter_, Sized)
+    assert len(iter_) == 12
+    assert isinstance(iter_, Iterable)
+    bs = list(iter_)
+    assert len(bs) == 12
+    assert all(isinstance(b, Batch) for b in bs)
+    assert iter_.step == 12
+
+
+def test_threshold():
+    iter_ = CurriculumIterator(make_buckets(), threshold=0)
+    assert len(iter_) == 4
+    assert all(len(s["ns"]) <= 10 for b in iter_ for s in b)
+
+    iter_.threshold = 1
+    assert len(iter_) == 8
+    assert all(len(s["ns"]) <= 20 for b in iter_ for s in b)
+    assert len(list(iter_)) == 8
+
+
+def test_threshold_changed_between_steps():
+    iter_ = CurriculumIterator(make_buckets(), threshold=2)
+    bs = []
+    for b in iter_:
+        bs.append(b)
+        if len(bs) == 2:
+            iter_.threshold = 0
+    assert len(bs) == 4
+    assert all(len(s["ns"]) <= 10 for b in bs for s in b)
+
+
+def test_schedule():
+    iter_ = CurriculumIterator(make_buckets(), schedule=lambda step: step // 5)
+    assert len(iter_) == 4
+
+    # Only bucket 0 is eligible when buckets 1 and 2 are reached
+    assert len(list(iter_)) == 4
+    assert iter_.threshold == 0
+    # Buckets 1 and 2 become eligible during the 2nd iteration
+    assert len(list(iter_)) == 12
+    assert iter_.step == 16
+    assert len(iter_) == 12
+
+
+def test_buckets_in_key_order():
+    samples = [{"ws": ["a"] * n} for n in [3, 1, 2, 1, 3, 2]]
+    buckets = BucketIterator(samples, lambda s: len(s["ws"]), batch_size=1)
+    iter_ = CurriculumIterator(buckets, schedule=lambda step: 1 if step < 2 else 3)
+
+    # The longest bucket becomes eligible in the same iteration
+    assert [len(b[0]["ws"]) for b in iter_] == [1, 1, 2, 2, 3, 3]
+
+
+def test_does_not_rescan_samples():
+    key = Mock(side_effect=lambda s: (len(s["ns"]) - 1) // 10)
+    samples = [{"ns": list(range(n))} for n in range(1, 31)]
+    iter_ = CurriculumIterator(BucketIterator(samples, key, batch_size=3), threshold=0)
+    list(iter_)
+    iter_.threshold = 2
+    list(iter_)
+    assert key.call_count == len(samples)
@@ -0,0 +1,93 @@
+from typing import Iterable
+
+import pytest
+
+from text2array import FilterIterator
+
+
+def test_init(samples):
+    iter_ = FilterIterator(samples)
+
+    assert isinstance(iter_, Iterable)
+    assert list(iter_) == samples
+    assert iter_.num_kept == len(samples)
+    assert iter_.num_duplicates == 0
+
+
+def test_init_stream(stream):
+    iter_ = FilterIterator(stream)
+
+    assert list(iter_) == list(stream)
+
+
+def test_dedup():
+    samples = [{"ws": ["a"], "i": 1}, {"i": 1, "ws": ["a"]}, {"ws": ["a"], "i": 2}]
+    iter_ = FilterIterator(samples)
+
+    assert list(iter_) == [samples[0], samples[2]]
+    assert iter_.num_kept == 2
+    assert iter_.num_duplicates == 1
+
+
+def test_dedup_fields():
+    samples = [{"ws": ["a"], "i": 1}, {"ws": ["a"], "i": 2}, {"ws": ["b"], "i": 1}]
+    iter_ = FilterIterator(samples, dedup_fields=["ws"])
+
+    assert list(iter_) == [samples[0], samples[2]]
+
+
+def test_no_dedup():
+    samples = [{"i": 1}, {"i": 1}]
+    iter_ = FilterIterator(samples, dedup=False)
+
+    assert list(iter_) == samples
+    assert iter_.num_duplicates == 0
+
+
+def test_counts_reset_on_iteration():
+    samples = [{"i": 1}, {"i": 1}]
+    iter_ = FilterIterator(samples)
+
+    assert list(iter_) == [{"i": 1}]
+    assert list(iter_) == [{"i": 1}]
+    assert iter_.num_kept == 1
+    assert iter_.num_duplicates == 1
+
+
+def test_length_limits():
+    samples = [{"ws": ["a"] * n, "cs": ["b"] * (5 - n)} for n in range(6)]
+    iter_ = FilterIterator(samples, min_len={"ws": 1}, max_len={"ws": 4, "cs": 3})
+
+    assert list(iter_) == samples[2:5]
+    assert iter_.num_too_short == 1
+    assert iter_.num_too_long == 2
+
+
+def test_capacity():
+    samples = [{"i": i % 50} for i in range(200)]
+    iter_ = FilterIterator(samples, capacity=50, error_rate=1e-6)
+
+    assert list(iter_) == samples[:50]
+    assert iter_.num_duplicates == 150
+
+
+def test_capacity_false_positive_rate():
+    samples = [{"i": i} for i in range(1000)]
+    iter_ = FilterIterator(samples, capacity=1000, error_rate=0.01)
+
+    assert iter_.num_kept == 0
+    assert 1000 - len(list(iter_)) < 50
+
+
+@pytest.mark.parametrize("capacity", [0, -1])
+def test_nonpositive_capacity(capacity):
+    with pytest.raises(ValueError) as exc:
+        FilterIterator([], capacity=capacity)
+    assert "capacity must be greater than 0" in str(exc.value)
+
+
+@pytest.mark.parametrize("error_rate", [0, 1])
+def test_invalid_error_rate(error_rate):
+    with pytest.raises(ValueError) as exc:
+        FilterIterator([], error_rate=error_rate)
+    assert "error rate must be between 0 and 1" in str(exc.value)
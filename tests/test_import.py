@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+import pytest
+
+import text2array
+
+
+def loaded_modules(stmt):
+    script = f"import sys\n{stmt}\nprint(' '.join(sys.modules))"
+    out = subprocess.run([sys.executable, "-c", script], check=True, stdout=subprocess.PIPE)
+    return set(out.stdout.decode().split())
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires module-level __getattr__")
+def test_import_is_lazy():
+    modules = loaded_modules("import text2array")
+
+    assert "numpy" not in modules
+    assert "tqdm" not in modules
+    assert "ordered_set" not in modules
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires module-level __getattr__")
+def test_string_store_does_not_import_numpy():
+    modules = loaded_modules("from text2array import StringStore, Vocab")
+
+    assert "ordered_set" in modules
+    assert "numpy" not in modules
+    assert "tqdm" not in modules
+
+
+def test_all_names_accessible():
+    for name in text2array.__all__:
+        assert getattr(text2array, name) is not None
+    assert set(text2array.__all__) <= set(dir(text2array))
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError) as exc:
+        text2array.Foo
+    assert "has no attribute 'Foo'" in str(exc.value)
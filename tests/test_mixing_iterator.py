@@ -0,0 +1,105 @@
+from random import Random
+from typing import Iterable, Sized
+
+import pytest
+
+from text2array import BatchIterator, MixingIterator
+
+
+def test_init(rng):
+    xs, ys = list(range(100)), list(range(100, 120))
+    iter_ = MixingIterator([xs, ys], rng=rng)
+
+    assert isinstance(iter_, Sized)
+    assert len(iter_) == 120
+    assert isinstance(iter_, Iterable)
+    assert iter_.probs == pytest.approx([100 / 120, 20 / 120])
+    items = list(iter_)
+    assert sorted(items) == xs + ys
+    assert [x for x in items if x < 100] == xs
+    assert [y for y in items if y >= 100] == ys
+    assert items != xs + ys
+
+
+def test_weights_and_temperature(rng):
+    iter_ = MixingIterator([[0] * 10, [1] * 10], weights=[9, 1], rng=rng)
+    assert iter_.probs == pytest.approx([0.9, 0.1])
+    iter_ = MixingIterator([[0] * 10, [1] * 10], weights=[9, 1], temperature=2, rng=rng)
+    assert iter_.probs == pytest.approx([0.75, 0.25])
+
+
+def test_deterministic():
+    ss = [{"i": i} for i in range(30)]
+    make = lambda: MixingIterator(
+        [BatchIterator(ss[:20], batch_size=2), BatchIterator(ss[20:])], rng=Random(1)
+    )
+    assert [list(b) for b in make()] == [list(b) for b in make()]
+
+
+def test_resume(stream_cls):
+    sources = [list("abcdefgh"), list("ABCD"), list("xy")]
+    expected = list(MixingIterator(sources, rng=Random(3)))
+
+    iter_ = MixingIterator(sources, rng=Random(3))
+    it = iter(iter_)
+    first = [next(it) for _ in range(9)]
+    state = iter_.state_dict()
+
+    iter_ = MixingIterator([stream_cls(x) for x in sources], weights=[8, 4, 2], rng=Random(0))
+    iter_.load_state_dict(state)
+    assert first + list(iter_) == expected
+
+    # Next iteration starts over
+    assert sorted(iter_) == sorted(expected)
+
+
+def test_iterate_after_break(rng):
+    iter_ = MixingIterator([list(range(5)), list(range(5, 10))], rng=rng)
+    for i, _ in enumerate(iter_):
+        if i == 2:
+            break
+    assert iter_.state_dict()["consumed"] != [0, 0]
+
+    assert sorted(iter_) == list(range(10))
+    assert len(iter_) == 10
+
+
+def test_stream(stream_cls):
+    iter_ = MixingIterator([stream_cls([1, 2]), stream_cls([3])], weights=[1, 1])
+    with pytest.raises(TypeError):
+        len(iter_)
+
+
+def test_empty_iterable(rng):
+    iter_ = MixingIterator([[1, 2], [], [3]], rng=rng)
+    assert sorted(iter_) == [1, 2, 3]
+
+
+def test_zero_weight(rng, stream_cls):
+    iter_ = MixingIterator([stream_cls([1, 2]), stream_cls([3])], weights=[1, 0], rng=rng)
+    assert list(iter_) == [1, 2]
+    assert iter_.probs == [1.0, 0.0]
+
+
+@pytest.mark.parametrize(
+    "args,kwargs,msg",
+    [
+        ([], {}, "iterables cannot be empty"),
+        ([[1]], dict(weights=[1, 2]), "weights must have the same length as iterables"),
+        ([[1]], dict(weights=[-1]), "weights cannot be less than 0"),
+        ([[1], [2]], dict(weights=[0, 0]), "weights cannot all be 0"),
+        ([[], []], {}, "weights cannot all be 0"),
+        ([[1]], dict(temperature=0), "temperature must be greater than 0"),
+    ],
+)
+def test_invalid_args(args, kwargs, msg):
+    with pytest.raises(ValueError) as exc:
+        MixingIterator(args, **kwargs)
+    assert msg in str(exc.value)
+
+
+def test_load_mismatched_state(rng):
+    state = MixingIterator([[1], [2]], rng=rng).state_dict()
+    with pytest.raises(ValueError) as exc:
+        MixingIterator([[1]], rng=rng).load_state_dict(state)
+    assert "state does not match the number of iterables" in str(exc.value)
@@ -0,0 +1,109 @@
+from typing import Iterable
+
+import pytest
+
+from text2array import Batch, PackingIterator
+
+
+def test_init():
+    samples = [{"ws": list(range(n)), "l": n} for n in [2, 3, 1, 2, 4, 5, 1]]
+    iter_ = PackingIterator(samples, key=lambda s: len(s["ws"]), row_length=4, batch_size=2)
+
+    assert isinstance(iter_, Iterable)
+    assert iter_.row_length == 4
+    assert iter_.batch_size == 2
+    bs = list(iter_)
+    assert all(isinstance(b, Batch) for b in bs)
+    assert all(len(b) <= 2 for b in bs)
+
+    rows = [r for b in bs for r in b]
+    assert [r["l"] for r in rows] == [[2], [3, 1], [2], [4], [5], [1]]
+    assert rows[1]["ws"] == [0, 1, 2, 0]
+    assert rows[1]["segment_ids"] == [1, 1, 1, 2]
+    assert rows[1]["positions"] == [0, 1, 2, 0]
+    assert rows[4]["ws"] == list(range(5))
+
+
+def test_to_array():
+    samples = [{"ws": list(range(1, n + 1))} for n in [2, 1, 3]]
+    iter_ = PackingIterator(samples, key=lambda s: len(s["ws"]), row_length=3, batch_size=2)
+    arr = next(iter(iter_)).to_array()
+    assert arr["ws"].tolist() == [[1, 2, 1], [1, 2, 3]]
+    assert arr["segment_ids"].tolist() == [[1, 1, 2], [1, 1, 1]]
+    assert arr["positions"].tolist() == [[0, 1, 0], [0, 1, 2]]
+
+
+def test_ffd():
+    samples = [{"n": n} for n in [3, 1, 2, 1, 3, 2]]
+    iter_ = PackingIterator(samples, key=lambda s: s["n"], row_length=4, strategy="ffd")
+
+    rows = [r["n"] for b in iter_ for r in b]
+    assert rows == [[3, 1], [3, 1], [2, 2]]
+
+
+def test_ffd_window_size(stream_cls):
+    samples = [{"n": n} for n in [1, 3, 2, 2, 1, 3]]
+    iter_ = PackingIterator(
+        stream_cls(samples), key=lambda s: s["n"], row_length=4, strategy="ffd", window_size=3
+    )
+
+    rows = [r["n"] for b in iter_ for r in b]
+    assert rows == [[3, 1], [2], [3, 1], [2]]
+
+
+def test_ffd_oversized():
+    samples = [{"n": n} for n in [1, 6, 3]]
+    iter_ = PackingIterator(samples, key=lambda s: s["n"], row_length=4, strategy="ffd")
+
+    rows = [r["n"] for b in iter_ for r in b]
+    assert rows == [[6], [3, 1]]
+
+
+def test_reserved_field_name():
+    iter_ = PackingIterator([{"positions": [1]}], key=lambda s: 1, row_length=2)
+    with pytest.raises(ValueError) as exc:
+        list(iter_)
+    assert "cannot pack samples which have a field named 'positions'" in str(exc.value)
+
+
+def test_lengths_from_fields():
+    # The key need not be the length of the sequential fields
+    samples = [{"ws": ["a", "b"], "ts": ["x", "y"]}, {"ws": ["c"], "ts": ["z"]}]
+    iter_ = PackingIterator(samples, key=lambda s: 2 * len(s["ws"]), row_length=6)
+    row = next(iter(iter_))[0]
+    assert row["ws"] == ["a", "b", "c"]
+    assert row["segment_ids"] == [1, 1, 2]
+    assert row["positions"] == [0, 1, 0]
+
+
+@pytest.mark.parametrize(
+    "samples,msg",
+    [
+        ([{"ws": [1]}, {"ws": [2], "l": 1}], "cannot pack samples which have different fields"),
+        (
+            [{"ws": [1, 2], "ts": [1]}],
+            "cannot pack samples whose sequential fields differ in length",
+        ),
+    ],
+)
+def test_invalid_row(samples, msg):
+    iter_ = PackingIterator(samples, key=lambda s: 1, row_length=4)
+    with pytest.raises(ValueError) as exc:
+        list(iter_)
+    assert msg in str(exc.value)
+
+
+@pytest.mark.parametrize(
+    "kwargs,msg",
+    [
+        (dict(row_length=0), "row length must be greater than 0"),
+        (dict(batch_size=0), "batch size must be greater than 0"),
+        (dict(strategy="foo"), "invalid strategy 'foo'"),
+        (dict(window_size=0), "window size must be greater than 0"),
+    ],
+)
+def test_invalid_args(kwargs, msg):
+    kwargs = {"row_length": 4, **kwargs}
+    with pytest.raises(ValueError) as exc:
+        PackingIterator([], key=len, **kwargs)
+    assert msg in str(exc.value)
@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, Sized
+
+import numpy as np  # type: ignore
+import pytest
+
+from text2array import Batch, BatchIterator, ProcessArrayIterator
+from text2array.parallel import _to_shared_memory
+
+pytest.importorskip("multiprocessing.shared_memory")
+
+
+@pytest.fixture
+def segments(monkeypatch):
+    # Names of the segments created or attached to in this process
+    from multiprocessing import shared_memory
+
+    names = []
+
+    class Recorder(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            names.append(self.name)
+
+    monkeypatch.setattr(shared_memory, "SharedMemory", Recorder)
+    return names
+
+
+def test_ok(segments):
+    samples = [{"ws": list(range(n)), "w": "a" * n, "f": n / 2} for n in range(1, 20)]
+    batches = BatchIterator(samples, batch_size=3)
+    iter_ = ProcessArrayIterator(batches, num_workers=2, max_in_flight=3)
+
+    assert isinstance(iter_, Sized)
+    assert len(iter_) == len(batches)
+    assert isinstance(iter_, Iterable)
+    arrs = list(iter_)
+    assert len(arrs) == len(batches)
+    for arr, b in zip(arrs, batches):
+        expected = b.to_array()
+        assert set(arr) == set(expected)
+        for name in expected:
+            assert arr[name].dtype == expected[name].dtype
+            assert arr[name].tolist() == expected[name].tolist()
+    assert segments
+    assert not leftover(segments)
+
+
+def test_arrays_are_backed_by_segments(segments):
+    batches = [Batch([{"ws": [1, 2]}, {"ws": [3]}])]
+    arr = next(iter(ProcessArrayIterator(batches, num_workers=1)))
+
+    assert not arr["ws"].flags.owndata
+    arr["ws"][0, 0] = 5
+    assert arr["ws"].tolist() == [[5, 2], [3, 0]]
+    # Segments are unlinked once attached, even while the arrays are alive
+    assert not leftover(segments)
+
+
+def test_worker_error_does_not_leak(segments):
+    with pytest.raises(AttributeError):
+        _to_shared_memory(to_bad_arrays, Batch([{"i": 1}]))
+    assert len(segments) == 1
+    assert not leftover(segments)
+
+
+def test_convert_and_executor():
+    samples = [{"ws": list(range(n))} for n in range(1, 10)]
+    batches = BatchIterator(samples, batch_size=2)
+    convert = partial(Batch.to_array, pad_with=-1, with_mask=True)
+
+    with ProcessPoolExecutor(2) as executor:
+        arrs = list(ProcessArrayIterator(batches, convert=convert, executor=executor))
+
+    expected = [b.to_array(pad_with=-1)["ws"].tolist() for b in batches]
+    assert [a["ws"].tolist() for a in arrs] == expected
+    assert all(a["ws_mask"].dtype == bool for a in arrs)
+
+
+def test_empty_array(segments):
+    batches = [Batch([{"ws": []}, {"ws": []}])]
+    arrs = list(ProcessArrayIterator(batches, num_workers=1))
+    assert arrs[0]["ws"].shape == (2, 0)
+    assert not leftover(segments)
+
+
+def test_object_dtype():
+    batches = [Batch([{"i": 1}, {"i": 2}])]
+    arrs = list(ProcessArrayIterator(batches, convert=to_object_array, num_workers=1))
+    assert arrs[0]["o"].dtype == object
+    assert arrs[0]["o"].tolist() == [{"i": 1}, {"i": 2}]
+
+
+def test_stop_early(segments):
+    samples = [{"ws": list(range(n))} for n in range(1, 30)]
+    it = iter(ProcessArrayIterator(BatchIterator(samples), num_workers=2, max_in_flight=4))
+    next(it)
+    it.close()
+    assert len(segments) > 1
+    assert not leftover(segments)
+
+
+@pytest.mark.parametrize(
+    "kwargs,msg",
+    [
+        (dict(num_workers=0), "number of workers must be greater than 0"),
+        (dict(max_in_flight=0), "max in flight must be greater than 0"),
+    ],
+)
+def test_invalid_args(kwargs, msg):
+    with pytest.raises(ValueError) as exc:
+        ProcessArrayIterator([], **kwargs)
+    assert msg in str(exc.value)
+
+
+def to_object_array(batch):
+    a = np.empty(len(batch), dtype=object)
+    a[:] = list(batch)
+    return {"o": a}
+
+
+def to_bad_arrays(batch):
+    # The second value fails after the first one is put in shared memory
+    return {"a": np.zeros(3), "b": [1, 2]}
+
+
+def leftover(names):
+    from multiprocessing.shared_memory import SharedMemory
+
+    res = []
+    for name in names:
+        try:
+            shm = SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+        res.append(name)
+    return res
@@ -0,0 +1,131 @@
+from typing import Iterable, Sized
+
+import numpy as np  # type: ignore
+import pytest
+from tqdm import tqdm  # type: ignore
+
+from text2array import Batch, ParquetIterator, StringStore, Vocab
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def samples():
+    return [
+        {"ws": ["a", "b", "c"], "cs": [["a"], ["b", "c"]], "i": 1, "f": 0.5},
+        {"ws": ["b"], "cs": [["d", "e", "f"]], "i": 2, "f": 1.5},
+        {"ws": ["c", "a"], "cs": [["a", "b"], ["c"], ["d"]], "i": 3, "f": 2.5},
+        {"ws": ["d"], "cs": [["e"]], "i": 4, "f": 3.5},
+        {"ws": ["a", "a"], "cs": [["b"], ["b"]], "i": 5, "f": 4.5},
+    ]
+
+
+@pytest.fixture
+def path(tmp_path, samples):
+    p = tmp_path / "data.parquet"
+    pq.write_table(pa.Table.from_pylist(samples), str(p), row_group_size=2)
+    return str(p)
+
+
+def test_init(path, samples):
+    iter_ = ParquetIterator(path)
+
+    assert isinstance(iter_, Sized)
+    assert len(iter_) == 3
+    assert isinstance(iter_, Iterable)
+    arrs = list(iter_)
+    assert len(arrs) == 3
+    for arr, start in zip(arrs, [0, 2, 4]):
+        expected = Batch(samples[start : start + 2]).to_array()
+        assert set(arr) == set(expected)
+        for name in arr:
+            assert arr[name].tolist() == expected[name].tolist()
+
+
+def test_table(samples):
+    iter_ = ParquetIterator(pa.Table.from_pylist(samples), batch_size=2)
+
+    assert len(iter_) == 3
+    arrs = list(iter_)
+    assert arrs[0]["i"].tolist() == [1, 2]
+    assert arrs[2]["ws"].tolist() == [["a", "a"]]
+
+
+def test_batch_size(path):
+    iter_ = ParquetIterator(path, batch_size=3)
+
+    assert iter_.batch_size == 3
+    # Chunks never span row groups
+    assert len(iter_) == 3
+    assert [len(arr["i"]) for arr in iter_] == [2, 2, 1]
+
+
+def test_columns(path):
+    iter_ = ParquetIterator(path, columns=["ws"])
+
+    assert all(set(arr) == {"ws"} for arr in iter_)
+    assert all(set(s) == {"ws"} for s in iter_.samples)
+
+
+def test_vocab(path, samples):
+    vocab = Vocab.from_samples(samples, pbar=tqdm(disable=True))
+    iter_ = ParquetIterator(path, vocab=vocab)
+
+    for arr, start in zip(iter_, [0, 2, 4]):
+        b = Batch(vocab.stoi(samples[start : start + 2]))
+        expected = b.to_array()
+        assert arr["ws"].dtype == np.uint16
+        assert arr["ws"].tolist() == expected["ws"].tolist()
+        assert arr["cs"].tolist() == expected["cs"].tolist()
+
+
+def test_vocab_unknown_token(samples):
+    vocab = Vocab({"ws": StringStore(["<pad>", "<unk>", "a"], default="<unk>")})
+    arr = next(iter(ParquetIterator(pa.Table.from_pylist(samples[:2]), vocab=vocab)))
+
+    assert arr["ws"].tolist() == [[2, 1, 1], [1, 0, 0]]
+
+
+def test_pad_with(path):
+    arr = next(iter(ParquetIterator(path, pad_with={"ws": -1})))
+
+    assert arr["ws"].tolist() == [["a", "b", "c"], ["b", "-1", "-1"]]
+    assert arr["cs"][1].tolist() == [["d", "e", "f"], ["0", "0", "0"]]
+
+
+def test_with_lengths(path, samples):
+    arr = next(iter(ParquetIterator(path, with_lengths=True)))
+    expected = Batch(samples[:2]).to_array(with_lengths=True)
+
+    assert set(arr) == set(expected)
+    for key in ["ws_len1", "cs_len1", "cs_len2"]:
+        assert arr[key].tolist() == expected[key].tolist()
+
+
+def test_samples(path, samples):
+    iter_ = ParquetIterator(path)
+
+    assert list(iter_.samples) == samples
+    assert list(iter_.samples) == samples
+
+
+def test_nulls():
+    table = pa.table({"ws": [["a"], None]})
+    with pytest.raises(ValueError) as exc:
+        list(ParquetIterator(table))
+    assert "field 'ws' has null values" in str(exc.value)
+
+
+def test_length_field_exists():
+    table = pa.table({"ws": [["a"]], "ws_len1": [1]})
+    with pytest.raises(ValueError) as exc:
+        list(ParquetIterator(table, with_lengths=True))
+    assert "cannot add 'ws_len1' since a field with that name exists" in str(exc.value)
+
+
+def test_nonpositive_batch_size(path):
+    with pytest.raises(ValueError) as exc:
+        ParquetIterator(path, batch_size=0)
+    assert "batch size must be greater than 0" in str(exc.value)
+
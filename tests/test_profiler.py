@@ -0,0 +1,160 @@
+import json
+import threading
+import tracemalloc
+
+from tqdm import tqdm  # type: ignore
+import pytest
+
+from text2array import (
+    Batch,
+    BatchIterator,
+    BucketIterator,
+    Profiler,
+    ShuffleIterator,
+    SortedWindowIterator,
+    StageStats,
+    StringStore,
+    Vocab,
+)
+
+
+@pytest.fixture
+def vocab():
+    return Vocab({"ws": StringStore(["<pad>", "a", "b"]), "w": StringStore("xy")})
+
+
+def test_ok(vocab, stream_cls, rng):
+    ss = [{"ws": ["a", "b"], "w": "x", "i": 1}, {"ws": ["b"], "w": "y", "i": 2}] * 3
+    with Profiler() as prof:
+        for b in BatchIterator(stream_cls(vocab.stoi(ss)), batch_size=4):
+            vocab.decode(b.to_array())
+        list(ShuffleIterator(ss, rng=rng))
+
+    stats = prof.stats()
+    assert set(stats) == {"stoi", "batch", "to_array", "decode", "shuffle"}
+    assert stats["stoi"][:1] + stats["stoi"][2:] == (6, 6, 15, 0)
+    # The last batch is empty and ends the iteration
+    assert (stats["batch"].calls, stats["batch"].samples) == (3, 6)
+    assert (stats["to_array"].calls, stats["to_array"].samples) == (2, 6)
+    assert (stats["decode"].calls, stats["decode"].samples) == (2, 6)
+    assert (stats["shuffle"].calls, stats["shuffle"].samples) == (1, 6)
+    assert all(isinstance(st, StageStats) and st.seconds >= 0 for st in stats.values())
+    # Batches are created from the converted samples
+    assert stats["batch"].seconds >= stats["stoi"].seconds
+
+
+def test_inactive(vocab):
+    prof = Profiler()
+    list(vocab.stoi([{"ws": ["a"]}]))
+    with prof:
+        pass
+    list(vocab.stoi([{"ws": ["a"]}]))
+
+    assert prof.stats() == {}
+
+
+def test_itos_is_not_recorded(vocab):
+    with Profiler() as prof:
+        list(vocab.itos([{"ws": [1]}]))
+    assert prof.stats() == {}
+
+
+def test_nested(vocab):
+    with Profiler() as outer:
+        list(vocab.stoi([{"w": "x"}]))
+        with Profiler() as inner:
+            list(vocab.stoi([{"w": "y"}]))
+
+    assert outer.stats()["stoi"].calls == 1
+    assert inner.stats()["stoi"].calls == 1
+
+
+def test_bucket_and_sorted_window_iterators(rng):
+    ss = [{"ws": ["a"] * (i % 3)} for i in range(10)]
+    with Profiler() as prof:
+        list(BucketIterator(ss, key=lambda s: len(s["ws"]), batch_size=2, shuffle_bucket=True))
+    stats = prof.stats()
+    assert (stats["shuffle"].calls, stats["shuffle"].samples) == (3, 10)
+    assert (stats["batch"].calls, stats["batch"].samples) == (6, 10)
+
+    with Profiler() as prof:
+        list(SortedWindowIterator(ss, key=lambda s: len(s["ws"]), batch_size=2, rng=rng))
+    stats = prof.stats()
+    assert "shuffle" not in stats
+    assert (stats["sort"].calls, stats["sort"].samples) == (1, 10)
+    assert (stats["batch"].calls, stats["batch"].samples) == (5, 10)
+
+
+def test_threads(vocab):
+    def work():
+        list(vocab.stoi([{"w": "x"}] * 100))
+
+    with Profiler() as prof:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert prof.stats()["stoi"].calls == 400
+
+
+def test_chrome_trace(vocab, tmp_path):
+    with Profiler(max_events=2) as prof:
+        Batch(vocab.stoi([{"w": "x"}, {"w": "y"}, {"w": "x"}])).to_array()
+    prof.save_chrome_trace(str(tmp_path / "trace.json"))
+
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    assert [e["name"] for e in events] == ["stoi", "stoi"]
+    for e in events:
+        assert e["ph"] == "X"
+        assert e["ts"] >= 0 and e["dur"] >= 0
+        assert e["args"] == {"samples": 1, "tokens": 1}
+        assert {"pid", "tid", "cat"} <= set(e)
+    # Stages beyond max events are still counted
+    assert prof.stats()["stoi"].calls == 3
+
+
+def test_trace_allocations():
+    assert not tracemalloc.is_tracing()
+    with Profiler(trace_allocations=True) as prof:
+        assert tracemalloc.is_tracing()
+        Batch([{"xs": list(range(10000))}]).to_array()
+    assert not tracemalloc.is_tracing()
+
+    assert prof.stats()["to_array"].allocated_bytes > 0
+    assert "bytes" in prof.summary().splitlines()[0]
+
+
+def test_summary_and_reset(vocab):
+    with Profiler() as prof:
+        Vocab.from_samples([{"ws": ["a"]}], pbar=tqdm(disable=True))
+        Batch(vocab.stoi([{"ws": ["a", "b"]}])).to_array()
+
+    lines = prof.summary().splitlines()
+    assert lines[0].split() == ["stage", "calls", "seconds", "samples", "tokens"]
+    assert sorted(ln.split()[0] for ln in lines[1:]) == ["stoi", "to_array"]
+
+    prof.reset()
+    assert prof.stats() == {}
+    assert len(prof.summary().splitlines()) == 1
+
+
+def test_to_array_tokens():
+    ss = [
+        {"ws": ["a", "b", "c"], "css": [["a"], ["b", "c"]], "i": 1},
+        {"ws": [], "css": [], "i": 2},
+    ]
+    with Profiler() as prof:
+        Batch(ss).to_array(max_len={"ws": 2})
+        Batch(ss).to_array(packed=True)
+    stats = prof.stats()["to_array"]
+    assert (stats.calls, stats.samples, stats.tokens) == (2, 4, 5 + 6)
+
+
+def test_negative_max_events():
+    with pytest.raises(ValueError) as exc:
+        Profiler(max_events=-1)
+    assert "max events cannot be less than 0" in str(exc.value)
@@ -0,0 +1,114 @@
+from typing import MutableMapping
+
+import pytest
+
+from text2array import FieldSchema, Schema, StringStore, Vocab
+
+
+class TestFromSamples:
+    def test_ok(self):
+        ss = [
+            {"i": 1, "f": 0.5, "b": True, "w": "a", "is": [1, 2], "fss": [[0.5], [1.5, 2]]},
+            {"i": 2, "f": 1, "b": False, "w": "b", "is": [3], "fss": [[2.5]]},
+        ]
+        schema = Schema.from_samples(ss)
+
+        assert isinstance(schema, MutableMapping)
+        assert list(schema) == ["i", "f", "b", "w", "is", "fss"]
+        assert schema["i"] == FieldSchema(0, "int64")
+        assert schema["f"] == FieldSchema(0, "float64")
+        assert schema["b"] == FieldSchema(0, "bool")
+        assert schema["w"] == FieldSchema(0, None)
+        assert schema["is"] == FieldSchema(1, "int64")
+        assert schema["fss"] == FieldSchema(2, "float64")
+
+    def test_vocab(self):
+        ss = [{"ws": ["a", "b"], "i": 1}]
+        store = StringStore(["<pad>", "<unk>", "a", "b"], default="<unk>")
+        schema = Schema.from_samples(ss, vocab=Vocab({"ws": store}))
+        assert schema["ws"] == FieldSchema(1, "uint16", 0, store)
+        assert schema["i"].vocab is None
+
+        store = StringStore(["<unk>", "<pad>", "a", "b"], default="<unk>")
+        schema = Schema.from_samples(ss, vocab=Vocab({"ws": store}))
+        assert schema["ws"].pad == 1
+
+    def test_empty_values(self):
+        schema = Schema.from_samples([{"is": []}, {"is": []}])
+        assert schema["is"] == FieldSchema(1, None)
+
+    def test_num_samples(self):
+        ss = [{"is": [1]}, {"is": [[1]]}]
+        assert Schema.from_samples(ss, num_samples=1)["is"].depth == 1
+        with pytest.raises(ValueError) as exc:
+            Schema.from_samples(ss)
+        assert "field 'is' has inconsistent nesting depth" in str(exc.value)
+
+    def test_iterator(self):
+        with pytest.raises(ValueError) as exc:
+            Schema.from_samples(iter([{"i": 1}]))
+        assert "cannot infer schema from an iterator" in str(exc.value)
+
+    def test_empty(self):
+        with pytest.raises(ValueError) as exc:
+            Schema.from_samples([])
+        assert "cannot infer schema from no samples" in str(exc.value)
+
+    def test_missing_field(self):
+        with pytest.raises(KeyError) as exc:
+            Schema.from_samples([{"a": 1}, {"b": 2}])
+        assert "some samples have no field 'a'" in str(exc.value)
+
+    def test_no_schema(self):
+        with pytest.raises(KeyError) as exc:
+            Schema()["a"]
+        assert "no schema found for field name 'a'" in str(exc.value)
+
+
+class TestValidate:
+    def test_ok(self):
+        ss = [{"is": [1, 2], "i": 1}, {"is": [], "i": 2}]
+        schema = Schema({"is": FieldSchema(1), "i": FieldSchema(0)})
+        assert list(schema.validate(iter(ss))) == ss
+
+    def test_wrong_depth(self):
+        ss = [{"iss": [[1, 2]]}, {"iss": [[1], 2]}]
+        schema = Schema({"iss": FieldSchema(2)})
+        with pytest.raises(ValueError) as exc:
+            list(schema.validate(ss))
+        assert "field 'iss' of sample 1 does not have nesting depth 2" in str(exc.value)
+
+    def test_missing_field(self):
+        schema = Schema({"i": FieldSchema(0)})
+        with pytest.raises(KeyError) as exc:
+            list(schema.validate([{"i": 1}, {"j": 1}]))
+        assert "sample 1 has no field 'i'" in str(exc.value)
+
+    @pytest.mark.parametrize(
+        "dtype,value,ok",
+        [
+            ("int64", [1, True], True),
+            ("int64", [1, 0.5], False),
+            ("uint16", ["a"], False),
+            ("float64", [1, 0.5], True),
+            ("float64", ["a"], False),
+            ("bool", [True], True),
+            ("bool", [1], False),
+            (None, ["a", 1], True),
+        ],
+    )
+    def test_dtype(self, dtype, value, ok):
+        schema = Schema({"xs": FieldSchema(1, dtype)})
+        if ok:
+            list(schema.validate([{"xs": value}]))
+            return
+        with pytest.raises(ValueError) as exc:
+            list(schema.validate([{"xs": value}]))
+        assert f"field 'xs' of sample 0 has values not of data type {dtype}" in str(exc.value)
+
+    def test_vocab_allows_strings(self):
+        ss = [{"ws": ["a", "b"]}]
+        vocab = Vocab({"ws": StringStore(["<pad>", "a", "b"])})
+        schema = Schema.from_samples(ss, vocab=vocab)
+        assert list(schema.validate(ss)) == ss
+        assert list(schema.validate(vocab.stoi(ss))) == [{"ws": [1, 2]}]
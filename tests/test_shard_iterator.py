@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+import json
+
+import pytest
+
+from text2array import ShardIterator, StringStore, Vocab
+
+
+@pytest.fixture
+def paths(tmp_path):
+    ps = []
+    for i, n in enumerate([5, 2, 0, 3]):
+        p = tmp_path / f"{i}.jsonl"
+        lines = [json.dumps({"id": f"{i}-{j}", "ws": ["a", "b"]}) for j in range(n)]
+        p.write_text("".join(f"{line}\n" for line in lines))
+        ps.append(str(p))
+    return ps
+
+
+def ids(samples):
+    return [s["id"] for s in samples]
+
+
+def test_init(paths):
+    iter_ = ShardIterator(paths)
+
+    assert isinstance(iter_, Iterable)
+    assert ids(iter_) == "0-0 0-1 0-2 0-3 0-4 1-0 1-1 3-0 3-1 3-2".split()
+
+
+def test_chunk_size(paths):
+    iter_ = ShardIterator(paths, chunk_size=2)
+
+    assert ids(iter_) == "0-0 0-1 1-0 1-1 3-0 3-1 0-2 0-3 3-2 0-4".split()
+
+
+def test_cycle_length(paths):
+    iter_ = ShardIterator(paths, chunk_size=2, cycle_length=2)
+
+    # Shard 2 is empty, so shard 3 takes its place right away
+    assert ids(iter_) == "0-0 0-1 1-0 1-1 0-2 0-3 0-4 3-0 3-1 3-2".split()
+
+
+def test_deterministic_with_workers(paths):
+    expected = ids(ShardIterator(paths, chunk_size=1, num_workers=1))
+    for _ in range(3):
+        assert ids(ShardIterator(paths, chunk_size=1, num_workers=4)) == expected
+
+
+def test_parse(tmp_path):
+    p = tmp_path / "data.tsv"
+    p.write_text("a\tb\n\nc\td\r\n")
+    iter_ = ShardIterator([str(p)], parse=lambda line: dict(zip("xy", line.split("\t"))))
+
+    assert list(iter_) == [{"x": "a", "y": "b"}, {"x": "c", "y": "d"}]
+
+
+def test_vocab(paths):
+    vocab = Vocab({"ws": StringStore(["a", "b"])})
+    iter_ = ShardIterator(paths, vocab=vocab)
+
+    assert all(s["ws"] == [0, 1] for s in iter_)
+
+
+def test_process_executor(paths):
+    with ProcessPoolExecutor(2) as executor:
+        iter_ = ShardIterator(paths, chunk_size=2, executor=executor)
+        assert ids(iter_) == ids(ShardIterator(paths, chunk_size=2))
+
+
+@pytest.mark.parametrize("stop", [0, 1, 3, 6, 9, 10])
+def test_resume(paths, stop):
+    iter_ = ShardIterator(paths, chunk_size=2, cycle_length=2)
+    expected = ids(iter_)
+
+    it = iter(iter_)
+    head = [next(it)["id"] for _ in range(stop)]
+    state = json.loads(json.dumps(iter_.state_dict()))
+
+    iter_ = ShardIterator(paths, chunk_size=2, cycle_length=2)
+    iter_.load_state_dict(state)
+    assert head + ids(iter_) == expected
+    # State is reset after a full pass
+    assert ids(iter_) == expected
+
+
+def test_iterate_after_break(paths):
+    iter_ = ShardIterator(paths, chunk_size=2)
+    for i, _ in enumerate(iter_):
+        if i == 2:
+            break
+
+    assert ids(iter_) == ids(ShardIterator(paths, chunk_size=2))
+
+
+def test_state_mismatch(paths):
+    state = ShardIterator(paths).state_dict()
+    with pytest.raises(ValueError) as exc:
+        ShardIterator(paths[:2]).load_state_dict(state)
+    assert "state does not match the number of shards" in str(exc.value)
+
+
+def test_no_paths():
+    assert list(ShardIterator([])) == []
+
+
+@pytest.mark.parametrize(
+    "kwargs,msg",
+    [
+        ({"chunk_size": 0}, "chunk size must be greater than 0"),
+        ({"cycle_length": 0}, "cycle length must be greater than 0"),
+        ({"num_workers": 0}, "number of workers must be greater than 0"),
+    ],
+)
+def test_invalid_args(paths, kwargs, msg):
+    with pytest.raises(ValueError) as exc:
+        ShardIterator(paths, **kwargs)
+    assert msg in str(exc.value)
@@ -0,0 +1,60 @@
+from typing import Iterable, Sized
+from unittest.mock import Mock
+
+import pytest
+
+from text2array import Batch, SortedWindowIterator
+
+
+def test_init(rng):
+    samples = [{"n": n} for n in [5, 3, 9, 1, 7, 2, 8, 4, 6, 0, 3]]
+    key = lambda s: s["n"]
+    iter_ = SortedWindowIterator(samples, key, batch_size=2, window_size=2, rng=rng)
+
+    assert isinstance(iter_, Sized)
+    assert len(iter_) == 6
+    assert isinstance(iter_, Iterable)
+    assert iter_.batch_size == 2
+    assert iter_.window_size == 2
+    bs = list(iter_)
+    assert len(bs) == len(iter_)
+    assert all(isinstance(b, Batch) for b in bs)
+    assert all(len(b) <= 2 for b in bs)
+
+    # Each window of 4 samples is sorted and cut into batches
+    windows = [sorted(b[0]["n"] for b in bs[i : i + 2]) for i in range(0, 6, 2)]
+    assert windows == [[1, 5], [2, 7], [0, 6]]
+    for b in bs:
+        assert [s["n"] for s in b] == sorted(s["n"] for s in b)
+
+
+def test_no_shuffle(stream_cls):
+    samples = [{"n": n} for n in [5, 3, 9, 1, 7, 2, 8]]
+    iter_ = SortedWindowIterator(
+        stream_cls(samples), lambda s: s["n"], batch_size=2, window_size=2, shuffle=False
+    )
+
+    with pytest.raises(TypeError):
+        len(iter_)
+    assert [[s["n"] for s in b] for b in iter_] == [[1, 3], [5, 9], [2, 7], [8]]
+
+
+def test_rng_called_correctly(rng):
+    mock_rng = Mock(wraps=rng)
+    samples = [{"n": n} for n in range(10)]
+    key = lambda s: s["n"]
+    list(SortedWindowIterator(samples, key, batch_size=2, window_size=2, rng=mock_rng))
+    assert mock_rng.shuffle.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "kwargs,msg",
+    [
+        (dict(batch_size=0), "batch size must be greater than 0"),
+        (dict(window_size=0), "window size must be greater than 0"),
+    ],
+)
+def test_invalid_args(kwargs, msg):
+    with pytest.raises(ValueError) as exc:
+        SortedWindowIterator([], len, **kwargs)
+    assert msg in str(exc.value)
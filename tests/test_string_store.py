@@ -1,6 +1,7 @@
 from typing import MutableSet, Sequence
 import pickle
 
+import numpy as np  # type: ignore
 import pytest
 
 from text2array import StringStore
@@ -75,3 +76,73 @@ def test_pickling(tmp_path):
         store2 = pickle.load(f)
 
     assert store1 == store2
+
+
+@pytest.mark.parametrize(
+    "size,dtype", [(0, "uint16"), (2 ** 16, "uint16"), (2 ** 16 + 1, "int32")],
+)
+def test_dtype(size, dtype):
+    store = StringStore([str(i) for i in range(size)])
+    assert store.dtype == dtype
+
+
+class TestPrune:
+    @pytest.fixture
+    def store(self):
+        return StringStore(["<pad>", "<unk>", "c", "b", "a", "d"], default="<unk>")
+
+    def test_max_size(self, store):
+        new, mapping = store.prune(max_size=2, keep=["<pad>"])
+        assert new == StringStore(["<pad>", "<unk>", "c", "b"], default="<unk>")
+        assert mapping.tolist() == [0, 1, 2, 3, 1, 1]
+        assert len(store) == 6
+
+    def test_min_count(self, store):
+        counts = {"c": 5, "b": 2, "a": 3, "d": 1}
+        new, mapping = store.prune(min_count=3, counts=counts)
+        assert list(new) == ["<unk>", "c", "a"]
+        assert mapping.tolist() == [0, 0, 1, 0, 2, 0]
+
+    def test_no_default(self):
+        new, mapping = StringStore("abc").prune(max_size=1)
+        assert list(new) == ["a"]
+        assert mapping.tolist() == [0, -1, -1]
+
+    def test_min_count_without_counts(self, store):
+        with pytest.raises(ValueError) as exc:
+            store.prune(min_count=2)
+        assert "counts must be given if min_count is greater than 1" in str(exc.value)
+
+    def test_negative_max_size(self, store):
+        with pytest.raises(ValueError) as exc:
+            store.prune(max_size=-1)
+        assert "max size cannot be less than 0" in str(exc.value)
+
+
+class TestRemap:
+    def test_ok(self):
+        mapping = np.array([0, 1, 1, 2])
+        arr = np.array([[3, 2], [1, 0]], dtype=np.uint16)
+        StringStore.remap(arr, mapping, chunk_size=3)
+        assert arr.dtype == np.uint16
+        assert arr.tolist() == [[2, 1], [1, 0]]
+
+    def test_memmap(self, tmp_path):
+        arr = np.memmap(str(tmp_path / "ids"), dtype=np.int32, mode="w+", shape=(4, 5))
+        arr[:] = np.arange(20).reshape(4, 5) % 4
+        StringStore.remap(arr, np.array([3, 2, 1, 0]), chunk_size=7)
+        arr.flush()
+
+        loaded = np.memmap(str(tmp_path / "ids"), dtype=np.int32, mode="r", shape=(4, 5))
+        assert loaded.tolist() == (3 - np.arange(20).reshape(4, 5) % 4).tolist()
+
+    def test_not_contiguous(self):
+        arr = np.zeros((3, 3), dtype=int)[:, :2]
+        with pytest.raises(ValueError) as exc:
+            StringStore.remap(arr, np.array([0]))
+        assert "array must be C-contiguous" in str(exc.value)
+
+    def test_nonpositive_chunk_size(self):
+        with pytest.raises(ValueError) as exc:
+            StringStore.remap(np.zeros(3, dtype=int), np.array([0]), chunk_size=0)
+        assert "chunk size must be greater than 0" in str(exc.value)
@@ -1,9 +1,11 @@
 from typing import Iterable, MutableMapping
+import pickle
 
 from tqdm import tqdm  # type: ignore
+import numpy as np  # type: ignore
 import pytest
 
-from text2array import StringStore, Vocab
+from text2array import Batch, StringStore, Vocab
 
 
 class TestFromSamples:
@@ -104,6 +106,36 @@ class TestFromSamples:
         assert "b" in vocab["t"]
         assert "c" in vocab["t"]
 
+    def test_frequency_order(self):
+        ss = [{"ws": list("abcbcdcdd")}, {"ws": list("eef")}]
+        vocab = self.from_samples(ss)
+        # Ties are broken by first occurrence
+        assert list(vocab["ws"]) == ["<pad>", "<unk>", "c", "d", "b", "e", "a", "f"]
+
+    def test_share(self):
+        ss = [
+            {"src": ["a", "b"], "tgt": ["b", "c"], "cp": "c"},
+            {"src": ["b"], "tgt": ["d", "c"], "cp": "c"},
+        ]
+        options = {"tgt": {"share": "src", "max_size": 0}, "cp": {"share": "tgt"}}
+        vocab = self.from_samples(ss, options=options)
+
+        assert vocab["src"] is vocab["tgt"] is vocab["cp"]
+        assert list(vocab["src"]) == ["<pad>", "<unk>", "c", "b", "a", "d"]
+        assert vocab.shared == [["src", "tgt", "cp"]]
+
+    def test_share_with_field_without_strings(self):
+        ss = [{"ws": ["a"], "i": 1}]
+        vocab = self.from_samples(ss, options={"ws": {"share": "ts"}})
+        assert list(vocab) == ["ws"]
+        assert list(vocab["ws"]) == ["<pad>", "<unk>", "a"]
+
+    def test_share_cycle(self):
+        options = {"a": {"share": "b"}, "b": {"share": "a"}}
+        with pytest.raises(ValueError) as exc:
+            self.from_samples([{"a": "x", "b": "y"}], options=options)
+        assert "shares its vocabulary in a cycle" in str(exc.value)
+
     def test_iterator_is_passed(self):
         ss = [
             {"ws": ["b", "c"], "w": "c"},
@@ -116,6 +148,23 @@ class TestFromSamples:
         assert "c" in vocab["w"]
 
 
+def test_shared_is_pickled():
+    store = StringStore(["<unk>", "a"], default="<unk>")
+    vocab = Vocab({"src": store, "tgt": store, "w": StringStore("ab")})
+    assert vocab.shared == [["src", "tgt"]]
+
+    vocab2 = pickle.loads(pickle.dumps(vocab))
+    assert vocab2 == vocab
+    assert vocab2["src"] is vocab2["tgt"]
+    assert vocab2["w"] is not vocab2["src"]
+
+
+def test_sizes_and_dtypes():
+    vocab = Vocab({"w": StringStore("abc"), "ws": StringStore(str(i) for i in range(70000))})
+    assert vocab.sizes == {"w": 3, "ws": 70000}
+    assert vocab.dtypes == {"w": "uint16", "ws": "int32"}
+
+
 class TestStoi:
     def test_samples_to_indices(self):
         ss = [
@@ -138,6 +187,140 @@ class TestStoi:
         assert list(vocab.stoi(ss)) == ss
 
 
+class TestStoiCache:
+    def test_ok(self):
+        ss = [
+            {"ws": ["a", "c"], "w": "b", "cs": [["a", "b"], ["c"]], "i": 1},
+            {"ws": ["a", "c"], "w": "b", "cs": [["a"]], "i": 2},
+        ]
+        vocab = Vocab({name: StringStore("abc") for name in ["ws", "w", "cs"]})
+        expected = list(vocab.stoi(ss))
+        vocab.enable_cache()
+
+        assert list(vocab.stoi(ss)) == expected
+        info = vocab.cache_info()
+        assert (info.value_hits, info.value_misses) == (2, 2)
+        # Tokens are cached per store
+        assert (info.token_hits, info.token_misses) == (1, 6)
+        assert info.maxsize == 4096
+
+    def test_result_is_a_copy(self):
+        vocab = Vocab({"ws": StringStore("ab")})
+        vocab.enable_cache()
+        s = next(iter(vocab.stoi([{"ws": ["a", "b"]}])))
+        s["ws"].append(5)
+
+        assert list(vocab.stoi([{"ws": ["a", "b"]}])) == [{"ws": [0, 1]}]
+
+    def test_maxsize(self):
+        vocab = Vocab({"w": StringStore("abc")})
+        vocab.enable_cache(maxsize=2)
+        list(vocab.stoi([{"w": "a"}, {"w": "b"}, {"w": "a"}, {"w": "c"}, {"w": "b"}]))
+
+        info = vocab.cache_info()
+        assert (info.value_hits, info.value_misses) == (1, 4)
+
+    def test_invalidated_on_change(self):
+        vocab = Vocab({"w": StringStore(["<unk>", "a"], default="<unk>")})
+        vocab.enable_cache()
+        assert list(vocab.stoi([{"w": "b"}])) == [{"w": 0}]
+
+        vocab["w"].add("b")
+        assert list(vocab.stoi([{"w": "b"}])) == [{"w": 2}]
+        vocab["w"] = StringStore(["<unk>", "b"], default="<unk>")
+        assert list(vocab.stoi([{"w": "b"}])) == [{"w": 1}]
+        vocab["w"].default = "b"
+        assert list(vocab.stoi([{"w": "c"}, {"w": "c"}])) == [{"w": 1}, {"w": 1}]
+        assert vocab.cache_info().value_hits == 1
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda st: (st.discard("a"), st.add("c")),
+            lambda st: (st.pop(), st.add("c")),
+            lambda st: (st.clear(), st.update(["<unk>", "c", "b"])),
+            lambda st: st.intersection_update(["<unk>", "b"]),
+        ],
+    )
+    def test_invalidated_on_same_size_change(self, change):
+        store = StringStore(["<unk>", "a", "b"], default="<unk>")
+        vocab = Vocab({"w": store})
+        vocab.enable_cache()
+        list(vocab.stoi([{"w": "b"}, {"w": "c"}]))
+
+        change(store)
+        expected = [{"w": store.index("b")}, {"w": store.index("c")}]
+        assert list(vocab.stoi([{"w": "b"}, {"w": "c"}])) == expected
+
+    def test_threads(self):
+        import threading
+
+        vocab = Vocab({"w": StringStore([str(i) for i in range(100)])})
+        vocab.enable_cache(maxsize=10)
+        ss = [{"w": str(i % 100)} for i in range(2000)]
+        expected = list(vocab.stoi(ss))
+        results = []
+
+        def work():
+            results.append(list(vocab.stoi(ss)))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == [expected] * 4
+        info = vocab.cache_info()
+        assert info.value_hits + info.value_misses == 5 * len(ss)
+
+    def test_unknown_raises(self):
+        vocab = Vocab({"w": StringStore("a")})
+        vocab.enable_cache()
+        with pytest.raises(ValueError):
+            list(vocab.stoi([{"w": "b"}]))
+
+    def test_disable(self):
+        vocab = Vocab({"w": StringStore("a")})
+        vocab.enable_cache()
+        list(vocab.stoi([{"w": "a"}]))
+        vocab.disable_cache()
+
+        assert list(vocab.stoi([{"w": "a"}])) == [{"w": 0}]
+        assert vocab.cache_info() == (0, 0, 0, 0, 0)
+
+    def test_shared_store(self):
+        store = StringStore(["<unk>", "a", "b"], default="<unk>")
+        vocab = Vocab({"src": store, "tgt": store})
+        vocab.enable_cache()
+        assert list(vocab.stoi([{"src": ["a", "b"], "tgt": ["b", "a"]}])) == [
+            {"src": [1, 2], "tgt": [2, 1]}
+        ]
+        info = vocab.cache_info()
+        assert (info.token_hits, info.token_misses) == (2, 2)
+
+        store.add("c")
+        assert list(vocab.stoi([{"tgt": "c"}, {"src": "c"}])) == [{"tgt": 3}, {"src": 3}]
+
+    def test_pickle(self):
+        import copy
+
+        vocab = Vocab({"w": StringStore(["<unk>", "a"], default="<unk>")})
+        vocab.enable_cache(maxsize=8)
+        list(vocab.stoi([{"w": "a"}]))
+
+        for v in [pickle.loads(pickle.dumps(vocab)), copy.deepcopy(vocab)]:
+            assert v == vocab
+            assert v.cache_info() == (0, 0, 0, 0, 8)
+            assert list(v.stoi([{"w": "a"}, {"w": "a"}])) == [{"w": 1}, {"w": 1}]
+            assert v.cache_info().value_hits == 1
+
+    def test_nonpositive_maxsize(self):
+        with pytest.raises(ValueError) as exc:
+            Vocab().enable_cache(maxsize=0)
+        assert "max size must be greater than 0" in str(exc.value)
+
+
 class TestItos:
     def test_samples_to_strings(self):
         ss = [
@@ -154,6 +337,96 @@ class TestItos:
         assert list(vocab.itos(ss)) == ss
 
 
+class TestDecode:
+    @pytest.fixture
+    def vocab(self):
+        return Vocab(
+            {
+                "ws": StringStore(["<pad>", "<unk>", "a", "b"], default="<unk>"),
+                "cs": StringStore(["<pad>", "a", "b"]),
+                "t": StringStore(["x", "y"]),
+            }
+        )
+
+    def test_round_trip(self, vocab):
+        ss = [
+            {"ws": ["a", "b", "a"], "cs": [["a", "b"], ["b"]], "t": "y", "i": 1},
+            {"ws": ["b"], "cs": [["a"]], "t": "x", "i": 2},
+        ]
+        arr = Batch(vocab.stoi(ss)).to_array()
+
+        assert vocab.decode(arr) == ss
+
+    @pytest.mark.parametrize("extra", ["with_lengths", "with_mask"])
+    def test_lengths_or_mask(self, vocab, extra):
+        # Padding in the middle of a sequence is kept
+        ss = [{"ws": ["a", "<pad>"], "cs": [["<pad>"], ["a"]]}, {"ws": ["b"], "cs": [["b"]]}]
+        arr = Batch(vocab.stoi(ss)).to_array(**{extra: True})
+
+        assert vocab.decode(arr) == ss
+
+    def test_model_output(self, vocab):
+        preds = np.array([[2, 3, 0], [3, 2, 2]])
+        mask = np.array([[True, False, False], [True, True, True]])
+
+        assert vocab.decode({"ws": preds, "ws_mask": mask}) == [
+            {"ws": ["a"]},
+            {"ws": ["b", "a", "a"]},
+        ]
+
+    def test_no_pad_token(self, vocab):
+        arr = {"t": np.array([[0, 1], [1, 0]]), "i": np.array([[1, 0], [2, 0]])}
+
+        assert vocab.decode(arr) == [
+            {"t": ["x", "y"], "i": [1, 0]},
+            {"t": ["y", "x"], "i": [2, 0]},
+        ]
+
+    def test_all_padding(self, vocab):
+        arr = {"cs": np.zeros((2, 2, 3), dtype=int), "ws": np.zeros((2, 0), dtype=int)}
+
+        assert vocab.decode(arr) == [{"cs": [], "ws": []}, {"cs": [], "ws": []}]
+
+    def test_shared_store(self, vocab):
+        vocab["ws2"] = vocab["ws"]
+        arr = {"ws": np.array([[2, 3]]), "ws2": np.array([[3, 0]])}
+
+        assert vocab.decode(arr) == [{"ws": ["a", "b"], "ws2": ["b"]}]
+
+    def test_empty(self, vocab):
+        assert vocab.decode({}) == []
+
+
+class TestPrune:
+    def test_ok(self):
+        ss = [{"ws": list("aaabbc"), "w": "x"}, {"ws": list("bdd"), "w": "y"}]
+        vocab = Vocab.from_samples(ss, pbar=tqdm(disable=True))
+        counts = {"ws": {"a": 3, "b": 3, "c": 1, "d": 2}}
+        new, mappings = vocab.prune({"ws": {"min_count": 2, "max_size": 2}}, counts=counts)
+
+        assert list(new["ws"]) == ["<pad>", "<unk>", "a", "b"]
+        assert new["w"] == vocab["w"]
+        assert mappings["w"].tolist() == list(range(len(vocab["w"])))
+
+        arr = Batch(vocab.stoi(ss)).to_array()
+        Vocab.remap(arr, mappings)
+        assert arr["ws"].tolist() == Batch(new.stoi(ss)).to_array()["ws"].tolist()
+
+    def test_shared_store(self):
+        store = StringStore(["<pad>", "<unk>", "a", "b"], default="<unk>")
+        vocab = Vocab({"src": store, "tgt": store})
+        new, mappings = vocab.prune({"src": {"max_size": 1}, "tgt": {"max_size": 2}})
+
+        assert new["src"] is new["tgt"]
+        assert list(new["src"]) == ["<pad>", "<unk>", "a"]
+        assert mappings["src"] is mappings["tgt"]
+
+    def test_remap_skips_missing_fields(self):
+        arr = {"ws": np.array([[2, 1]])}
+        Vocab.remap(arr, {"ws": np.array([0, 0, 1]), "w": np.array([0])})
+        assert arr["ws"].tolist() == [[1, 0]]
+
+
 class TestExtend:
     def test_ok(self):
         vocab = Vocab(
@@ -19,12 +19,98 @@ __all__ = [
     "Batch",
     "Vocab",
     "StringStore",
+    "StoiCacheInfo",
     "BatchIterator",
     "BucketIterator",
+    "BucketStats",
+    "CurriculumIterator",
     "ShuffleIterator",
+    "PackingIterator",
+    "FilterIterator",
+    "SortedWindowIterator",
+    "MixingIterator",
+    "Schema",
+    "FieldSchema",
+    "AsyncBatchIterator",
+    "AsyncBucketIterator",
+    "MicroBatcher",
+    "ProcessArrayIterator",
+    "ParquetIterator",
+    "ShardIterator",
+    "ConversionCache",
+    "Profiler",
+    "StageStats",
 ]
 
-from .batches import Batch
-from .samples import Sample
-from .iterators import BatchIterator, BucketIterator, ShuffleIterator
-from .vocab import StringStore, Vocab
+from typing import TYPE_CHECKING, Any, List
+import importlib
+import sys
+
+# Public names and the submodules defining them. Submodules are only imported once one of
+# their names is accessed, so e.g. using `StringStore` does not pay for importing NumPy.
+_SUBMODULES = {
+    "Sample": "samples",
+    "Batch": "batches",
+    "Vocab": "vocab",
+    "StringStore": "vocab",
+    "StoiCacheInfo": "vocab",
+    "BatchIterator": "iterators",
+    "BucketIterator": "iterators",
+    "BucketStats": "iterators",
+    "CurriculumIterator": "iterators",
+    "ShuffleIterator": "iterators",
+    "PackingIterator": "iterators",
+    "FilterIterator": "iterators",
+    "SortedWindowIterator": "iterators",
+    "MixingIterator": "iterators",
+    "Schema": "schema",
+    "FieldSchema": "schema",
+    "AsyncBatchIterator": "aio",
+    "AsyncBucketIterator": "aio",
+    "MicroBatcher": "aio",
+    "ProcessArrayIterator": "parallel",
+    "ParquetIterator": "arrow",
+    "ShardIterator": "shards",
+    "ConversionCache": "cache",
+    "Profiler": "profiling",
+    "StageStats": "profiling",
+}
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        submodule = _SUBMODULES[name]
+    except KeyError:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f".{submodule}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *__all__])
+
+
+if TYPE_CHECKING or sys.version_info < (3, 7):  # pragma: no cover
+    # Module-level __getattr__ is not supported before Python 3.7
+    from .batches import Batch
+    from .samples import Sample
+    from .iterators import (
+        BatchIterator,
+        BucketIterator,
+        BucketStats,
+        CurriculumIterator,
+        FilterIterator,
+        MixingIterator,
+        PackingIterator,
+        ShuffleIterator,
+        SortedWindowIterator,
+    )
+    from .aio import AsyncBatchIterator, AsyncBucketIterator, MicroBatcher
+    from .parallel import ProcessArrayIterator
+    from .arrow import ParquetIterator
+    from .shards import ShardIterator
+    from .cache import ConversionCache
+    from .profiling import Profiler, StageStats
+    from .schema import FieldSchema, Schema
+    from .vocab import StoiCacheInfo, StringStore, Vocab
@@ -0,0 +1,367 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from concurrent.futures import Executor
+from random import Random
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+)
+import asyncio
+
+from .batches import Batch
+from .iterators import BucketIterator
+from .samples import Sample
+
+
+class AsyncBatchIterator(AsyncIterable[Any]):
+    """Asynchronous iterator that produces batches of samples from an asynchronous source.
+
+    This is the asynchronous counterpart of `BatchIterator`. Batches can be converted
+    (e.g. with `Vocab.stoi` and `Batch.to_array`) in an executor, so the conversion does
+    not block the event loop. Conversion of a batch overlaps with collecting the next ones,
+    but batches are always produced in order.
+
+    Example:
+
+        >>> import asyncio
+        >>> from text2array import AsyncBatchIterator, Batch
+        >>> async def source():
+        ...   for i in range(3):
+        ...     yield {'i': i}
+        ...
+        >>> async def main():
+        ...   iter_ = AsyncBatchIterator(source(), batch_size=2, convert=Batch.to_array)
+        ...   async for arr in iter_:
+        ...     print(arr['i'].tolist())
+        ...
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        [0, 1]
+        [2]
+
+    Args:
+        samples (~typing.AsyncIterable[Sample]): Asynchronous iterable of samples to batch.
+        batch_size: Maximum number of samples in each batch.
+        convert (typing.Callable[[Batch], Any]): Callable to apply to every batch in
+            ``executor``, e.g. ``lambda b: Batch(vocab.stoi(b)).to_array()``. If not given,
+            the batches themselves are produced.
+        executor: Executor to run ``convert`` in. If not given, the event loop's default
+            executor is used.
+        max_pending: Maximum number of batches being converted at a time.
+    """
+
+    def __init__(
+        self,
+        samples: AsyncIterable[Sample],
+        batch_size: int = 1,
+        convert: Optional[Callable[[Batch], Any]] = None,
+        executor: Optional[Executor] = None,
+        max_pending: int = 2,
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError("batch size must be greater than 0")
+        if max_pending <= 0:
+            raise ValueError("max pending must be greater than 0")
+
+        self._samples = samples
+        self._bsz = batch_size
+        self._convert = convert
+        self._executor = executor
+        self._max_pending = max_pending
+
+    @property
+    def batch_size(self) -> int:
+        return self._bsz
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        async for x in _convert_batches(
+            self._iter_batches(), self._convert, self._executor, self._max_pending
+        ):
+            yield x
+
+    async def _iter_batches(self) -> AsyncIterator[Batch]:
+        batch = Batch()
+        async for s in self._samples:
+            batch.append(s)
+            if len(batch) == self._bsz:
+                yield batch
+                batch = Batch()
+        if batch:
+            yield batch
+
+
+class AsyncBucketIterator(AsyncIterable[Any]):
+    """Asynchronous iterator that batches together samples from the same bucket.
+
+    This is the asynchronous counterpart of `BucketIterator`. Like it, all samples are
+    read before any batch is produced, which here happens on every iteration. Batches
+    can be converted in an executor as in `AsyncBatchIterator`.
+
+    Args:
+        samples (~typing.AsyncIterable[Sample]): Asynchronous iterable of samples to batch.
+        key (typing.Callable[[Sample], Any]): Callable to get the bucket key of a sample.
+        batch_size: Maximum number of samples in each batch.
+        shuffle_bucket: Whether to shuffle every bucket before batching.
+        rng: Random number generator to use for shuffling. Set this to ensure reproducibility.
+            If not given, an instance of `~random.Random` with the default seed is used.
+        sort_bucket: Whether to sort every bucket before batching.
+        sort_bucket_by (typing.Callable[[Sample], Any]): Callable acting as the sort key
+            if ``sort_bucket=True``.
+        convert (typing.Callable[[Batch], Any]): Callable to apply to every batch in
+            ``executor``. If not given, the batches themselves are produced.
+        executor: Executor to run ``convert`` in. If not given, the event loop's default
+            executor is used.
+        max_pending: Maximum number of batches being converted at a time.
+    """
+
+    def __init__(
+        self,
+        samples: AsyncIterable[Sample],
+        key: Callable[[Sample], Any],
+        batch_size: int = 1,
+        shuffle_bucket: bool = False,
+        rng: Optional[Random] = None,
+        sort_bucket: bool = False,
+        sort_bucket_by: Optional[Callable[[Sample], Any]] = None,
+        convert: Optional[Callable[[Batch], Any]] = None,
+        executor: Optional[Executor] = None,
+        max_pending: int = 2,
+    ) -> None:
+        if max_pending <= 0:
+            raise ValueError("max pending must be greater than 0")
+
+        self._samples = samples
+        self._bucket_kwargs = dict(
+            key=key,
+            batch_size=batch_size,
+            shuffle_bucket=shuffle_bucket,
+            rng=rng,
+            sort_bucket=sort_bucket,
+            sort_bucket_by=sort_bucket_by,
+        )
+        self._convert = convert
+        self._executor = executor
+        self._max_pending = max_pending
+
+    @property
+    def batch_size(self) -> int:
+        return self._bucket_kwargs["batch_size"]  # type: ignore
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        samples = [s async for s in self._samples]
+        iter_ = BucketIterator(samples, **self._bucket_kwargs)  # type: ignore
+        async for x in _convert_batches(
+            _aiter(iter_), self._convert, self._executor, self._max_pending
+        ):
+            yield x
+
+
+class MicroBatcher:
+    """Collector of single samples into batches for online inference.
+
+    Samples are submitted one at a time with `~MicroBatcher.submit` and accumulated into a
+    batch, which is processed as soon as it has ``batch_size`` samples, its padded size
+    reaches ``max_tokens``, or ``max_delay`` seconds have passed since its first sample
+    arrived, whichever comes first. The batch is processed in ``executor``, and every
+    submitter gets back its own slice of the result: if the result is a mapping (like the
+    output of `Batch.to_array`), the slice is a mapping from the same keys to the values'
+    elements at the sample's index, otherwise it is the result's element at that index.
+
+    Example:
+
+        >>> import asyncio
+        >>> from text2array import Batch, MicroBatcher
+        >>> async def main():
+        ...   async with MicroBatcher(Batch.to_array, batch_size=2) as batcher:
+        ...     samples = [{'ws': [1] * n} for n in range(1, 4)]
+        ...     results = await asyncio.gather(*(batcher.submit(s) for s in samples))
+        ...   for r in results:
+        ...     print(r['ws'].tolist())
+        ...
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        [1, 0]
+        [1, 1]
+        [1, 1, 1]
+
+    Args:
+        process (typing.Callable[[Batch], Any]): Callable to process a batch with, e.g.
+            converting it to arrays and running a model on them. The result must be
+            indexable by the position of a sample in the batch, or a mapping whose values
+            are.
+        batch_size: Maximum number of samples in each batch.
+        key (typing.Callable[[Sample], Any]): Callable to get the bucket key of a sample.
+            If given, only samples from the same bucket are batched together, like in
+            `BucketIterator`.
+        max_tokens: Maximum padded size of a batch, i.e. the number of samples times the
+            longest length among them. A sample that alone exceeds it is batched alone.
+        length (typing.Callable[[Sample], int]): Callable to get the length of a sample.
+            Required if ``max_tokens`` is given.
+        max_delay: Maximum number of seconds a sample waits for its batch to fill up.
+        executor: Executor to run ``process`` in. If not given, the event loop's default
+            executor is used.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Batch], Any],
+        batch_size: int = 1,
+        key: Optional[Callable[[Sample], Any]] = None,
+        max_tokens: Optional[int] = None,
+        length: Optional[Callable[[Sample], int]] = None,
+        max_delay: float = 0.01,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError("batch size must be greater than 0")
+        if max_tokens is not None and length is None:
+            raise ValueError("length must be given if max_tokens is given")
+        if max_delay < 0:
+            raise ValueError("max delay cannot be less than 0")
+
+        self._process = process
+        self._bsz = batch_size
+        self._key = key
+        self._max_tokens = max_tokens
+        self._length = length
+        self._max_delay = max_delay
+        self._executor = executor
+        self._groups: Dict[Any, _Group] = {}
+        self._tasks: Set[asyncio.Future] = set()
+
+    @property
+    def batch_size(self) -> int:
+        return self._bsz
+
+    async def submit(self, sample: Sample) -> Any:
+        """Submit a sample and wait for its slice of the processed batch.
+
+        Args:
+            sample: Sample to submit.
+
+        Returns:
+            The sample's slice of the result of processing its batch.
+        """
+        loop = asyncio.get_event_loop()
+        key = None if self._key is None else self._key(sample)
+        n = 0 if self._length is None else self._length(sample)
+
+        group = self._groups.get(key)
+        if group is not None and self._exceeds_max_tokens(group, n, 1):
+            self._flush(key)
+            group = None
+        if group is None:
+            group = self._groups[key] = _Group()
+            group.timer = loop.call_later(self._max_delay, self._flush, key)
+
+        fut = loop.create_future()
+        group.samples.append(sample)
+        group.futures.append(fut)
+        group.maxlen = max(group.maxlen, n)
+        if len(group.samples) >= self._bsz or self._exceeds_max_tokens(group, 0, 0):
+            self._flush(key)
+
+        return await fut
+
+    async def close(self) -> None:
+        """Process all pending samples immediately and wait until they are done."""
+        for key in list(self._groups):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+
+    async def __aenter__(self) -> "MicroBatcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _exceeds_max_tokens(self, group: "_Group", n: int, extra: int) -> bool:
+        if self._max_tokens is None:
+            return False
+        return (len(group.samples) + extra) * max(group.maxlen, n) > self._max_tokens
+
+    def _flush(self, key: Any) -> None:
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        group.timer.cancel()
+        task = asyncio.ensure_future(self._run(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: "_Group") -> None:
+        loop = asyncio.get_event_loop()
+        try:
+            batch = Batch(group.samples)
+            res = await loop.run_in_executor(self._executor, self._process, batch)
+        except Exception as e:
+            for fut in group.futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for i, fut in enumerate(group.futures):
+            if not fut.done():
+                if isinstance(res, Mapping):
+                    fut.set_result({k: v[i] for k, v in res.items()})
+                else:
+                    fut.set_result(res[i])
+
+
+class _Group:
+    def __init__(self) -> None:
+        self.samples: List[Sample] = []
+        self.futures: List[asyncio.Future] = []
+        self.maxlen = 0
+        self.timer: asyncio.Handle
+
+
+async def _aiter(iterable: Iterable[Any]) -> AsyncIterator[Any]:
+    for x in iterable:
+        yield x
+
+
+async def _convert_batches(
+    batches: AsyncIterator[Batch],
+    convert: Optional[Callable[[Batch], Any]],
+    executor: Optional[Executor],
+    max_pending: int,
+) -> AsyncIterator[Any]:
+    if convert is None:
+        async for b in batches:
+            yield b
+        return
+
+    loop = asyncio.get_event_loop()
+    pending: Deque[asyncio.Future] = deque()
+    try:
+        async for b in batches:
+            pending.append(loop.run_in_executor(executor, convert, b))
+            if len(pending) >= max_pending:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for fut in pending:
+            fut.cancel()
@@ -0,0 +1,206 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Sized,
+    Union,
+)
+
+import numpy as np  # type: ignore
+
+from .batches import Batch
+from .samples import FieldName, Sample
+from .vocab import StringStore, Vocab
+
+
+class ParquetIterator(Iterable[Dict[FieldName, np.ndarray]], Sized):
+    """Iterator that converts Arrow data from a Parquet file directly into arrays.
+
+    The file is read one row group at a time, and only the given columns are read. Every
+    chunk of rows is converted to a mapping from column names to arrays like the output
+    of `Batch.to_array`, but without creating a Python object for every value: list
+    columns are padded using their Arrow offsets, and string values are converted to
+    integers with ``vocab`` by dictionary-encoding them, so each distinct string is looked
+    up only once per chunk, into integers of the data type given by `StringStore.dtype`.
+    The rows are also available as samples through `~ParquetIterator.samples`, e.g. to
+    create the vocabulary with `Vocab.from_samples`.
+
+    Example:
+
+        >>> import pyarrow as pa
+        >>> from text2array import ParquetIterator, StringStore, Vocab
+        >>> table = pa.table({'ws': [['a', 'b'], ['b']], 'i': [1, 2]})
+        >>> vocab = Vocab({'ws': StringStore(['<pad>', 'a', 'b'])})
+        >>> for arr in ParquetIterator(table, vocab=vocab):
+        ...   print(arr['ws'].tolist(), arr['i'].tolist())
+        ...
+        [[1, 2], [2, 0]] [1, 2]
+
+    Args:
+        source: Path to a Parquet file, a `pyarrow.parquet.ParquetFile`, or a
+            `pyarrow.Table`, which is treated as a single row group.
+        columns: Names of the columns to read. If not given, all columns are read.
+        batch_size: Maximum number of rows converted together. If not given, every row
+            group is converted as a whole.
+        vocab: Vocabulary to convert string values of the fields in it with.
+        pad_with: Pad list values with this value. Can also be a mapping from field
+            names to padding value for that field, like in `Batch.to_array`.
+        with_lengths: Whether to also return the lengths of list values, named like in
+            `Batch.to_array`.
+
+    Note:
+        This iterator requires `pyarrow <https://arrow.apache.org>`_. Columns with null
+        values are not supported.
+    """
+
+    def __init__(
+        self,
+        source: Any,
+        columns: Optional[Sequence[FieldName]] = None,
+        batch_size: Optional[int] = None,
+        vocab: Optional[Vocab] = None,
+        pad_with: Union[int, float, bool, Mapping[FieldName, Union[int, float, bool]]] = 0,
+        with_lengths: bool = False,
+    ) -> None:
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError("batch size must be greater than 0")
+        if vocab is None:
+            vocab = Vocab()
+
+        self._source = source
+        self._columns = None if columns is None else list(columns)
+        self._bsz = batch_size
+        self._vocab = vocab
+        self._pad_with = pad_with
+        self._with_lengths = with_lengths
+
+    @property
+    def batch_size(self) -> Optional[int]:
+        return self._bsz
+
+    @property
+    def samples(self) -> Iterable[Sample]:
+        """Iterable of the rows (restricted to the read columns) as samples.
+
+        Unlike this iterator, it creates Python objects for every value. It can be iterated
+        over more than once.
+        """
+        return _SampleIterable(self)
+
+    def __len__(self) -> int:
+        return sum(self._nchunks(n) for n in self._row_group_sizes())
+
+    def __iter__(self) -> Iterator[Dict[FieldName, np.ndarray]]:
+        for table in self._iter_chunks():
+            yield self._to_array(table)
+
+    def _iter_chunks(self) -> Iterator[Any]:
+        import pyarrow as pa  # type: ignore
+
+        tables: Iterable[Any]
+        if isinstance(self._source, pa.Table):
+            table = self._source
+            tables = [table if self._columns is None else table.select(self._columns)]
+        else:
+            pf = self._open()
+            tables = (
+                pf.read_row_group(i, columns=self._columns) for i in range(pf.num_row_groups)
+            )
+
+        for table in tables:
+            bsz = table.num_rows if self._bsz is None else self._bsz
+            for start in range(0, table.num_rows, bsz):
+                yield table.slice(start, bsz)
+
+    def _row_group_sizes(self) -> List[int]:
+        import pyarrow as pa
+
+        if isinstance(self._source, pa.Table):
+            return [self._source.num_rows]
+        metadata = self._open().metadata
+        return [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+
+    def _nchunks(self, nrows: int) -> int:
+        if self._bsz is None:
+            return 1 if nrows else 0
+        return nrows // self._bsz + (1 if nrows % self._bsz != 0 else 0)
+
+    def _open(self) -> Any:
+        import pyarrow.parquet as pq  # type: ignore
+
+        if isinstance(self._source, pq.ParquetFile):
+            return self._source
+        return pq.ParquetFile(self._source)
+
+    def _to_array(self, table: Any) -> Dict[FieldName, np.ndarray]:
+        import pyarrow as pa
+
+        arr: Dict[FieldName, np.ndarray] = {}
+        for name in table.column_names:
+            col = table.column(name).combine_chunks()
+            lens = []
+            while pa.types.is_list(col.type) or pa.types.is_large_list(col.type):
+                if col.null_count:
+                    raise ValueError(f"field '{name}' has null values")
+                offsets = col.offsets.to_numpy()
+                lens.append(np.diff(offsets))
+                col = col.values.slice(offsets[0], offsets[-1] - offsets[0])
+            if col.null_count:
+                raise ValueError(f"field '{name}' has null values")
+
+            flat = self._leaf_to_array(col, self._vocab.get(name))
+            if not lens:
+                arr[name] = flat
+                continue
+
+            pad = Batch._get_option(self._pad_with, name, 0)
+            arr[name], padded_lens = Batch._pad_flat(flat, lens, pad)
+            if self._with_lengths:
+                for d, ls in enumerate(padded_lens, 1):
+                    key = f"{name}_len{d}"
+                    if key in table.column_names:
+                        raise ValueError(
+                            f"cannot add '{key}' since a field with that name exists"
+                        )
+                    arr[key] = ls
+        return arr
+
+    @staticmethod
+    def _leaf_to_array(col: Any, store: Optional[StringStore]) -> np.ndarray:
+        import pyarrow as pa
+
+        is_str = pa.types.is_string(col.type) or pa.types.is_large_string(col.type)
+        if store is None or not is_str:
+            a = col.to_numpy(zero_copy_only=False)
+            return a.astype(str) if is_str else a
+        enc = col.dictionary_encode()
+        ids = np.array([store.index(w) for w in enc.dictionary.to_pylist()], dtype=store.dtype)
+        return ids[enc.indices.to_numpy()]
+
+
+class _SampleIterable(Iterable[Sample]):
+    def __init__(self, parent: ParquetIterator) -> None:
+        self._parent = parent
+
+    def __iter__(self) -> Iterator[Sample]:
+        for table in self._parent._iter_chunks():
+            yield from table.to_pylist()
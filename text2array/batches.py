@@ -12,32 +12,175 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import UserList
-from functools import reduce
-from typing import Dict, List, Mapping, MutableSequence, Optional, Sequence, Union, cast
+from functools import lru_cache
+from itertools import chain
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableSequence,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
 
 import numpy as np  # type: ignore
 
+from .profiling import _span
 from .samples import FieldName, FieldValue, Sample
+from .schema import FieldSchema, Schema
 
 
-class Batch(UserList, MutableSequence[Sample]):
+class Batch(MutableSequence[Sample]):
     """A class to represent a single batch.
 
+    A batch either holds its own list of samples or is a view of a contiguous range of an
+    indexable source (see `~Batch.view`). A view does not copy any samples until the batch
+    is modified, at which point it gets its own list. Like a list, batches can be sorted in
+    place, copied, concatenated with ``+``, and repeated with ``*``.
+
     Args:
-        samples (~typing.Sequence[Sample]): Sequence of samples this batch
-            should contain.
+        samples (~typing.Iterable[Sample]): Samples this batch should contain.
     """
 
-    def __init__(self, samples: Optional[Sequence[Sample]] = None) -> None:
-        # constructor required; see https://docs.python.org/3.6/library/collections.html#collections.UserList
-        if samples is None:
-            samples = []
-        super().__init__(samples)
+    __slots__ = ("_source", "_range")
+
+    _TRUNCATE_SIDES = ("tail", "head", "both")
+    # Sequential fields with at most this many values are padded sequence by sequence,
+    # which is faster than the scatter of _pad_flat for small batches
+    _MAX_NESTED_PADDING_VALUES = 256
+
+    def __init__(self, samples: Optional[Iterable[Sample]] = None) -> None:
+        self._source: Sequence[Sample] = [] if samples is None else list(samples)
+        self._range: Optional[range] = None
+
+    @classmethod
+    def view(cls, source: Sequence[Sample], start: int, stop: int) -> "Batch":
+        """Make a batch viewing ``source[start:stop]`` without copying the samples.
+
+        Changes made to ``source`` afterwards are visible in the batch, as long as the
+        batch itself is not modified.
+
+        Args:
+            source (~typing.Sequence[Sample]): Indexable source of samples.
+            start: Index of the first sample in the batch.
+            stop: Index after the last sample in the batch.
+
+        Returns:
+            Batch: The batch viewing the range.
+        """
+        return cls._make(source, range(len(source))[start:stop])
+
+    @classmethod
+    def _make(cls, source: Sequence[Sample], rng: Optional[range] = None) -> "Batch":
+        # Skips the copy made by __init__
+        batch = cls.__new__(cls)
+        batch._source, batch._range = source, rng
+        return batch
+
+    def _samples(self) -> List[Sample]:
+        # Detach a view from its source before modifying it
+        if self._range is not None:
+            self._source = [self._source[i] for i in self._range]
+            self._range = None
+        return self._source  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self._source if self._range is None else self._range)
+
+    def __iter__(self) -> Iterator[Sample]:
+        if self._range is None:
+            return iter(self._source)
+        return map(self._source.__getitem__, self._range)
+
+    @overload
+    def __getitem__(self, i: int) -> Sample:
+        ...  # pragma: no cover
+
+    @overload
+    def __getitem__(self, i: slice) -> "Batch":
+        ...  # pragma: no cover
+
+    def __getitem__(self, i):
+        if self._range is None:
+            if isinstance(i, slice):
+                return self._make(self._source[i])
+            return self._source[i]
+        if isinstance(i, slice):
+            return self._make(self._source, self._range[i])
+        return self._source[self._range[i]]
+
+    def __setitem__(self, i, value):
+        self._samples()[i] = value
+
+    def __delitem__(self, i):
+        del self._samples()[i]
+
+    def insert(self, i: int, value: Sample) -> None:
+        self._samples().insert(i, value)
+
+    @property
+    def data(self) -> List[Sample]:
+        """The list of samples of this batch, which can be modified in place or replaced."""
+        return self._samples()
+
+    @data.setter
+    def data(self, samples: List[Sample]) -> None:
+        self._source, self._range = samples, None
+
+    def sort(self, *args, **kwargs) -> None:
+        self._samples().sort(*args, **kwargs)
+
+    def copy(self) -> "Batch":
+        return self.__class__(self)
+
+    def __add__(self, other: Iterable[Sample]) -> "Batch":
+        return self._make([*self, *other])
+
+    def __radd__(self, other: Iterable[Sample]) -> "Batch":
+        return self._make([*other, *self])
+
+    def __iadd__(self, other: Iterable[Sample]) -> "Batch":
+        # Copy first, in case other is this batch
+        self._samples().extend(list(other))
+        return self
+
+    def __mul__(self, n: int) -> "Batch":
+        return self._make(list(self) * n)
+
+    __rmul__ = __mul__
+
+    def __imul__(self, n: int) -> "Batch":
+        samples = self._samples()
+        samples *= n
+        return self
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Batch, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def __reduce__(self):
+        # Views are pickled with only the samples they see
+        return (self.__class__, (list(self),))
 
     def to_array(
         self,
         pad_with: Union[int, float, bool, Mapping[FieldName, Union[int, float, bool]]] = 0,
+        max_len: Optional[Mapping[FieldName, Union[int, Sequence[Optional[int]]]]] = None,
+        truncate: Union[str, Mapping[FieldName, str]] = "tail",
+        with_lengths: bool = False,
+        with_mask: bool = False,
+        packed: bool = False,
+        schema: Optional[Schema] = None,
     ) -> Dict[FieldName, np.ndarray]:
         """Convert the batch into `~numpy.ndarray`.
 
@@ -46,95 +189,301 @@ class Batch(UserList, MutableSequence[Sample]):
                 also be a mapping from field names to padding value for
                 that field. Fields whose name is not in the mapping will
                 be padded with zeros.
+            max_len: Mapping from field names to the maximum length of the
+                field's sequential values. Values longer than this are truncated
+                while padding. The maximum length can be an `int`, which limits
+                only the outermost sequence, or a sequence of ``Optional[int]``
+                limiting each nesting level in turn, starting from the outermost
+                one, where ``None`` means no limit for that level. For example,
+                ``{'cs': [None, 20]}`` keeps all words but at most 20 characters
+                per word. Fields whose name is not in the mapping are not truncated.
+            truncate: Which part of a too long sequence to drop. Can be ``tail``
+                (drop the end), ``head`` (drop the beginning), or ``both`` (drop
+                both ends evenly, keeping the middle). Can also be a mapping from
+                field names to one of these values for that field. Fields whose name
+                is not in the mapping are truncated at the tail.
+            with_lengths: Whether to also return the lengths of sequential field values.
+                For a field ``name`` nested ``k`` levels deep, arrays named ``name_len1``,
+                ..., ``name_lenk`` are returned, where ``name_lenj`` contains the length
+                of every sequence at nesting level ``j`` (after truncation) and has the
+                shape of the first ``j`` dimensions of the field's array. Lengths of
+                padding sequences are zero.
+            with_mask: Whether to also return a boolean array named ``name_mask`` for
+                every sequential field ``name``, having the same shape as the field's
+                array and being ``True`` exactly at the entries which are not padding.
+                Unlike comparing against the padding value, this is correct even
+                if the padding value also occurs in the data.
+            packed: Whether to return sequential fields in packed form instead of padding
+                them. For a field ``name`` nested ``k`` levels deep, the array ``name``
+                then contains all of the field's (truncated) elements concatenated into
+                one flat array, and arrays named ``name_offsets1``, ..., ``name_offsetsk``
+                are returned, where ``name_offsetsj`` holds the cumulative lengths of
+                the sequences at nesting level ``j`` in order, starting from zero. Thus,
+                the ``i``-th sequence at level ``j`` spans items ``name_offsetsj[i]`` to
+                ``name_offsetsj[i+1]`` of level ``j+1`` (or of the flat array if
+                ``j == k``). In this form, ``name_lenj`` returned by ``with_lengths``
+                is flat as well, and ``pad_with`` and ``with_mask`` do not apply.
+            schema: Structure of the fields. For fields in the schema, the nesting depth
+                is taken from it instead of being discovered (and checked) from the
+                values, the padding value is taken from it instead of from ``pad_with``,
+                and the array has the data type it specifies. The samples must conform
+                to the schema; see `Schema.validate`.
 
         Returns:
             A mapping from field names to arrays whose first dimension
-            corresponds to the batch size as returned by `len`.
+            corresponds to the batch size as returned by `len`, except
+            for packed fields.
         """
+        with _span("to_array") as span:
+            span.samples = len(self)
+            return self._to_array(
+                pad_with, max_len, truncate, with_lengths, with_mask, packed, schema, span
+            )
+
+    def _to_array(
+        self,
+        pad_with: Union[int, float, bool, Mapping[FieldName, Union[int, float, bool]]],
+        max_len: Optional[Mapping[FieldName, Union[int, Sequence[Optional[int]]]]],
+        truncate: Union[str, Mapping[FieldName, str]],
+        with_lengths: bool,
+        with_mask: bool,
+        packed: bool,
+        schema: Optional[Schema],
+        span: Any,
+    ) -> Dict[FieldName, np.ndarray]:
         if not self:
             return {}
+        if packed and with_mask:
+            raise ValueError("cannot return masks for packed fields")
 
-        field_names = self[0].keys()
+        if max_len is None:
+            max_len = {}
 
-        if isinstance(pad_with, int):
-            pad_dict = {name: pad_with for name in field_names}
-        else:
-            pad_dict = cast(dict, pad_with)
-
-        arr = {}
-        for name in field_names:
+        arr: Dict[FieldName, np.ndarray] = {}
+        ntokens = 0
+        for name in self[0].keys():
             values = self._get_values(name)
+            fs = None if schema is None else schema.get(name)
+            pad = self._get_option(pad_with, name, 0) if fs is None else fs.pad
+            side = self._get_option(truncate, name, "tail")
+            if side not in self._TRUNCATE_SIDES:
+                raise ValueError(f"invalid truncation '{side}' for field '{name}'")
+            caps = self._get_caps(max_len.get(name))
 
-            # Get max length for all depths, 1st elem is batch size
-            try:
-                maxlens = self._get_maxlens(values)
-            except self._InconsistentDepthError:
-                raise ValueError(f"field '{name}' has inconsistent nesting depth")
+            if packed:
+                ntokens += self._add_packed(arr, name, values, caps, side, with_lengths, fs)
+                continue
 
-            # Get padding for all depths
-            paddings = self._get_paddings(maxlens, pad_dict.get(name, 0))
-            # Pad the values
-            data = self._pad(values, maxlens, paddings, 0)
+            flat, lens = self._pack_field(name, values, caps, side, fs)
+            dtype = None if fs is None else fs.dtype
+            if not lens:
+                arr[name] = np.array(flat, dtype=dtype)
+                continue
+            ntokens += len(flat)
 
-            arr[name] = np.array(data)
+            if len(flat) <= self._MAX_NESTED_PADDING_VALUES:
+                arr[name], padded_lens = self._pad_nested(flat, lens, pad, dtype)
+            else:
+                # Scatter the values into the padded array in one go, instead of padding
+                # every sequence, which is linear in the number of values at any depth
+                lens_ = [np.array(ls, dtype=int) for ls in lens]
+                arr[name], padded_lens = self._pad_flat(flat, lens_, pad, dtype)
+            if with_lengths:
+                for d, ls in enumerate(padded_lens, 1):
+                    self._set_extra(arr, f"{name}_len{d}", ls)
+            if with_mask:
+                mask = np.arange(arr[name].shape[-1]) < padded_lens[-1][..., np.newaxis]
+                self._set_extra(arr, f"{name}_mask", mask)
 
+        span.tokens = ntokens
         return arr
 
+    def _add_packed(
+        self,
+        arr: Dict[FieldName, np.ndarray],
+        name: FieldName,
+        values: Sequence[FieldValue],
+        caps: Sequence[Optional[int]],
+        side: str,
+        with_lengths: bool,
+        fs: Optional[FieldSchema] = None,
+    ) -> int:
+        # Returns the number of values if the field is sequential, 0 otherwise
+        flat, lens = self._pack_field(name, values, caps, side, fs)
+        arr[name] = np.array(flat, dtype=None if fs is None else fs.dtype)
+        for d, ls in enumerate(lens, 1):
+            self._set_extra(arr, f"{name}_offsets{d}", np.cumsum([0, *ls]))
+            if with_lengths:
+                self._set_extra(arr, f"{name}_len{d}", np.array(ls, dtype=int))
+        return len(flat) if lens else 0
+
+    def _pack_field(
+        self,
+        name: FieldName,
+        values: Sequence[FieldValue],
+        caps: Sequence[Optional[int]],
+        side: str,
+        fs: Optional[FieldSchema] = None,
+    ) -> Tuple[Sequence[FieldValue], List[List[int]]]:
+        try:
+            flat, lens = self._pack(values, caps, side, None if fs is None else fs.depth)
+        except self._InconsistentDepthError:
+            raise ValueError(f"field '{name}' has inconsistent nesting depth")
+        if len(caps) > len(lens) + 1:
+            raise ValueError(f"field '{name}' has fewer nesting levels than max_len")
+        return flat, lens
+
+    def _set_extra(self, arr: Dict[FieldName, np.ndarray], key: str, a: np.ndarray) -> None:
+        if key in arr or key in self[0]:
+            raise ValueError(f"cannot add '{key}' since a field with that name exists")
+        arr[key] = a
+
+    @staticmethod
+    def _get_option(opt, name: FieldName, default):
+        if isinstance(opt, Mapping):
+            return opt.get(name, default)
+        return opt
+
+    @staticmethod
+    def _get_caps(max_len: Union[None, int, Sequence[Optional[int]]]) -> List[Optional[int]]:
+        # 1st elem is for the batch dimension, which is never truncated
+        if max_len is None:
+            return [None]
+        if isinstance(max_len, int):
+            max_len = [max_len]
+        if any(m is not None and m <= 0 for m in max_len):
+            raise ValueError("max_len must be greater than 0")
+        return [None, *max_len]
+
     def _get_values(self, name: str) -> Sequence[FieldValue]:
         try:
             return [s[name] for s in self]
         except KeyError:
             raise KeyError(f"some samples have no field '{name}'")
 
-    @classmethod
-    def _get_maxlens(cls, values: Sequence[FieldValue]) -> List[int]:
-        assert values
-
-        # Base case
-        if isinstance(values[0], str) or not isinstance(values[0], Sequence):
-            return [len(values)]
-
-        # Recursive case
-        maxlenss = [cls._get_maxlens(x) for x in values]  # type: ignore
-        if not all(len(x) == len(maxlenss[0]) for x in maxlenss):
-            raise cls._InconsistentDepthError
-
-        maxlens = reduce(lambda ml1, ml2: [max(l1, l2) for l1, l2 in zip(ml1, ml2)], maxlenss)
-        maxlens.insert(0, len(values))
-        return maxlens
+    @staticmethod
+    def _truncate(
+        values: Sequence[FieldValue], caps: Sequence[Optional[int]], side: str, depth: int,
+    ) -> Sequence[FieldValue]:
+        maxlen = caps[depth] if depth < len(caps) else None
+        if maxlen is None or len(values) <= maxlen:
+            return values
+        if side == "tail":
+            return values[:maxlen]
+        if side == "head":
+            return values[len(values) - maxlen :]
+        start = (len(values) - maxlen) // 2
+        return values[start : start + maxlen]
 
     @classmethod
-    def _get_paddings(cls, maxlens: List[int], with_: int) -> List[Union[int, List[int]]]:
-        res: list = [with_]
-        for maxlen in reversed(maxlens[1:]):
-            res.append([res[-1] for _ in range(maxlen)])
-        res.reverse()
-        return res
+    def _pack(
+        cls,
+        values: Sequence[FieldValue],
+        caps: Sequence[Optional[int]],
+        side: str,
+        maxdepth: Optional[int] = None,
+    ) -> Tuple[Sequence[FieldValue], List[List[int]]]:
+        # Flatten one nesting level at a time, so each level's lengths come out in order
+        lens = []
+        depth = 0
+        while values if maxdepth is None else depth < maxdepth:
+            if maxdepth is None:
+                # Checking the (few) distinct types is much faster than checking every value
+                leaves = {cls._is_leaf_type(t) for t in set(map(type, values))}
+                if len(leaves) > 1:
+                    raise cls._InconsistentDepthError
+                if leaves.pop():
+                    break
+            depth += 1
+            if depth < len(caps) and caps[depth] is not None:
+                values = [cls._truncate(x, caps, side, depth) for x in values]  # type: ignore
+            lens.append(list(map(len, values)))  # type: ignore
+            values = list(chain.from_iterable(values))  # type: ignore
+        return values, lens
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _is_leaf_type(type_: type) -> bool:
+        # Cached, since checking against the Sequence ABC dominates for small batches
+        return issubclass(type_, str) or not issubclass(type_, Sequence)
 
     @classmethod
-    def _pad(
+    def _pad_nested(
         cls,
         values: Sequence[FieldValue],
-        maxlens: List[int],
-        paddings: List[Union[int, List[int]]],
-        depth: int,
-    ) -> Sequence[FieldValue]:
-        assert values
-        assert len(maxlens) == len(paddings)
-        assert depth < len(maxlens)
-
-        # Base case
-        if isinstance(values[0], str) or not isinstance(values[0], Sequence):
-            values_ = list(values)
-        # Recursive case
-        else:
-            values_ = [
-                cls._pad(x, maxlens, paddings, depth + 1) for x in values  # type: ignore
-            ]
-
-        for _ in range(maxlens[depth] - len(values)):
-            values_.append(paddings[depth])
-        return values_
+        lens: Sequence[Sequence[int]],
+        pad: Union[int, float, bool, str],
+        dtype: Optional[str] = None,
+    ) -> Tuple[np.ndarray, List[np.ndarray]]:
+        # Same as _pad_flat, but by padding nested lists, whose shape is fixed afterwards
+        # since NumPy drops the dimensions after one of length 0
+        shape = [len(lens[0]), *(max(ls, default=0) for ls in lens)]
+        a = np.array(cls._nest(values, lens, pad), dtype=dtype).reshape(shape)
+        padded_lens = [np.array(lens[0], dtype=int)]
+        for d in range(1, len(lens)):
+            ls = cls._nest(lens[d], lens[:d], 0)
+            padded_lens.append(np.array(ls, dtype=int).reshape(shape[: d + 1]))
+        return a, padded_lens
+
+    @staticmethod
+    def _nest(values: Sequence[Any], lens: Sequence[Sequence[int]], pad: Any) -> List[Any]:
+        # Group flat values into padded nested lists, from the innermost level out
+        items, filler = list(values), pad
+        for ls in reversed(lens):
+            maxlen = max(ls, default=0)
+            seqs, start = [], 0
+            for n in ls:
+                seq = items[start : start + n]
+                seq.extend([filler] * (maxlen - n))
+                seqs.append(seq)
+                start += n
+            items, filler = seqs, [filler] * maxlen
+        return items
+
+    @staticmethod
+    def _pad_flat(
+        values: Union[Sequence[FieldValue], np.ndarray],
+        lens: Sequence[np.ndarray],
+        pad: Union[int, float, bool, str],
+        dtype: Optional[str] = None,
+    ) -> Tuple[np.ndarray, List[np.ndarray]]:
+        # Scatter flat values into a padded array given the lengths at every nesting level,
+        # in time linear in the number of values. Each level's sequences are located by
+        # their flat index into the array of the first few dimensions.
+        maxlens = [len(lens[0]), *(int(ls.max()) if ls.size else 0 for ls in lens)]
+        index = np.arange(maxlens[0])
+        padded_lens = []
+        size = maxlens[0]  # number of entries in the first d dimensions
+        for d, ls in enumerate(lens, 1):
+            pl = np.zeros(size, dtype=int)
+            pl[index] = ls
+            padded_lens.append(pl.reshape(maxlens[:d]))
+            starts = np.repeat(ls.cumsum() - ls, ls)
+            index = index.repeat(ls) * maxlens[d] + np.arange(len(starts)) - starts
+            size *= maxlens[d]
+
+        flat = np.asarray(values, dtype=dtype)
+        if size == flat.size:
+            # Nothing to pad, so the values are already in order
+            return flat.reshape(maxlens), padded_lens
+        out_dtype = flat.dtype
+        if dtype is None:
+            try:
+                if flat.dtype.kind in "iu" and type(pad) is int:
+                    # Keep compact integer types unless the padding does not fit
+                    out_dtype = np.result_type(flat, np.min_scalar_type(pad))
+                else:
+                    # Same as converting the values with the padding, e.g. a string pad
+                    # turns numbers into strings and keeps strings as narrow as possible
+                    out_dtype = np.result_type(flat.dtype, np.asarray(pad).dtype)
+            except TypeError:
+                out_dtype = np.array([*flat.tolist(), pad]).dtype
+            if out_dtype.kind == "U" and flat.dtype.kind != "U":
+                # Convert every value on its own, so e.g. 2 stays '2' among floats
+                flat = np.asarray(values, dtype=out_dtype)
+        out = np.full(size, pad, dtype=out_dtype)
+        out[index] = flat
+        return out.reshape(maxlens), padded_lens
 
     class _InconsistentDepthError(Exception):
         pass
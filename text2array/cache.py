@@ -0,0 +1,243 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np  # type: ignore
+
+from .batches import Batch
+from .samples import Sample
+from .vocab import Vocab
+
+
+class ConversionCache:
+    """On-disk cache of samples converted by `Vocab.stoi`.
+
+    Converted samples are stored in a directory, one file per combination of vocabulary
+    and input, and loaded back instead of converting the samples again. An entry is
+    identified by fingerprints of both: the vocabulary's fingerprint covers all of its
+    fields, strings and default values, and the input's fingerprint covers either the
+    source files the samples are read from (their paths, sizes and modification times) or
+    the samples themselves. A change to either thus results in a cache miss. Every field
+    is stored as flat NumPy arrays of its values and of its sequence lengths, using the
+    smallest integer type that fits. Fields that cannot be stored this way, e.g. whose
+    values mix types, are pickled instead. When the files take up more than ``max_bytes``
+    in total, the least recently used ones are removed.
+
+    Example:
+
+        >>> import tempfile
+        >>> from text2array import ConversionCache, StringStore, Vocab
+        >>> cache = ConversionCache(tempfile.mkdtemp())
+        >>> vocab = Vocab({'ws': StringStore(['a', 'b'])})
+        >>> samples = [{'ws': ['a', 'b'], 'i': 1}, {'ws': ['b'], 'i': 2}]
+        >>> cache.stoi(vocab, samples)
+        [{'ws': [0, 1], 'i': 1}, {'ws': [1], 'i': 2}]
+        >>> cache.stoi(vocab, samples)
+        [{'ws': [0, 1], 'i': 1}, {'ws': [1], 'i': 2}]
+        >>> cache.hits, cache.misses
+        (1, 1)
+
+    Args:
+        directory: Directory to store the cache files in. It is created if it does not
+            exist.
+        max_bytes: Maximum total size of the cache files. If not given, files are never
+            removed.
+
+    Attributes:
+        hits: Number of calls to `~ConversionCache.stoi` answered from the cache.
+        misses: Number of calls to `~ConversionCache.stoi` that converted the samples.
+    """
+
+    _SUFFIX = ".npz"
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None) -> None:
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max bytes must be greater than 0")
+        os.makedirs(directory, exist_ok=True)
+
+        self._dir = directory
+        self._max_bytes = max_bytes
+        self.hits = self.misses = 0
+
+    def stoi(
+        self,
+        vocab: Vocab,
+        samples: Iterable[Sample],
+        source: Optional[Union[str, Sequence[str]]] = None,
+    ) -> List[Sample]:
+        """Convert samples with a vocabulary, using the cache if possible.
+
+        Args:
+            vocab: Vocabulary to convert the samples with.
+            samples (~typing.Iterable[Sample]): Samples to convert.
+            source: Path(s) of the files ``samples`` are read from. If given, the input is
+                fingerprinted by the files, so ``samples`` is not even iterated over on a
+                cache hit, and the entry for earlier contents of the same files is removed
+                when a new one is stored. Otherwise, it is fingerprinted by the samples.
+
+        Returns:
+            ~typing.List[Sample]: Converted samples.
+        """
+        if source is None:
+            samples = list(samples)
+            prefix, input_fp = "", self._fingerprint_samples(samples)
+        else:
+            paths = [source] if isinstance(source, str) else list(source)
+            prefix = self._hash(repr([os.path.abspath(p) for p in paths]).encode()) + "-"
+            input_fp = self._fingerprint_files(paths)
+
+        name = prefix + self._hash((self._fingerprint_vocab(vocab) + input_fp).encode())
+        path = os.path.join(self._dir, name + self._SUFFIX)
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+            return self._load(path)
+
+        self.misses += 1
+        converted = list(vocab.stoi(samples))
+        if prefix:
+            self._remove_stale(prefix, path)
+        self._save(path, converted)
+        self._evict(path)
+        return converted
+
+    def clear(self) -> None:
+        """Remove all cache files."""
+        for path in self._entries():
+            os.remove(path)
+
+    def _entries(self) -> List[str]:
+        names = [f for f in os.listdir(self._dir) if f.endswith(self._SUFFIX)]
+        return [os.path.join(self._dir, f) for f in names]
+
+    def _remove_stale(self, prefix: str, keep: str) -> None:
+        for path in self._entries():
+            if os.path.basename(path).startswith(prefix) and path != keep:
+                os.remove(path)
+
+    def _evict(self, keep: str) -> None:
+        if self._max_bytes is None:
+            return
+        stats = [(os.stat(p), p) for p in self._entries()]
+        total = sum(st.st_size for st, _ in stats)
+        for st, path in sorted(stats, key=lambda x: x[0].st_mtime_ns):
+            if total <= self._max_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= st.st_size
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @classmethod
+    def _fingerprint_vocab(cls, vocab: Vocab) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        # Stores shared by several fields are hashed only once
+        digests: Dict[int, str] = {}
+        for name in sorted(vocab):
+            store = vocab[name]
+            if id(store) not in digests:
+                digests[id(store)] = cls._hash("\0".join(store).encode())
+            h.update(repr((name, store.default, len(store), digests[id(store)])).encode())
+        return h.hexdigest()
+
+    @classmethod
+    def _fingerprint_files(cls, paths: Sequence[str]) -> str:
+        stats = [os.stat(p) for p in paths]
+        data = [(os.path.abspath(p), st.st_size, st.st_mtime_ns) for p, st in zip(paths, stats)]
+        return cls._hash(repr(data).encode())
+
+    @staticmethod
+    def _fingerprint_samples(samples: Iterable[Sample]) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        for s in samples:
+            h.update(repr(sorted(s.items())).encode())
+        return h.hexdigest()
+
+    @classmethod
+    def _save(cls, path: str, samples: Sequence[Sample]) -> None:
+        names = list(samples[0]) if samples else []
+        arrays: Dict[str, Any] = {}
+        fields: List[Dict[str, Any]] = []
+        if any(s.keys() != samples[0].keys() for s in samples):
+            # Samples with different fields are pickled as a whole
+            arrays["samples"] = np.frombuffer(pickle.dumps(samples), dtype=np.uint8)
+            names = []
+
+        for k, name in enumerate(names):
+            values = [s[name] for s in samples]
+            try:
+                flat, lens = Batch._pack(values, [None], "tail")
+                a = cls._to_array(flat)
+            except Batch._InconsistentDepthError:
+                a = None
+            if a is None:
+                arrays[f"{k}.values"] = np.frombuffer(pickle.dumps(values), dtype=np.uint8)
+                fields.append({"name": name, "pickled": True})
+                continue
+
+            arrays[f"{k}.values"] = a
+            for d, ls in enumerate(lens, 1):
+                arrays[f"{k}.len{d}"] = cls._to_array(ls)
+            fields.append({"name": name, "pickled": False, "depth": len(lens)})
+
+        meta = {"num_samples": len(samples), "fields": fields}
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+        # Write to a temporary file first so readers never see a partial entry
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _load(path: str) -> List[Sample]:
+        with np.load(path) as data:
+            if "samples" in data:
+                return pickle.loads(data["samples"].tobytes())
+            meta = json.loads(data["meta"].tobytes())
+            columns = []
+            for k, field in enumerate(meta["fields"]):
+                if field["pickled"]:
+                    columns.append(pickle.loads(data[f"{k}.values"].tobytes()))
+                    continue
+                values = data[f"{k}.values"].tolist()
+                for d in range(field["depth"], 0, -1):
+                    it = iter(values)
+                    values = [list(islice(it, n)) for n in data[f"{k}.len{d}"].tolist()]
+                columns.append(values)
+
+        names = [field["name"] for field in meta["fields"]]
+        return [dict(zip(names, vs)) for vs in zip(*columns)]
+
+    @staticmethod
+    def _to_array(values: Sequence[Any]) -> Optional[np.ndarray]:
+        # Only store values whose type survives the round trip through an array
+        types = set(map(type, values))
+        if types == {int}:
+            if not values:
+                return np.array(values, dtype=np.uint8)
+            lo, hi = min(values), max(values)
+            dtype = np.result_type(np.min_scalar_type(lo), np.min_scalar_type(hi))
+            return np.array(values, dtype=dtype) if dtype.kind in "iu" else None
+        if types == {float} or types == {bool} or types == {str} or not types:
+            return np.array(values)
+        return None
@@ -14,11 +14,30 @@
 
 from collections import defaultdict
 from random import Random
-from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Sized
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Sized,
+    Union,
+)
+import hashlib
+import math
 import statistics as stat
 import warnings
 
-from . import Batch, Sample
+from .batches import Batch
+from .profiling import _span
+from .samples import Sample
 
 
 class BatchIterator(Iterable[Batch], Sized):
@@ -42,6 +61,11 @@ class BatchIterator(Iterable[Batch], Sized):
     Args:
         samples (~typing.Iterable[Sample]): Iterable of samples to batch.
         batch_size: Maximum number of samples in each batch.
+        views: Whether to make the batches views of ``samples`` with `Batch.view` when it is
+            a `~typing.Sequence`, so no samples are copied. Changes made to ``samples``
+            afterwards, e.g. shuffling it in place between epochs, are then visible in the
+            batches already produced, so only set this if ``samples`` is left unchanged
+            while the batches are in use.
 
     Note:
         When ``samples`` is an instance of `~typing.Sized`, this iterator can
@@ -49,12 +73,15 @@ class BatchIterator(Iterable[Batch], Sized):
         is raised.
     """
 
-    def __init__(self, samples: Iterable[Sample], batch_size: int = 1) -> None:
+    def __init__(
+        self, samples: Iterable[Sample], batch_size: int = 1, views: bool = False
+    ) -> None:
         if batch_size <= 0:
             raise ValueError("batch size must be greater than 0")
 
         self._samples = samples
         self._bsz = batch_size
+        self._views = views
 
     @property
     def batch_size(self) -> int:
@@ -66,16 +93,32 @@ class BatchIterator(Iterable[Batch], Sized):
         return n // b + (1 if n % b != 0 else 0)
 
     def __iter__(self) -> Iterator[Batch]:
-        it, exhausted = iter(self._samples), False
-        while not exhausted:
-            batch = Batch()
-            while not exhausted and len(batch) < self._bsz:
-                try:
-                    batch.append(next(it))
-                except StopIteration:
-                    exhausted = True
-            if batch:
+        if self._views and isinstance(self._samples, Sequence):
+            n = len(self._samples)
+            for i in range(0, n, self._bsz):
+                with _span("batch") as span:
+                    batch = Batch.view(self._samples, i, i + self._bsz)
+                    span.samples = len(batch)
+                yield batch
+            return
+
+        if isinstance(self._samples, list):
+            # Slicing copies a list much faster than islice does
+            for i in range(0, len(self._samples), self._bsz):
+                with _span("batch") as span:
+                    batch = Batch._make(self._samples[i : i + self._bsz])
+                    span.samples = len(batch)
                 yield batch
+            return
+
+        it = iter(self._samples)
+        while True:
+            with _span("batch") as span:
+                batch = Batch(islice(it, self._bsz))
+                span.samples = len(batch)
+            if not batch:
+                break
+            yield batch
 
 
 class ShuffleIterator(Iterable[Any], Sized):
@@ -138,10 +181,12 @@ class ShuffleIterator(Iterable[Any], Sized):
         return len(self._items)
 
     def __iter__(self) -> Iterator[Sample]:
-        if self._key is None:
-            self._shuffle()
-        else:
-            self._shuffle_by_key()
+        with _span("shuffle") as span:
+            if self._key is None:
+                self._shuffle()
+            else:
+                self._shuffle_by_key()
+            span.samples = len(self._items)
         return iter(self._items)
 
     def _shuffle(self) -> None:
@@ -197,9 +242,8 @@ class BucketIterator(Iterable[Batch], Sized):
             if ``sort_bucket=True``.
 
     Note:
-        When ``samples`` is an instance of `~typing.Sized`, this iterator can
-        be passed to `len` to get the number of batches. Otherwise, a `TypeError`
-        is raised.
+        Since all samples are read into buckets on creation, this iterator can always
+        be passed to `len` to get the number of batches, which takes constant time.
     """
 
     def __init__(
@@ -226,20 +270,661 @@ class BucketIterator(Iterable[Batch], Sized):
         bucket_dict = defaultdict(list)
         for s in samples:
             bucket_dict[key(s)].append(s)
-        self._buckets = bucket_dict.values()
+        self._buckets: Dict[Any, List[Sample]] = dict(bucket_dict)
         if sort_bucket:
-            for bkt in self._buckets:
+            for bkt in self._buckets.values():
                 bkt.sort(key=sort_bucket_by)
 
+        # Bucket sizes never change, so batch counts are computed once
+        self._nbatches = {
+            k: len(BatchIterator(ss, self._bsz)) for k, ss in self._buckets.items()
+        }
+        self._len = sum(self._nbatches.values())
+
     @property
     def batch_size(self):
         return self._bsz
 
+    def bucket_stats(self) -> List["BucketStats"]:
+        """Get the statistics of every bucket, in the order they are iterated over.
+
+        Returns:
+            List of `BucketStats`, one for each bucket.
+        """
+        return [BucketStats(k, len(ss), self._nbatches[k]) for k, ss in self._buckets.items()]
+
     def __len__(self):
-        return sum(len(BatchIterator(ss, self._bsz)) for ss in self._buckets)
+        return self._len
 
     def __iter__(self):
-        for ss in self._buckets:
-            if self._shuf:
+        for k in self._buckets:
+            yield from self._iter_bucket(k)
+
+    def _iter_bucket(self, key: Any) -> Iterator[Batch]:
+        ss = self._buckets[key]
+        if self._shuf:
+            with _span("shuffle") as span:
                 self._rng.shuffle(ss)
-            yield from BatchIterator(ss, self._bsz)
+                span.samples = len(ss)
+        for i in range(0, len(ss), self._bsz):
+            with _span("batch") as span:
+                # Buckets are shuffled in place, so batches must not be views of them; the
+                # slice is a copy already, so it is not copied again
+                batch = Batch._make(ss[i : i + self._bsz])
+                span.samples = len(batch)
+            yield batch
+
+
+class BucketStats(NamedTuple):
+    """Statistics of a bucket of `BucketIterator`.
+
+    Attributes:
+        key: Bucket key shared by the samples in the bucket.
+        num_samples: Number of samples in the bucket.
+        num_batches: Number of batches produced from the bucket.
+    """
+
+    key: Any
+    num_samples: int
+    num_batches: int
+
+
+class CurriculumIterator(Iterable[Batch], Sized):
+    """Iterator that produces batches only from buckets whose key is within a threshold.
+
+    This iterator wraps a `BucketIterator`, whose buckets are typically keyed by sample
+    length or difficulty. Only batches from buckets whose key is at most ``threshold``
+    are produced, which allows starting training on short (or easy) samples and gradually
+    allowing longer ones. Buckets are visited in ascending order of their keys, and an
+    iteration ends at the first bucket that is not eligible, so raising the threshold
+    during an iteration makes the longer buckets eligible in that same iteration. The
+    threshold can be changed at any time, or set by a schedule before every batch, and
+    takes effect from the next batch on. Since the buckets are reused as they are,
+    changing the threshold never re-reads the samples.
+
+    Example:
+
+        >>> from text2array import BucketIterator, CurriculumIterator
+        >>> samples = [{'ws': ['a'] * n} for n in [1, 3, 2, 1, 3]]
+        >>> buckets = BucketIterator(samples, key=lambda s: len(s['ws']), batch_size=2)
+        >>> iter_ = CurriculumIterator(buckets, threshold=2)
+        >>> len(iter_)
+        2
+        >>> [[len(s['ws']) for s in b] for b in iter_]
+        [[1, 1], [2]]
+        >>> iter_.threshold = 3
+        >>> [[len(s['ws']) for s in b] for b in iter_]
+        [[1, 1], [2], [3, 3]]
+
+    Args:
+        buckets: Bucket iterator to produce batches from.
+        threshold: Maximum bucket key to produce batches from. If ``None``, all buckets are
+            eligible.
+        schedule (typing.Callable[[int], Any]): Callable to get the threshold from the
+            number of batches produced so far (across iterations). If given, it is called
+            before every batch to set ``threshold``, and `len` counts the batches eligible
+            under the threshold it returns for the current step.
+    """
+
+    def __init__(
+        self,
+        buckets: BucketIterator,
+        threshold: Any = None,
+        schedule: Optional[Callable[[int], Any]] = None,
+    ) -> None:
+        self._buckets = buckets
+        self.threshold = threshold
+        self._schedule = schedule
+        self._step = 0
+
+    @property
+    def step(self) -> int:
+        """Number of batches produced so far."""
+        return self._step
+
+    def __len__(self) -> int:
+        threshold = self.threshold if self._schedule is None else self._schedule(self._step)
+        stats = self._buckets.bucket_stats()
+        return sum(st.num_batches for st in stats if self._eligible(st.key, threshold))
+
+    def __iter__(self) -> Iterator[Batch]:
+        # Later buckets are eligible only if the current one is, so a bucket left
+        # ineligible ends the iteration instead of being skipped for good
+        for key in sorted(st.key for st in self._buckets.bucket_stats()):
+            it = None
+            while True:
+                if self._schedule is not None:
+                    self.threshold = self._schedule(self._step)
+                if not self._eligible(key, self.threshold):
+                    return
+                if it is None:
+                    it = self._buckets._iter_bucket(key)
+                try:
+                    b = next(it)
+                except StopIteration:
+                    break
+                self._step += 1
+                yield b
+
+    @staticmethod
+    def _eligible(key: Any, threshold: Any) -> bool:
+        return threshold is None or key <= threshold
+
+
+class SortedWindowIterator(Iterable[Batch], Sized):
+    """Iterator that batches samples sorted within windows of consecutive samples.
+
+    Samples are read ``window_size`` batches' worth at a time. Each window is sorted by
+    ``key`` and cut into batches, and the order of those batches is then shuffled. This
+    yields batches of samples of similar lengths, like `BucketIterator` does, but without
+    reading all the samples at once, so ``samples`` can be a stream.
+
+    Example:
+
+        >>> from random import Random
+        >>> from text2array import SortedWindowIterator
+        >>> samples = [
+        ...   {'ws': ['a', 'b', 'c']},
+        ...   {'ws': ['a']},
+        ...   {'ws': ['a', 'b']},
+        ...   {'ws': ['b']},
+        ...   {'ws': ['c', 'd', 'e']},
+        ... ]
+        >>> iter_ = SortedWindowIterator(
+        ...   samples, key=lambda s: len(s['ws']), batch_size=2, window_size=2, rng=Random(1)
+        ... )
+        >>> for b in iter_:
+        ...   print(list(b))
+        ...
+        [{'ws': ['a', 'b']}, {'ws': ['a', 'b', 'c']}]
+        [{'ws': ['a']}, {'ws': ['b']}]
+        [{'ws': ['c', 'd', 'e']}]
+
+    Args:
+        samples (~typing.Iterable[Sample]): Iterable of samples to batch.
+        key (typing.Callable[[Sample], Any]): Callable to get the sort key of a sample.
+        batch_size: Maximum number of samples in each batch.
+        window_size: Number of batches in each window.
+        shuffle: Whether to shuffle the order of batches within each window.
+        rng: Random number generator to use for shuffling. Set this to ensure reproducibility.
+            If not given, an instance of `~random.Random` with the default seed is used.
+
+    Note:
+        When ``samples`` is an instance of `~typing.Sized`, this iterator can
+        be passed to `len` to get the number of batches. Otherwise, a `TypeError`
+        is raised.
+    """
+
+    def __init__(
+        self,
+        samples: Iterable[Sample],
+        key: Callable[[Sample], Any],
+        batch_size: int = 1,
+        window_size: int = 100,
+        shuffle: bool = True,
+        rng: Optional[Random] = None,
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError("batch size must be greater than 0")
+        if window_size <= 0:
+            raise ValueError("window size must be greater than 0")
+        if rng is None:  # pragma: no cover
+            rng = Random()
+
+        self._samples = samples
+        self._key = key
+        self._bsz = batch_size
+        self._wsz = window_size
+        self._shuf = shuffle
+        self._rng = rng
+
+    @property
+    def batch_size(self) -> int:
+        return self._bsz
+
+    @property
+    def window_size(self) -> int:
+        return self._wsz
+
+    def __len__(self) -> int:
+        # Every window but the last has a multiple of batch size samples
+        return len(BatchIterator(self._samples, self._bsz))
+
+    def __iter__(self) -> Iterator[Batch]:
+        it = iter(self._samples)
+        while True:
+            window = list(islice(it, self._wsz * self._bsz))
+            if not window:
+                break
+            with _span("sort") as span:
+                window.sort(key=self._key)
+                span.samples = len(window)
+            batches = list(BatchIterator(window, self._bsz))
+            if self._shuf:
+                self._rng.shuffle(batches)
+            yield from batches
+
+
+class MixingIterator(Iterable[Any], Sized):
+    """Iterator that interleaves items drawn randomly from several iterables.
+
+    At every step, one of the iterables is picked at random and its next item is produced,
+    until all of them are exhausted. The probability of picking an iterable is proportional
+    to its weight raised to the power of ``1 / temperature``. Weights default to the
+    iterables' lengths, so a temperature of 1 samples proportionally to size while higher
+    temperatures flatten the distribution towards uniform. Iterables with a weight of 0,
+    such as empty ones when the weights default to their lengths, are never picked. Items
+    are drawn lazily, so the iterables (e.g. a `BucketIterator` per corpus) are never
+    concatenated.
+
+    The iteration state can be saved with `~MixingIterator.state_dict` and restored with
+    `~MixingIterator.load_state_dict`, after which the next iteration resumes where the
+    saved one left off, by skipping the items already produced. For this to reproduce the
+    same items, the iterables must produce the same items in the same order again. Any
+    other iteration starts from scratch, even if the previous one was stopped early.
+
+    Example:
+
+        >>> from random import Random
+        >>> from text2array import MixingIterator
+        >>> iter_ = MixingIterator([['a1', 'a2', 'a3'], ['b1']], rng=Random(0))
+        >>> list(iter_)
+        ['b1', 'a1', 'a2', 'a3']
+
+    Args:
+        iterables (~typing.Sequence[~typing.Iterable[Any]]): Iterables to draw items from.
+        weights: Weight of each iterable. If not given, the iterables must be `~typing.Sized`
+            and their lengths are used. At least one weight must be greater than 0.
+        temperature: Temperature to scale the weights with. Must be greater than 0.
+        rng: Random number generator to use for picking iterables. Set this to ensure
+            reproducibility. If not given, an instance of `~random.Random` with the default
+            seed is used.
+
+    Note:
+        When all ``iterables`` are instances of `~typing.Sized`, this iterator can
+        be passed to `len` to get the total number of items. Otherwise, a `TypeError`
+        is raised.
+    """
+
+    def __init__(
+        self,
+        iterables: Sequence[Iterable[Any]],
+        weights: Optional[Sequence[float]] = None,
+        temperature: float = 1.0,
+        rng: Optional[Random] = None,
+    ) -> None:
+        if not iterables:
+            raise ValueError("iterables cannot be empty")
+        if weights is None:
+            weights = [len(x) for x in iterables]  # type: ignore
+        if len(weights) != len(iterables):
+            raise ValueError("weights must have the same length as iterables")
+        if any(w < 0 for w in weights):
+            raise ValueError("weights cannot be less than 0")
+        if not any(w > 0 for w in weights):
+            raise ValueError("weights cannot all be 0")
+        if temperature <= 0:
+            raise ValueError("temperature must be greater than 0")
+        if rng is None:  # pragma: no cover
+            rng = Random()
+
+        self._iterables = iterables
+        self._probs = [w ** (1 / temperature) for w in weights]
+        self._rng = rng
+        # Whether the next iteration resumes from a state loaded by load_state_dict
+        self._resume: bool
+        self._reset()
+
+    @property
+    def probs(self) -> List[float]:
+        """Probability of picking each iterable while none is exhausted."""
+        total = sum(self._probs)
+        return [p / total for p in self._probs]
+
+    def __len__(self) -> int:
+        return sum(len(x) for x in self._iterables)  # type: ignore
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self._resume:
+            self._reset()
+        self._resume = False
+
+        its = []
+        for x, n in zip(self._iterables, self._consumed):
+            it = iter(x)
+            # Skip items produced before the state was saved
+            for _ in islice(it, n):
+                pass
+            its.append(it)
+
+        active = [i for i, ex in enumerate(self._exhausted) if not ex and self._probs[i] > 0]
+        while active:
+            (i,) = self._rng.choices(active, weights=[self._probs[j] for j in active])
+            try:
+                item = next(its[i])
+            except StopIteration:
+                self._exhausted[i] = True
+                active.remove(i)
+                continue
+            self._consumed[i] += 1
+            yield item
+
+        self._reset()
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Get the current iteration state.
+
+        Returns:
+            A dictionary that can be passed to `~MixingIterator.load_state_dict`.
+        """
+        return {
+            "rng": self._rng.getstate(),
+            "consumed": list(self._consumed),
+            "exhausted": list(self._exhausted),
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restore an iteration state.
+
+        Args:
+            state: Iteration state as returned by `~MixingIterator.state_dict`.
+        """
+        if len(state["consumed"]) != len(self._iterables):
+            raise ValueError("state does not match the number of iterables")
+        self._rng.setstate(state["rng"])
+        self._consumed = list(state["consumed"])
+        self._exhausted = list(state["exhausted"])
+        self._resume = True
+
+    def _reset(self) -> None:
+        self._consumed = [0] * len(self._iterables)
+        self._exhausted = [False] * len(self._iterables)
+        self._resume = False
+
+
+class PackingIterator(Iterable[Batch]):
+    """Iterator that packs multiple samples into fixed-length rows and batches the rows.
+
+    Each row is a sample formed by concatenating the values of every sequential field of
+    the samples packed into it, such that the total length as given by ``key`` does not
+    exceed ``row_length``. Values of non-sequential fields are collected into a list with
+    one element per packed sample. Every row also has a field ``segment_ids`` holding
+    the (1-based) index of the packed sample each position belongs to, and a field
+    ``positions`` holding the position relative to the start of that sample, both as long
+    as the row's sequential fields. Thus, all sequential fields of a sample must have the
+    same length, and all samples packed into a row must have the same fields. Since
+    segment IDs start from 1, padding them with zeros keeps padding distinct. A sample
+    longer than ``row_length`` is put in a row of its own.
+
+    Example:
+
+        >>> from text2array import PackingIterator
+        >>> samples = [
+        ...   {'ws': ['a', 'b']},
+        ...   {'ws': ['c', 'd', 'e']},
+        ...   {'ws': ['f']},
+        ...   {'ws': ['g', 'h']},
+        ... ]
+        >>> iter_ = PackingIterator(samples, key=lambda s: len(s['ws']), row_length=4)
+        >>> for b in iter_:
+        ...   print(list(b))
+        ...
+        [{'ws': ['a', 'b'], 'segment_ids': [1, 1], 'positions': [0, 1]}]
+        [{'ws': ['c', 'd', 'e', 'f'], 'segment_ids': [1, 1, 1, 2], 'positions': [0, 1, 2, 0]}]
+        [{'ws': ['g', 'h'], 'segment_ids': [1, 1], 'positions': [0, 1]}]
+
+    Args:
+        samples (~typing.Iterable[Sample]): Iterable of samples to pack.
+        key (typing.Callable[[Sample], int]): Callable to get the length of a sample.
+        row_length: Maximum total length of the samples in each row.
+        batch_size: Maximum number of rows in each batch.
+        strategy: How to pack samples into rows. With ``greedy``, samples are packed in
+            order, starting a new row whenever the next sample does not fit in the current
+            one. With ``ffd`` (first-fit decreasing), samples are sorted by length
+            descending and each is put in the first row with enough room, which
+            wastes less space but does not preserve the order of samples.
+        window_size: Number of samples to pack at a time with ``ffd``. If ``None``,
+            all samples are read and packed at once.
+
+    Note:
+        The number of rows depends on the samples' lengths, so this iterator does not
+        support `len`.
+    """
+
+    _STRATEGIES = ("greedy", "ffd")
+
+    def __init__(
+        self,
+        samples: Iterable[Sample],
+        key: Callable[[Sample], int],
+        row_length: int,
+        batch_size: int = 1,
+        strategy: str = "greedy",
+        window_size: Optional[int] = None,
+    ) -> None:
+        if row_length <= 0:
+            raise ValueError("row length must be greater than 0")
+        if batch_size <= 0:
+            raise ValueError("batch size must be greater than 0")
+        if strategy not in self._STRATEGIES:
+            raise ValueError(f"invalid strategy '{strategy}'")
+        if window_size is not None and window_size <= 0:
+            raise ValueError("window size must be greater than 0")
+
+        self._samples = samples
+        self._key = key
+        self._rowlen = row_length
+        self._bsz = batch_size
+        self._strategy = strategy
+        self._wsz = window_size
+
+    @property
+    def batch_size(self) -> int:
+        return self._bsz
+
+    @property
+    def row_length(self) -> int:
+        return self._rowlen
+
+    def __iter__(self) -> Iterator[Batch]:
+        rows = map(self._merge, self._iter_rows())
+        yield from BatchIterator(rows, self._bsz)
+
+    def _iter_rows(self) -> Iterator[List[Sample]]:
+        if self._strategy == "greedy":
+            row: List[Sample] = []
+            total = 0
+            for s in self._samples:
+                n = self._key(s)
+                if row and total + n > self._rowlen:
+                    yield row
+                    row, total = [], 0
+                row.append(s)
+                total += n
+            if row:
+                yield row
+            return
+
+        it = iter(self._samples)
+        while True:
+            window = list(it if self._wsz is None else islice(it, self._wsz))
+            if not window:
+                break
+            lengths = [self._key(s) for s in window]
+            for indices in self._first_fit_decreasing(lengths, self._rowlen):
+                yield [window[i] for i in indices]
+
+    @staticmethod
+    def _first_fit_decreasing(lengths: Sequence[int], capacity: int) -> List[List[int]]:
+        # Rows are leaves of a tree where every node holds the max remaining capacity
+        # below it, so finding the first row that fits takes logarithmic time
+        size = 1
+        while size < len(lengths):
+            size *= 2
+        tree = [capacity] * (2 * size)
+        rows: List[List[int]] = [[] for _ in range(size)]
+        oversized = []
+
+        for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+            n = lengths[i]
+            if n > capacity:
+                oversized.append([i])
+                continue
+            node = 1
+            while node < size:
+                node = 2 * node if tree[2 * node] >= n else 2 * node + 1
+            rows[node - size].append(i)
+            tree[node] -= n
+            node //= 2
+            while node:
+                tree[node] = max(tree[2 * node], tree[2 * node + 1])
+                node //= 2
+
+        return oversized + [r for r in rows if r]
+
+    def _merge(self, row: List[Sample]) -> Sample:
+        merged: Dict[str, list] = {name: [] for name in row[0]}
+        for name in ("segment_ids", "positions"):
+            if name in merged:
+                raise ValueError(f"cannot pack samples which have a field named '{name}'")
+        merged["segment_ids"], merged["positions"] = [], []
+
+        for i, s in enumerate(row, 1):
+            if s.keys() != row[0].keys():
+                raise ValueError("cannot pack samples which have different fields")
+            lens = set()
+            for name, value in s.items():
+                if isinstance(value, Sequence) and not isinstance(value, str):
+                    merged[name].extend(value)
+                    lens.add(len(value))
+                else:
+                    merged[name].append(value)
+            if len(lens) > 1:
+                raise ValueError("cannot pack samples whose sequential fields differ in length")
+            n = lens.pop() if lens else 0
+            merged["segment_ids"].extend(i for _ in range(n))
+            merged["positions"].extend(range(n))
+
+        return merged
+
+
+class FilterIterator(Iterable[Sample]):
+    """Iterator that drops duplicate samples and samples with out-of-range lengths.
+
+    Duplicates are detected by a compact hash of every sample, so only the hashes of the
+    samples seen so far are kept rather than the samples themselves. To bound memory even
+    further, pass ``capacity`` to keep them in a Bloom filter of fixed size instead, at
+    the cost of dropping a small fraction (about ``error_rate``) of unique samples. Use
+    this iterator in front of `Vocab.from_samples` or the other iterators so they never
+    see the dropped samples. The numbers of dropped samples of the latest iteration are
+    available as attributes.
+
+    Example:
+
+        >>> from text2array import FilterIterator
+        >>> samples = [
+        ...   {'ws': ['a', 'b']},
+        ...   {'ws': ['a', 'b', 'c', 'd']},
+        ...   {'ws': ['a', 'b']},
+        ...   {'ws': ['c']},
+        ... ]
+        >>> iter_ = FilterIterator(samples, max_len={'ws': 3})
+        >>> list(iter_)
+        [{'ws': ['a', 'b']}, {'ws': ['c']}]
+        >>> iter_.num_duplicates, iter_.num_too_long
+        (1, 1)
+
+    Args:
+        samples (~typing.Iterable[Sample]): Iterable of samples to filter.
+        dedup: Whether to drop duplicate samples.
+        dedup_fields: Field names whose values determine whether samples are duplicates.
+            If not given, all fields are used.
+        min_len: Mapping from field names to the minimum length of the field's values.
+        max_len: Mapping from field names to the maximum length of the field's values.
+        capacity: Expected number of unique samples. If given, a Bloom filter sized for
+            this number is used to detect duplicates.
+        error_rate: False positive rate of the Bloom filter at full capacity.
+
+    Attributes:
+        num_kept: Number of samples kept.
+        num_duplicates: Number of samples dropped as duplicates.
+        num_too_short: Number of samples dropped for being too short.
+        num_too_long: Number of samples dropped for being too long.
+    """
+
+    def __init__(
+        self,
+        samples: Iterable[Sample],
+        dedup: bool = True,
+        dedup_fields: Optional[Sequence[str]] = None,
+        min_len: Optional[Mapping[str, int]] = None,
+        max_len: Optional[Mapping[str, int]] = None,
+        capacity: Optional[int] = None,
+        error_rate: float = 0.001,
+    ) -> None:
+        if capacity is not None and capacity <= 0:
+            raise ValueError("capacity must be greater than 0")
+        if not 0 < error_rate < 1:
+            raise ValueError("error rate must be between 0 and 1")
+        if min_len is None:
+            min_len = {}
+        if max_len is None:
+            max_len = {}
+
+        self._samples = samples
+        self._dedup = dedup
+        self._dedup_fields = dedup_fields
+        self._min_len = min_len
+        self._max_len = max_len
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self.num_kept = self.num_duplicates = self.num_too_short = self.num_too_long = 0
+
+    def __iter__(self) -> Iterator[Sample]:
+        self.num_kept = self.num_duplicates = self.num_too_short = self.num_too_long = 0
+        seen: Union[Set[bytes], _BloomFilter]
+        if self._capacity is None:
+            seen = set()
+        else:
+            seen = _BloomFilter(self._capacity, self._error_rate)
+
+        for s in self._samples:
+            if any(len(s[name]) < n for name, n in self._min_len.items()):  # type: ignore
+                self.num_too_short += 1
+                continue
+            if any(len(s[name]) > n for name, n in self._max_len.items()):  # type: ignore
+                self.num_too_long += 1
+                continue
+            if self._dedup:
+                fp = self._fingerprint(s)
+                if fp in seen:
+                    self.num_duplicates += 1
+                    continue
+                seen.add(fp)
+            self.num_kept += 1
+            yield s
+
+    def _fingerprint(self, s: Sample) -> bytes:
+        names = sorted(s) if self._dedup_fields is None else self._dedup_fields
+        data = repr([(name, s[name]) for name in names]).encode()
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self._nbits = max(1, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._nhashes = max(1, round(self._nbits / capacity * math.log(2)))
+        self._bits = bytearray((self._nbits + 7) // 8)
+
+    def __contains__(self, fp: bytes) -> bool:
+        return all(self._bits[i // 8] & (1 << (i % 8)) for i in self._positions(fp))
+
+    def add(self, fp: bytes) -> None:
+        for i in self._positions(fp):
+            self._bits[i // 8] |= 1 << (i % 8)
+
+    def _positions(self, fp: bytes) -> Iterator[int]:
+        # Double hashing from the two halves of the fingerprint
+        h1 = int.from_bytes(fp[:8], "little")
+        h2 = int.from_bytes(fp[8:], "little") | 1
+        return ((h1 + i * h2) % self._nbits for i in range(self._nhashes))
@@ -0,0 +1,185 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sized, Tuple
+import os
+
+import numpy as np  # type: ignore
+
+from .batches import Batch
+from .samples import FieldName
+
+# (name, shared memory name, shape, dtype) or (name, None, array, None) for arrays
+# that cannot live in shared memory
+_Handle = Tuple[FieldName, Optional[str], Any, Optional[str]]
+
+
+class ProcessArrayIterator(Iterable[Dict[FieldName, np.ndarray]], Sized):
+    """Iterator that converts batches to arrays in worker processes.
+
+    Since `Batch.to_array` is pure Python, converting batches in threads hardly runs them
+    in parallel. This iterator converts them in a pool of processes instead. Workers write
+    the resulting arrays into shared memory segments and send back only their names, which
+    avoids pickling the arrays. The produced arrays are backed by the segments themselves,
+    so they are not copied again. The segments are unlinked as soon as they are attached,
+    and their memory is freed once the arrays are. At most ``max_in_flight`` batches are
+    converted at a time, and the arrays are produced in the same order as the batches.
+
+    Example:
+
+        >>> from text2array import Batch, BatchIterator, ProcessArrayIterator
+        >>> samples = [{'ws': [1] * n} for n in range(1, 5)]
+        >>> iter_ = ProcessArrayIterator(BatchIterator(samples, batch_size=2), num_workers=2)
+        >>> for arr in iter_:  # doctest: +SKIP
+        ...   print(arr['ws'].tolist())
+        ...
+        [[1, 0], [1, 1]]
+        [[1, 1, 1, 0], [1, 1, 1, 1]]
+
+    Args:
+        batches (~typing.Iterable[Batch]): Iterable of batches to convert.
+        convert (typing.Callable[[Batch], Dict[FieldName, np.ndarray]]): Callable to
+            convert a batch with. It must be picklable, e.g. a module-level function or a
+            `functools.partial` of `Batch.to_array`. If not given, `Batch.to_array` is used.
+        num_workers: Number of worker processes. If not given, the number of CPUs is used.
+            Ignored if ``executor`` is given.
+        max_in_flight: Maximum number of batches being converted at a time. If not given,
+            twice the number of workers (or CPUs) is used.
+        executor: Process pool to convert batches in. If not given, a new one is created
+            on every iteration.
+
+    Note:
+        This iterator requires Python 3.8 or newer. Arrays of object data type cannot be
+        put in shared memory; they are pickled as usual.
+    """
+
+    def __init__(
+        self,
+        batches: Iterable[Batch],
+        convert: Optional[Callable[[Batch], Dict[FieldName, np.ndarray]]] = None,
+        num_workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        if num_workers is not None and num_workers <= 0:
+            raise ValueError("number of workers must be greater than 0")
+        if max_in_flight is not None and max_in_flight <= 0:
+            raise ValueError("max in flight must be greater than 0")
+        if convert is None:
+            convert = Batch.to_array
+
+        self._batches = batches
+        self._convert = convert
+        self._nworkers = num_workers
+        self._max_in_flight = max_in_flight
+        self._executor = executor
+
+    def __len__(self) -> int:
+        return len(self._batches)  # type: ignore
+
+    def __iter__(self) -> Iterator[Dict[FieldName, np.ndarray]]:
+        if self._executor is not None:
+            yield from self._iter_arrays(self._executor)
+            return
+        with ProcessPoolExecutor(self._nworkers) as executor:
+            yield from self._iter_arrays(executor)
+
+    def _iter_arrays(self, executor: Executor) -> Iterator[Dict[FieldName, np.ndarray]]:
+        max_in_flight = self._max_in_flight
+        if max_in_flight is None:
+            max_in_flight = 2 * (self._nworkers or os.cpu_count() or 1)
+
+        pending: Deque[Future] = deque()
+        try:
+            for b in self._batches:
+                pending.append(executor.submit(_to_shared_memory, self._convert, b))
+                if len(pending) >= max_in_flight:
+                    yield _from_shared_memory(pending.popleft().result())
+            while pending:
+                yield _from_shared_memory(pending.popleft().result())
+        finally:
+            # Don't leave segments behind when stopped early
+            for fut in pending:
+                if not fut.cancel() and fut.exception() is None:
+                    _from_shared_memory(fut.result())
+
+
+def _to_shared_memory(
+    convert: Callable[[Batch], Dict[FieldName, np.ndarray]], batch: Batch
+) -> List[_Handle]:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+
+    handles: List[_Handle] = []
+    segments = []
+    try:
+        for name, a in convert(batch).items():
+            if a.dtype.hasobject:
+                handles.append((name, None, a, None))
+                continue
+            shm = SharedMemory(create=True, size=max(a.nbytes, 1))
+            segments.append(shm)
+            np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+            handles.append((name, shm.name, a.shape, a.dtype.str))
+    except BaseException:
+        # Don't leak the segments of the fields converted so far
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+        raise
+
+    for shm in segments:
+        shm.close()
+        if os.name == "posix":
+            # The main process now owns the segment; stop this process's resource tracker
+            # from removing it (or warning about it) when the worker exits
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+    return handles
+
+
+def _from_shared_memory(handles: List[_Handle]) -> Dict[FieldName, np.ndarray]:
+    arr = {}
+    for name, shm_name, shape, dtype in handles:
+        if shm_name is None:
+            arr[name] = shape
+            continue
+        arr[name] = _attach(shm_name, shape, dtype)
+    return arr
+
+
+def _attach(shm_name: str, shape: Tuple[int, ...], dtype: Optional[str]) -> np.ndarray:
+    from multiprocessing.shared_memory import SharedMemory
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        # The memory stays mapped after unlinking, until the mapping is closed
+        shm.unlink()
+        mm = getattr(shm, "_mmap", None)
+        if mm is None or not hasattr(shm, "_buf"):  # pragma: no cover
+            # Unknown internals, so copy the array out and close the segment as usual
+            return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+        a = np.frombuffer(mm, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        # Hand the mapping over to the array, so it is unmapped once the array is freed.
+        # SharedMemory.close (identical in CPython 3.8 to 3.13) releases _buf, a view of
+        # _mmap, then closes _mmap, skipping either if None, and then closes the file
+        # descriptor, which the mapping does not need. So releasing the view here and
+        # setting both to None makes close leave the mapping alone, and the array keeps
+        # the mapping alive through its base.
+        shm._buf.release()  # type: ignore
+        shm._buf = shm._mmap = None  # type: ignore
+    finally:
+        shm.close()
+    return a
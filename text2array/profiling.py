@@ -0,0 +1,231 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, List, NamedTuple
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Profilers currently recording, innermost last. Hooks check this list before doing any
+# work, so they cost next to nothing when no profiler is active.
+_active: List["Profiler"] = []
+
+
+class Profiler:
+    """Recorder of the time spent in each stage of a data pipeline.
+
+    While used as a context manager, every stage of the pipeline run in the same process
+    is recorded: its wall time, the number of samples and tokens it processed, and
+    optionally the memory it allocated. The stages are:
+
+    * ``stoi``: conversion of a sample by `Vocab.stoi`, whose tokens are the strings
+      converted.
+    * ``decode``: conversion of arrays back to samples by `Vocab.decode`.
+    * ``to_array``: conversion of a batch by `Batch.to_array`, whose tokens are the values
+      of its sequential fields, after truncation and before padding.
+    * ``batch``: creation of a batch by `BatchIterator`, `BucketIterator`, and
+      `SortedWindowIterator`.
+    * ``shuffle``: shuffling or noisy sorting of the items by `ShuffleIterator`, and
+      shuffling of a bucket by `BucketIterator`.
+    * ``sort``: sorting of a window by `SortedWindowIterator`.
+
+    The other stages do not count tokens. Stages can be nested, e.g. a batch created from
+    a lazy iterable of samples includes the conversions of its samples, and their times
+    are then counted in both stages. The recorded stages can be summarized with
+    `~Profiler.stats` and `~Profiler.summary`, or saved with `~Profiler.save_chrome_trace`
+    as a Chrome trace file, which can be viewed offline in e.g. ``chrome://tracing`` or
+    `Perfetto <https://ui.perfetto.dev>`_.
+
+    Example:
+
+        >>> from text2array import Batch, Profiler, StringStore, Vocab
+        >>> vocab = Vocab({'ws': StringStore(['<pad>', 'a', 'b'])})
+        >>> samples = [{'ws': ['a', 'b']}, {'ws': ['b']}]
+        >>> with Profiler() as prof:
+        ...   arr = Batch(vocab.stoi(samples)).to_array()
+        ...
+        >>> stats = prof.stats()
+        >>> stats['stoi'].calls, stats['stoi'].samples, stats['stoi'].tokens
+        (2, 2, 3)
+        >>> stats['to_array'].samples
+        2
+
+    Args:
+        trace_allocations: Whether to also record the memory allocated by every stage,
+            using `tracemalloc`. This slows the pipeline down considerably.
+        max_events: Maximum number of stages kept for `~Profiler.save_chrome_trace`.
+            Stages recorded afterwards are still counted in `~Profiler.stats`.
+
+    Note:
+        Only stages run in the process using the profiler are recorded, so e.g. the
+        conversions done in the worker processes of `ProcessArrayIterator` are not.
+    """
+
+    def __init__(self, trace_allocations: bool = False, max_events: int = 100_000) -> None:
+        if max_events < 0:
+            raise ValueError("max events cannot be less than 0")
+
+        self._trace_alloc = trace_allocations
+        self._max_events = max_events
+        self._started_tracing = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __enter__(self) -> "Profiler":
+        if self._trace_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _active.append(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _active.remove(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self) -> None:
+        """Forget all recorded stages."""
+        self._t0 = time.perf_counter()
+        self._stats: Dict[str, List[Any]] = {}
+        self._events: List[Dict[str, Any]] = []
+
+    def stats(self) -> Dict[str, "StageStats"]:
+        """Get the statistics of every stage recorded so far.
+
+        Returns:
+            Mapping from stage names to their statistics, in order of first occurrence.
+        """
+        with self._lock:
+            return {name: StageStats(*st) for name, st in self._stats.items()}
+
+    def summary(self) -> str:
+        """Format the statistics of every stage as a table.
+
+        Returns:
+            The table, one stage per row, sorted by decreasing total time.
+        """
+        rows: List[tuple] = [("stage", "calls", "seconds", "samples", "tokens", "bytes")]
+        for name, st in sorted(self.stats().items(), key=lambda x: -x[1].seconds):
+            nbytes = st.allocated_bytes
+            rows.append((name, st.calls, f"{st.seconds:.4f}", st.samples, st.tokens, nbytes))
+        # The bytes column is only shown if allocations are traced
+        ncols = 6 if self._trace_alloc else 5
+        return "\n".join(f"{r[0]:<10}" + "".join(f"{x:>12}" for x in r[1:ncols]) for r in rows)
+
+    def save_chrome_trace(self, path: str) -> None:
+        """Save the recorded stages as a Chrome trace file.
+
+        Args:
+            path: Path to the JSON file to save to.
+        """
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def _record(
+        self, name: str, start: float, end: float, samples: int, tokens: int, nbytes: int
+    ) -> None:
+        with self._lock:
+            st = self._stats.get(name)
+            if st is None:
+                st = self._stats[name] = [0, 0.0, 0, 0, 0]
+            st[0] += 1
+            st[1] += end - start
+            st[2] += samples
+            st[3] += tokens
+            st[4] += nbytes
+            if len(self._events) < self._max_events:
+                args = {"samples": samples, "tokens": tokens}
+                if self._trace_alloc:
+                    args["allocated_bytes"] = nbytes
+                self._events.append(
+                    {
+                        "name": name,
+                        "cat": "text2array",
+                        "ph": "X",
+                        "ts": (start - self._t0) * 1e6,
+                        "dur": (end - start) * 1e6,
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": args,
+                    }
+                )
+
+
+class StageStats(NamedTuple):
+    """Statistics of a pipeline stage recorded by `Profiler`.
+
+    Attributes:
+        calls: Number of times the stage was run.
+        seconds: Total wall time of the stage, in seconds.
+        samples: Total number of samples processed.
+        tokens: Total number of tokens processed, if the stage counts them.
+        allocated_bytes: Total memory allocated and not yet freed by the end of the stage,
+            in bytes, if the profiler traces allocations.
+    """
+
+    calls: int
+    seconds: float
+    samples: int
+    tokens: int
+    allocated_bytes: int
+
+
+class _Span:
+    __slots__ = ("_prof", "_name", "_start", "_mem", "samples", "tokens")
+
+    def __init__(self, prof: Profiler, name: str) -> None:
+        self._prof = prof
+        self._name = name
+        self.samples = self.tokens = 0
+
+    def __enter__(self) -> "_Span":
+        self._mem = tracemalloc.get_traced_memory()[0] if self._prof._trace_alloc else 0
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        end = time.perf_counter()
+        nbytes = 0
+        if self._prof._trace_alloc:
+            nbytes = tracemalloc.get_traced_memory()[0] - self._mem
+        self._prof._record(self._name, self._start, end, self.samples, self.tokens, nbytes)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _span(name: str) -> Any:
+    # Context manager recording a stage with the innermost active profiler, if any; the
+    # counts of the stage can be set as attributes of the returned object
+    if not _active:
+        return _NULL_SPAN
+    return _Span(_active[-1], name)
@@ -0,0 +1,209 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import UserDict
+from itertools import chain, islice
+from numbers import Integral, Real
+from typing import (
+    Iterable,
+    Iterator,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .samples import FieldName, FieldValue, Sample
+from .vocab import StringStore, Vocab
+
+
+class FieldSchema(NamedTuple):
+    """Structure of a single field.
+
+    Attributes:
+        depth: Nesting depth of the field's values, i.e. 0 for scalars, 1 for sequences of
+            scalars, 2 for sequences of sequences of scalars, and so on.
+        dtype: Data type of the field's array. If ``None``, it is inferred by NumPy.
+        pad: Value to pad the field's sequential values with.
+        vocab: Vocabulary of the field, if any.
+    """
+
+    depth: int
+    dtype: Optional[str] = None
+    pad: Union[int, float, bool, str] = 0
+    vocab: Optional[StringStore] = None
+
+
+class Schema(UserDict, MutableMapping[FieldName, FieldSchema]):
+    """A dictionary from field names to `FieldSchema` objects describing the samples.
+
+    Passing a schema to `Batch.to_array` lets it skip discovering the structure of every
+    field in every batch. In exchange, the samples are assumed to conform to the schema,
+    which can be ensured once with `~Schema.validate`.
+
+    Example:
+
+        >>> from text2array import Schema
+        >>> samples = [
+        ...   {'ws': ['a', 'b'], 'i': 1},
+        ...   {'ws': ['c'], 'i': 2},
+        ... ]
+        >>> schema = Schema.from_samples(samples)
+        >>> schema['ws']
+        FieldSchema(depth=1, dtype=None, pad=0, vocab=None)
+        >>> schema['i']
+        FieldSchema(depth=0, dtype='int64', pad=0, vocab=None)
+    """
+
+    def __getitem__(self, name: FieldName) -> FieldSchema:
+        try:
+            return super().__getitem__(name)
+        except KeyError:
+            raise KeyError(f"no schema found for field name '{name}'")
+
+    @classmethod
+    def from_samples(
+        cls, samples: Iterable[Sample], vocab: Optional[Vocab] = None, num_samples: int = 100,
+    ) -> "Schema":
+        """Infer a schema from the first few samples.
+
+        Only the fields of the first sample are included. Data types are inferred from the
+        scalar values found, except that fields with string values get a ``None`` data type
+        so their arrays fit the longest string in each batch. Since later samples may have
+        values of a wider type, e.g. floats in a field inferred as ``int64``, pass them
+        through `~Schema.validate`, which checks the data types too.
+
+        Args:
+            samples (~typing.Iterable[Sample]): Iterable of samples. It must be a true
+                iterable, i.e. it can be iterated more than once, so that the samples used
+                for inference are not lost. Passing an iterator raises an error.
+            vocab: Vocabulary the samples are going to be converted with. If given, every
+                field in it is linked to its `StringStore`, gets the smallest integer data
+                type that fits its indices (see `StringStore.dtype`), and is padded with the
+                index of `Vocab.PAD_TOKEN`, if the store has it.
+            num_samples: Number of samples to infer the schema from.
+
+        Returns:
+            Schema: Schema instance.
+        """
+        if iter(samples) is samples:
+            raise ValueError("cannot infer schema from an iterator, which it would consume")
+        prefix = list(islice(samples, num_samples))
+        if not prefix:
+            raise ValueError("cannot infer schema from no samples")
+
+        m = {}
+        for name in prefix[0]:
+            try:
+                values = [s[name] for s in prefix]
+            except KeyError:
+                raise KeyError(f"some samples have no field '{name}'")
+
+            depth = 0
+            while values:
+                leaf = cls._is_leaf(values[0])
+                if any(cls._is_leaf(v) != leaf for v in values):
+                    raise ValueError(f"field '{name}' has inconsistent nesting depth")
+                if leaf:
+                    break
+                depth += 1
+                values = list(chain.from_iterable(values))  # type: ignore
+
+            if vocab is not None and name in vocab:
+                store = vocab[name]
+                pad = store.index(Vocab.PAD_TOKEN) if Vocab.PAD_TOKEN in store else 0
+                m[name] = FieldSchema(depth, store.dtype, pad, store)
+            else:
+                m[name] = FieldSchema(depth, cls._get_dtype(values))
+
+        return cls(m)
+
+    def validate(self, samples: Iterable[Sample]) -> Iterator[Sample]:
+        """Check that the given samples conform to this schema.
+
+        Every sample must have all the fields in the schema, whose values have the nesting
+        depth specified by the schema. Their scalar values must also fit the data type
+        specified by the schema, if any: booleans for ``bool``, integers (or booleans) for
+        integer types, and real numbers for floating-point types. Fields with a vocabulary
+        may have strings as well, so samples can be checked before conversion. Note that
+        the check is lazy; samples are checked one by one as the resulting iterator is
+        iterated over.
+
+        Args:
+            samples (~typing.Iterable[Sample]): Samples to check.
+
+        Returns:
+            ~typing.Iterator[Sample]: The same samples.
+        """
+        for i, s in enumerate(samples):
+            for name, fs in self.items():
+                try:
+                    value = s[name]
+                except KeyError:
+                    raise KeyError(f"sample {i} has no field '{name}'")
+                if not self._has_depth(value, fs.depth):
+                    raise ValueError(
+                        f"field '{name}' of sample {i} does not have nesting depth {fs.depth}"
+                    )
+                kinds = self._get_kinds(fs)
+                if kinds is not None and not self._has_kinds(value, kinds):
+                    raise ValueError(
+                        f"field '{name}' of sample {i} has values not of data type {fs.dtype}"
+                    )
+            yield s
+
+    @staticmethod
+    def _get_kinds(fs: FieldSchema) -> Optional[Tuple[type, ...]]:
+        # Types of the scalar values fitting the field's data type, if it is known
+        if fs.dtype is None:
+            return None
+        if fs.dtype == "bool":
+            kinds: Tuple[type, ...] = (bool,)
+        elif fs.dtype.startswith(("int", "uint")):
+            kinds = (Integral,)
+        elif fs.dtype.startswith("float"):
+            kinds = (Real,)
+        else:
+            return None
+        return kinds + (str,) if fs.vocab is not None else kinds
+
+    @classmethod
+    def _has_kinds(cls, value: FieldValue, kinds: Tuple[type, ...]) -> bool:
+        if cls._is_leaf(value):
+            return isinstance(value, kinds)
+        return all(cls._has_kinds(v, kinds) for v in value)  # type: ignore
+
+    @classmethod
+    def _has_depth(cls, value: FieldValue, depth: int) -> bool:
+        if cls._is_leaf(value):
+            return depth == 0
+        return depth > 0 and all(cls._has_depth(v, depth - 1) for v in value)  # type: ignore
+
+    @staticmethod
+    def _is_leaf(value: FieldValue) -> bool:
+        return isinstance(value, str) or not isinstance(value, Sequence)
+
+    @staticmethod
+    def _get_dtype(values: Sequence[FieldValue]) -> Optional[str]:
+        if not values:
+            return None
+        if all(isinstance(v, bool) for v in values):
+            return "bool"
+        if all(isinstance(v, Integral) for v in values):
+            return "int64"
+        if all(isinstance(v, Real) for v in values):
+            return "float64"
+        return None
@@ -0,0 +1,216 @@
+# Copyright 2019 Kemal Kurniawan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import os
+
+from .samples import Sample
+from .vocab import Vocab
+
+
+class ShardIterator(Iterable[Sample]):
+    """Iterator that reads and parses samples from many shard files concurrently.
+
+    Every shard is a text file with one sample per line, read in chunks of ``chunk_size``
+    lines. Chunks are read and parsed in a pool of workers, which can also convert the
+    samples with ``vocab``, while the samples of earlier chunks are being consumed. Chunks
+    are interleaved deterministically: up to ``cycle_length`` shards are read at a time,
+    taking turns to produce one chunk each, and when a shard is exhausted, the next unread
+    shard takes its place. So the samples come out in the same order however long the
+    workers take. Blank lines are skipped.
+
+    The iteration state can be saved with `~ShardIterator.state_dict` and restored with
+    `~ShardIterator.load_state_dict`, after which the next iteration resumes where the
+    saved one left off. The state holds the byte offset of each shard's current chunk, so
+    resuming does not read the shards from the start. Any other iteration starts from
+    scratch, even if the previous one was stopped early.
+
+    Example:
+
+        >>> import json, os, tempfile
+        >>> from text2array import ShardIterator
+        >>> tmpdir = tempfile.mkdtemp()
+        >>> paths = [os.path.join(tmpdir, f'{i}.jsonl') for i in range(2)]
+        >>> for i, path in enumerate(paths):
+        ...   with open(path, 'w') as f:
+        ...     for j in range(3):
+        ...       print(json.dumps({'id': f'{i}-{j}'}), file=f)
+        ...
+        >>> iter_ = ShardIterator(paths, chunk_size=2)
+        >>> [s['id'] for s in iter_]
+        ['0-0', '0-1', '1-0', '1-1', '0-2', '1-2']
+
+    Args:
+        paths: Paths to the shard files.
+        parse (typing.Callable[[str], Sample]): Callable to parse a line (without the
+            trailing newline) into a sample. For example, TSV lines can be parsed with
+            ``lambda line: dict(zip(names, line.split('\\t')))``. If not given, every line
+            is parsed as JSON.
+        vocab: Vocabulary to convert the samples with in the workers, as in `Vocab.stoi`.
+            It is sent along with every chunk, which is free for threads but means pickling
+            it for every chunk in a process pool. With a process pool and a large
+            vocabulary, leave this out and convert the produced samples with `Vocab.stoi`
+            instead.
+        chunk_size: Number of lines in each chunk.
+        cycle_length: Number of shards read at a time. If not given, all shards are.
+        num_workers: Number of worker threads. Ignored if ``executor`` is given.
+        executor: Executor to read chunks in, e.g. a `~concurrent.futures.ProcessPoolExecutor`
+            when parsing is the bottleneck, in which case ``parse`` must be picklable. If
+            not given, a new thread pool is created on every iteration.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        parse: Optional[Callable[[str], Sample]] = None,
+        vocab: Optional[Vocab] = None,
+        chunk_size: int = 1000,
+        cycle_length: Optional[int] = None,
+        num_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk size must be greater than 0")
+        if cycle_length is not None and cycle_length <= 0:
+            raise ValueError("cycle length must be greater than 0")
+        if num_workers is not None and num_workers <= 0:
+            raise ValueError("number of workers must be greater than 0")
+        if parse is None:
+            parse = json.loads
+        if cycle_length is None:
+            cycle_length = max(len(paths), 1)
+
+        self._paths = list(paths)
+        self._parse = parse
+        self._vocab = vocab
+        self._chunk_size = chunk_size
+        self._cycle_length = cycle_length
+        self._nworkers = num_workers
+        self._executor = executor
+        # Per shard, the byte offset of the current chunk and the number of its samples
+        # already produced
+        self._offsets: List[Tuple[int, int]]
+        self._reset()
+
+    def __iter__(self) -> Iterator[Sample]:
+        if self._executor is not None:
+            yield from self._iter_samples(self._executor)
+            return
+        with ThreadPoolExecutor(self._nworkers) as executor:
+            yield from self._iter_samples(executor)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Get the current iteration state.
+
+        Returns:
+            A dictionary that can be passed to `~ShardIterator.load_state_dict`.
+        """
+        return {
+            "offsets": [list(x) for x in self._offsets],
+            "slots": list(self._slots),
+            "next_shard": self._next_shard,
+            "turn": self._turn,
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restore an iteration state.
+
+        Args:
+            state: Iteration state as returned by `~ShardIterator.state_dict`.
+        """
+        if len(state["offsets"]) != len(self._paths):
+            raise ValueError("state does not match the number of shards")
+        self._offsets = [(offset, n) for offset, n in state["offsets"]]
+        self._slots = list(state["slots"])
+        self._next_shard = state["next_shard"]
+        self._turn = state["turn"]
+        self._resume = True
+
+    def _reset(self) -> None:
+        self._offsets = [(0, 0)] * len(self._paths)
+        self._slots = list(range(min(self._cycle_length, len(self._paths))))
+        self._next_shard = len(self._slots)
+        self._turn = 0
+        self._resume = False
+
+    def _iter_samples(self, executor: Executor) -> Iterator[Sample]:
+        if not self._resume:
+            self._reset()
+        self._resume = False
+
+        pending: Dict[int, Future] = {}
+        try:
+            while self._slots:
+                for i in self._slots:
+                    if i not in pending:
+                        pending[i] = self._submit(executor, i, self._offsets[i][0])
+
+                self._turn %= len(self._slots)
+                i = self._slots[self._turn]
+                samples, end, eof = pending.pop(i).result()
+                start, nskip = self._offsets[i]
+                for j in range(nskip, len(samples)):
+                    self._offsets[i] = (start, j + 1)
+                    yield samples[j]
+
+                self._offsets[i] = (end, 0)
+                if not eof:
+                    # Read ahead while the other shards take their turns
+                    pending[i] = self._submit(executor, i, end)
+                    self._turn += 1
+                elif self._next_shard < len(self._paths):
+                    self._slots[self._turn] = self._next_shard
+                    self._next_shard += 1
+                    self._turn += 1
+                else:
+                    del self._slots[self._turn]
+        finally:
+            for fut in pending.values():
+                fut.cancel()
+
+        self._reset()
+
+    def _submit(self, executor: Executor, i: int, offset: int) -> Future:
+        return executor.submit(
+            _read_chunk, self._paths[i], offset, self._chunk_size, self._parse, self._vocab
+        )
+
+
+def _read_chunk(
+    path: str,
+    offset: int,
+    chunk_size: int,
+    parse: Callable[[str], Sample],
+    vocab: Optional[Vocab] = None,
+) -> Tuple[List[Sample], int, bool]:
+    samples = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        nlines = 0
+        while nlines < chunk_size:
+            line = f.readline()
+            if not line:
+                break
+            nlines += 1
+            text = line.decode("utf8").rstrip("\r\n")
+            if text.strip():
+                samples.append(parse(text))
+        end = f.tell()
+        eof = nlines < chunk_size or end >= os.fstat(f.fileno()).st_size
+
+    if vocab is not None:
+        samples = list(vocab.stoi(samples))
+    return samples, end, eof
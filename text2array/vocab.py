@@ -12,31 +12,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import Counter, UserDict, defaultdict
+from collections import Counter, OrderedDict, UserDict, defaultdict
 from typing import (
+    Any,
     Counter as CounterT,
     Dict,
+    Hashable,
     Iterable,
     Iterator,
+    List,
     Mapping,
     MutableMapping,
+    NamedTuple,
     Optional,
     Sequence,
     Set,
+    Tuple,
+    TYPE_CHECKING,
 )
+import threading
 
 from ordered_set import OrderedSet  # type: ignore
-from tqdm import tqdm  # type: ignore
 
+from .profiling import _active as _profilers, _span
 from .samples import FieldName, FieldValue, Sample
 
+if TYPE_CHECKING:  # pragma: no cover
+    from tqdm import tqdm  # type: ignore
+    import numpy as np  # type: ignore
+
 
 class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
-    """A dictionary from field names to `StringStore` objects as the field's vocabulary."""
+    """A dictionary from field names to `StringStore` objects as the field's vocabulary.
+
+    Several fields can share one vocabulary by mapping to the same `StringStore` object,
+    e.g. with the ``share`` option of `~Vocab.from_samples`. Such fields are converted
+    with one table, and pickling a vocabulary preserves the sharing.
+    """
 
     PAD_TOKEN = "<pad>"
     UNK_TOKEN = "<unk>"
 
+    _cache: Optional["_StoiCache"] = None
+
     def __getitem__(self, name: FieldName) -> "StringStore":
         try:
             return super().__getitem__(name)
@@ -59,6 +77,66 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
         """
         return map(self._apply_to_sample, samples)
 
+    @property
+    def sizes(self) -> Dict[FieldName, int]:
+        """Mapping from field names to the sizes of their vocabularies."""
+        return {name: len(store) for name, store in self.items()}
+
+    @property
+    def shared(self) -> List[List[FieldName]]:
+        """Groups of field names sharing a `StringStore`, in order of first occurrence.
+
+        Fields with a vocabulary of their own are not included.
+        """
+        groups: Dict[int, List[FieldName]] = {}
+        for name, store in self.items():
+            groups.setdefault(id(store), []).append(name)
+        return [g for g in groups.values() if len(g) > 1]
+
+    @property
+    def dtypes(self) -> Dict[FieldName, str]:
+        """Mapping from field names to the data types of their indices.
+
+        See `StringStore.dtype`, including which conversions use them.
+        """
+        return {name: store.dtype for name, store in self.items()}
+
+    def enable_cache(self, maxsize: int = 4096) -> None:
+        """Cache the conversions done by `~Vocab.stoi`.
+
+        Two least-recently-used caches are kept, each holding up to ``maxsize`` entries:
+        one from whole field values (strings or sequences of strings) to their
+        conversions, and one from single tokens to their integers. So field values and
+        tokens that occur over and over, e.g. in inference requests, are converted only
+        once. Fields sharing a `StringStore` share their entries. The caches are cleared
+        whenever a `StringStore` of this vocabulary is replaced or modified, including
+        changes to its default. They can be used by `~Vocab.stoi` from several threads.
+
+        Args:
+            maxsize: Maximum number of entries in each cache.
+        """
+        if maxsize <= 0:
+            raise ValueError("max size must be greater than 0")
+        self._cache = _StoiCache(maxsize)
+
+    def disable_cache(self) -> None:
+        """Stop caching the conversions done by `~Vocab.stoi` and drop the caches."""
+        self._cache = None
+
+    def cache_info(self) -> "StoiCacheInfo":
+        """Get the statistics of the caches set up by `~Vocab.enable_cache`.
+
+        Returns:
+            StoiCacheInfo: The statistics, all zero if caching is disabled.
+        """
+        c = self._cache
+        if c is None:
+            return StoiCacheInfo(0, 0, 0, 0, 0)
+        with c.lock:
+            return StoiCacheInfo(
+                c.value_hits, c.value_misses, c.token_hits, c.token_misses, c.maxsize
+            )
+
     def itos(self, samples: Iterable[Sample]) -> Iterable[Sample]:
         """Convert integers in the given samples to strings according to this vocabulary.
 
@@ -72,12 +150,92 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
         """
         return map(lambda s: self._apply_to_sample(s, index=False), samples)
 
+    def decode(self, arr: Mapping[FieldName, "np.ndarray"]) -> List[Sample]:
+        """Convert arrays of integers back to samples of strings according to this vocabulary.
+
+        This method is essentially the inverse of `~Vocab.stoi` followed by
+        `Batch.to_array`, and accepts e.g. the predictions of a model. Every field in the
+        vocabulary is converted by indexing an array of its strings with the whole field
+        array at once. Padding is then stripped from sequential fields using the field's
+        lengths (``name_len1``, ..., ``name_lenk``) or mask (``name_mask``) if given, named
+        like in the output of `Batch.to_array`. Otherwise, trailing entries equal to the
+        index of `Vocab.PAD_TOKEN` are stripped, if the field's store has it. Fields not
+        in the vocabulary are stripped the same way, except that they have no padding
+        index.
+
+        Example:
+
+            >>> import numpy as np
+            >>> from text2array import StringStore, Vocab
+            >>> vocab = Vocab({'ws': StringStore(['<pad>', 'a', 'b'])})
+            >>> vocab.decode({'ws': np.array([[1, 2, 1], [2, 0, 0]])})
+            [{'ws': ['a', 'b', 'a']}, {'ws': ['b']}]
+
+        Args:
+            arr: Mapping from field names to arrays whose first dimension is the batch
+                size, plus lengths and masks of the fields, if any.
+
+        Returns:
+            ~typing.List[Sample]: Converted samples.
+        """
+        with _span("decode") as span:
+            samples = self._decode(arr)
+            span.samples = len(samples)
+        return samples
+
+    def _decode(self, arr: Mapping[FieldName, "np.ndarray"]) -> List[Sample]:
+        import numpy as np  # type: ignore
+
+        extras = set()
+        for name, a in arr.items():
+            extras.add(f"{name}_mask")
+            extras.update(f"{name}_len{d}" for d in range(1, a.ndim))
+        names = [name for name in arr if name not in extras]
+
+        columns = []
+        tables: Dict[int, np.ndarray] = {}
+        for name in names:
+            a = np.asarray(arr[name])
+            store = self.get(name)
+            if store is None:
+                values = a
+            else:
+                # Fields sharing a store share its table too
+                if id(store) not in tables:
+                    tables[id(store)] = np.array(list(store), dtype=object)
+                values = tables[id(store)][a]
+            if a.ndim == 1:
+                columns.append(values.tolist())
+                continue
+
+            if all(f"{name}_len{d}" in arr for d in range(1, a.ndim)):
+                lens = [np.asarray(arr[f"{name}_len{d}"]) for d in range(1, a.ndim)]
+            else:
+                if f"{name}_mask" in arr:
+                    nonpad = np.asarray(arr[f"{name}_mask"], dtype=bool)
+                elif store is not None and self.PAD_TOKEN in store:
+                    nonpad = a != store.index(self.PAD_TOKEN)
+                else:
+                    nonpad = np.ones(a.shape, dtype=bool)
+                # Innermost lengths first, then each level from the one below
+                lens = [self._trailing_len(nonpad)]
+                for _ in range(a.ndim - 2):
+                    lens.append(self._trailing_len(lens[-1] > 0))
+                lens.reverse()
+
+            lens_ = [ls.tolist() for ls in lens]
+            columns.append(
+                [self._trim(x, [ls[i] for ls in lens_]) for i, x in enumerate(values.tolist())]
+            )
+
+        return [dict(zip(names, vs)) for vs in zip(*columns)]
+
     @classmethod
     def from_samples(
         cls,
         samples: Iterable[Sample],
         options: Optional[Mapping[FieldName, dict]] = None,
-        pbar: Optional[tqdm] = None,
+        pbar: Optional["tqdm"] = None,
     ) -> "Vocab":
         """Make an instance of this class from an iterable of samples.
 
@@ -85,10 +243,15 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
         sequence of string tokens. It is important that ``samples`` be a true iterable, i.e.
         it can be iterated more than once. No exception is raised when this is violated.
 
+        The tokens of every vocabulary are guaranteed to be ordered by decreasing frequency
+        after the padding and unknown tokens, with ties broken by first occurrence. So
+        token indices can be used as frequency ranks, e.g. to partition the vocabulary for
+        an adaptive softmax.
+
         Args:
             samples (~typing.Iterable[Sample]): Iterable of samples.
             pbar: Instance of `tqdm <https://pypi.org/project/tqdm>`_ for displaying
-                a progress bar.
+                a progress bar. If not given, tqdm is imported to create one.
             options: Mapping from field names to dictionaries to control the creation of
                 the vocabularies. Recognized dictionary keys are:
 
@@ -109,23 +272,46 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
                   most, only this number of most frequent tokens are included in the
                   vocabulary. Note that ``min_count`` also sets the maximum size implicitly.
                   So, the size is limited by whichever is smaller. (default: ``None``).
+                * ``share`` (`str`): Name of another field to share the vocabulary with.
+                  The tokens of both fields are counted together into one `StringStore`,
+                  which both field names then map to. The other options of this field are
+                  ignored in favor of those of the named field (default: ``None``).
+
+        Example:
+
+            >>> from text2array import Vocab
+            >>> samples = [{'src': ['a', 'b'], 'tgt': ['b', 'c']}]
+            >>> vocab = Vocab.from_samples(samples, options={'tgt': {'share': 'src'}})
+            >>> vocab['tgt'] is vocab['src']
+            True
+            >>> list(vocab['src'])
+            ['<pad>', '<unk>', 'b', 'a', 'c']
 
         Returns:
             Vocab: Vocabulary instance.
         """
         if pbar is None:  # pragma: no cover
+            from tqdm import tqdm  # type: ignore
+
             pbar = tqdm(samples, desc="Counting", unit="sample")
         if options is None:
             options = {}
 
+        # Fields sharing a vocabulary are counted under the name of the field they share it
+        # with, and so are treated as a single field from then on
+        roots = {name: cls._get_share_root(name, options) for name in options}
+        members: Dict[FieldName, List[FieldName]] = defaultdict(list)
         counter: Dict[FieldName, CounterT[str]] = defaultdict(Counter)
         seqfield: Set[FieldName] = set()
         for s in samples:
             for name, value in s.items():
+                root = roots.get(name, name)
                 if cls._needs_vocab(value):
-                    counter[name].update(cls._flatten(value))
+                    if name not in members[root]:
+                        members[root].append(name)
+                    counter[root].update(cls._flatten(value))
                 if isinstance(value, Sequence) and not isinstance(value, str):
-                    seqfield.add(name)
+                    seqfield.add(root)
             pbar.update()
         pbar.close()
 
@@ -147,14 +333,95 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
             min_count = opts.get("min_count", 1)
             max_size = opts.get("max_size")
             n = len(store)
-            for tok, freq in c.most_common():
+            # sorted is stable, so ties keep the order of first occurrence
+            for tok, freq in sorted(c.items(), key=lambda x: -x[1]):
                 if freq < min_count or (max_size is not None and len(store) - n >= max_size):
                     break
                 store.add(tok)
-            m[name] = store
+            for member in members[name]:
+                m[member] = store
 
         return cls(m)
 
+    @staticmethod
+    def _get_share_root(name: FieldName, options: Mapping[FieldName, dict]) -> FieldName:
+        seen = {name}
+        while options.get(name, {}).get("share") is not None:
+            name = options[name]["share"]
+            if name in seen:
+                raise ValueError(f"field '{name}' shares its vocabulary in a cycle")
+            seen.add(name)
+        return name
+
+    def prune(
+        self,
+        options: Optional[Mapping[FieldName, dict]] = None,
+        counts: Optional[Mapping[FieldName, Mapping[str, int]]] = None,
+    ) -> Tuple["Vocab", Dict[FieldName, "np.ndarray"]]:
+        """Make a smaller vocabulary by dropping rare tokens.
+
+        This is done with `StringStore.prune` for every field, always keeping
+        `Vocab.PAD_TOKEN` and `Vocab.UNK_TOKEN`. A store shared by several fields is pruned
+        once, with the options and counts of the first of them, and the fields share the
+        smaller store and the mapping. Samples and arrays converted with this
+        vocabulary can then be converted to the smaller one with `Vocab.remap` instead of
+        converting the original samples again.
+
+        Example:
+
+            >>> from text2array import StringStore, Vocab
+            >>> vocab = Vocab({'ws': StringStore(['<pad>', '<unk>', 'a', 'b', 'c'])})
+            >>> new_vocab, mappings = vocab.prune({'ws': {'max_size': 1}})
+            >>> new_vocab['ws']
+            StringStore(['<pad>', '<unk>', 'a'], default=None)
+            >>> mappings['ws'].tolist()
+            [0, 1, 2, -1, -1]
+
+        Args:
+            options: Mapping from field names to dictionaries of keyword arguments of
+                `StringStore.prune`, such as ``max_size`` and ``min_count``. Fields whose
+                name is not in the mapping are kept as they are.
+            counts: Mapping from field names to the counts of their tokens, required for
+                fields with ``min_count`` in ``options``.
+
+        Returns:
+            The smaller vocabulary and a mapping from field names to arrays mapping old
+            indices to new ones.
+        """
+        if options is None:
+            options = {}
+        if counts is None:
+            counts = {}
+
+        m, mappings = {}, {}
+        pruned: Dict[int, Tuple[StringStore, np.ndarray]] = {}
+        for name, store in self.items():
+            if id(store) not in pruned:
+                opts = dict(options.get(name, {}))
+                opts["keep"] = [*opts.get("keep", []), self.PAD_TOKEN, self.UNK_TOKEN]
+                pruned[id(store)] = store.prune(counts=counts.get(name), **opts)
+            m[name], mappings[name] = pruned[id(store)]
+
+        return type(self)(m), mappings
+
+    @staticmethod
+    def remap(
+        arr: MutableMapping[FieldName, "np.ndarray"], mappings: Mapping[FieldName, "np.ndarray"]
+    ) -> None:
+        """Convert arrays of indices of some fields in place using the given mappings.
+
+        See `StringStore.remap`.
+
+        Args:
+            arr: Mapping from field names to arrays of indices, e.g. as returned by
+                `Batch.to_array`. Fields whose name is not in ``mappings`` are left as is.
+            mappings: Mapping from field names to arrays mapping old indices to new ones,
+                as returned by `~Vocab.prune`.
+        """
+        for name, mapping in mappings.items():
+            if name in arr:
+                StringStore.remap(arr[name], mapping)
+
     def extend(
         self, samples: Iterable[Sample], fields: Optional[Iterable[FieldName]] = None,
     ) -> None:
@@ -176,6 +443,26 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
                     val = [val]
                 store.update(val)
 
+    @staticmethod
+    def _trailing_len(nonpad: "np.ndarray") -> "np.ndarray":
+        # Length of every sequence along the last axis without its trailing padding
+        import numpy as np
+
+        n = nonpad.shape[-1]
+        if n == 0:
+            return np.zeros(nonpad.shape[:-1], dtype=int)
+        last = n - np.argmax(nonpad[..., ::-1], axis=-1)
+        return np.where(nonpad.any(axis=-1), last, 0)
+
+    @classmethod
+    def _trim(cls, values: list, lens: List[Any]) -> list:
+        # lens holds the length of values, then the lengths of its elements, and so on
+        n, *rest = lens
+        values = values[:n]
+        if not rest:
+            return values
+        return [cls._trim(v, [ls[j] for ls in rest]) for j, v in enumerate(values)]
+
     @classmethod
     def _needs_vocab(cls, val: FieldValue) -> bool:
         if isinstance(val, str):
@@ -195,6 +482,18 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
             yield from cls._flatten(x)
 
     def _apply_to_sample(self, sample: Sample, index: bool = True) -> Sample:
+        if index and _profilers:
+            # Tokens are counted outside the stage so as not to inflate its time
+            tokens = sum(self._count_strings(v) for name, v in sample.items() if name in self)
+            with _span("stoi") as span:
+                res = self._convert_sample(sample, index)
+                span.samples, span.tokens = 1, tokens
+            return res
+        return self._convert_sample(sample, index)
+
+    def _convert_sample(self, sample: Sample, index: bool) -> Sample:
+        if index and self._cache is not None:
+            return self._cache.index_sample(self, sample)
         fn = self._index_value if index else self._get_value
         s = {}
         for name, value in sample.items():
@@ -206,6 +505,14 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
                 s[name] = fn(store, value)
         return s
 
+    @classmethod
+    def _count_strings(cls, value: FieldValue) -> int:
+        if isinstance(value, str):
+            return 1
+        if isinstance(value, Sequence):
+            return sum(cls._count_strings(v) for v in value)
+        return 0
+
     @classmethod
     def _index_value(cls, store: "StringStore", value: FieldValue) -> FieldValue:
         if isinstance(value, str):
@@ -225,6 +532,119 @@ class Vocab(UserDict, MutableMapping[FieldName, "StringStore"]):
         return [cls._get_value(store, v) for v in value]
 
 
+class StoiCacheInfo(NamedTuple):
+    """Statistics of the caches of `Vocab.stoi`.
+
+    Attributes:
+        value_hits: Number of field values found in the cache.
+        value_misses: Number of cacheable field values not found in the cache.
+        token_hits: Number of tokens found in the cache.
+        token_misses: Number of tokens not found in the cache.
+        maxsize: Maximum number of entries in each cache.
+    """
+
+    value_hits: int
+    value_misses: int
+    token_hits: int
+    token_misses: int
+    maxsize: int
+
+
+class _StoiCache:
+    # Entries are keyed by the identity of the store rather than the field name, so fields
+    # sharing a store share their entries
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.values: "OrderedDict[Tuple[int, Hashable], Any]" = OrderedDict()
+        self.tokens: "OrderedDict[Tuple[int, str], int]" = OrderedDict()
+        self.value_hits = self.value_misses = self.token_hits = self.token_misses = 0
+        # Every store and its version when its entries were cached; keeping the store alive
+        # also keeps its identity from being reused
+        self._states: Dict[int, Tuple["StringStore", int]] = {}
+        # The caches are reordered even on hits, so every access must hold the lock
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        # Pickled and copied empty, since locks cannot be pickled and the entries are keyed
+        # by the identities of the stores
+        return (self.__class__, (self.maxsize,))
+
+    def index_sample(self, vocab: Vocab, sample: Sample) -> Sample:
+        s = {}
+        with self.lock:
+            for name, value in sample.items():
+                try:
+                    store = vocab[name]
+                except KeyError:
+                    s[name] = value
+                    continue
+                state = self._states.get(id(store))
+                if state is None or state[1] != store._version:
+                    self._invalidate(vocab, store)
+                s[name] = self.index(store, value)
+        return s
+
+    def index(self, store: "StringStore", value: FieldValue) -> FieldValue:
+        key = self._get_key(value)
+        if key is None:
+            return self._index(store, value)
+
+        k = (id(store), key)
+        try:
+            res = self.values[k]
+        except KeyError:
+            self.value_misses += 1
+        else:
+            self.value_hits += 1
+            self.values.move_to_end(k)
+            return list(res) if isinstance(res, tuple) else res
+
+        res = self._index(store, value)
+        self.values[k] = tuple(res) if isinstance(res, list) else res
+        if len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+        return res
+
+    def _index(self, store: "StringStore", value: FieldValue) -> FieldValue:
+        if isinstance(value, str):
+            k = (id(store), value)
+            try:
+                i = self.tokens[k]
+            except KeyError:
+                self.token_misses += 1
+            else:
+                self.token_hits += 1
+                self.tokens.move_to_end(k)
+                return i
+            i = self.tokens[k] = store.index(value)
+            if len(self.tokens) > self.maxsize:
+                self.tokens.popitem(last=False)
+            return i
+        if not isinstance(value, Sequence):
+            return value
+        return [self._index(store, v) for v in value]
+
+    def _invalidate(self, vocab: Vocab, store: "StringStore") -> None:
+        # Drop the entries of the store, and forget the stores no longer in the vocabulary
+        current = {id(st) for st in vocab.values()}
+        ids = {id(store)} | {i for i in self._states if i not in current}
+        for od in (self.values, self.tokens):
+            for k in [k for k in od if k[0] in ids]:
+                del od[k]  # type: ignore
+        for i in ids:
+            self._states.pop(i, None)
+        self._states[id(store)] = (store, store._version)
+
+    @staticmethod
+    def _get_key(value: FieldValue) -> Optional[Hashable]:
+        # Only strings and flat sequences of strings are cached as whole values
+        if isinstance(value, str):
+            return value
+        if isinstance(value, Sequence) and all(isinstance(v, str) for v in value):
+            return tuple(value)
+        return None
+
+
 class StringStore(OrderedSet):
     """An ordered set of strings, with an optional default value for unknown strings.
 
@@ -256,12 +676,151 @@ class StringStore(OrderedSet):
             do not exist in the store.
     """
 
+    # Incremented on every modification, so caches can tell when they are stale
+    _version = 0
+
     def __init__(
         self, initial: Optional[Sequence[str]] = None, default: Optional[str] = None,
     ) -> None:
         super().__init__(initial)
         self.default = default
 
+    @property
+    def default(self) -> Optional[str]:
+        return self._default
+
+    @default.setter
+    def default(self, value: Optional[str]) -> None:
+        self._default = value
+        self._version += 1
+
+    def add(self, key: str) -> int:
+        if key not in self.map:
+            self._version += 1
+        return super().add(key)
+
+    append = add
+
+    def pop(self) -> str:
+        self._version += 1
+        return super().pop()
+
+    def discard(self, key: str) -> None:
+        if key in self.map:
+            self._version += 1
+        super().discard(key)
+
+    def clear(self) -> None:
+        self._version += 1
+        super().clear()
+
+    def _update_items(self, items: List[str]) -> None:
+        self._version += 1
+        super()._update_items(items)
+
+    @property
+    def dtype(self) -> str:
+        """Smallest NumPy integer data type that can hold every index of this store.
+
+        It is one of ``uint16``, ``int32``, and ``int64``. Arrays of indices with this data
+        type need a half or a quarter of the memory of the ``int64`` that NumPy picks by
+        default. Note that adding strings to the store may change it.
+
+        Note:
+            Only `Batch.to_array` given a `Schema` made with ``vocab`` (see
+            `Schema.from_samples`) and `ParquetIterator` emit indices with this data type.
+            Otherwise, e.g. in ``Batch(vocab.stoi(samples)).to_array()``, they are still
+            ``int64``, since the batch does not know which fields hold indices.
+        """
+        n = len(self)
+        if n <= 2 ** 16:
+            return "uint16"
+        if n <= 2 ** 31:
+            return "int32"
+        return "int64"
+
+    def prune(
+        self,
+        max_size: Optional[int] = None,
+        min_count: int = 1,
+        counts: Optional[Mapping[str, int]] = None,
+        keep: Iterable[str] = (),
+    ) -> Tuple["StringStore", "np.ndarray"]:
+        """Make a smaller store by dropping strings.
+
+        Strings are dropped if they occur fewer than ``min_count`` times, and beyond the
+        first ``max_size`` strings. Since stores made by `Vocab.from_samples` are ordered
+        by frequency, the latter keeps the most frequent ones. The default string and the
+        strings in ``keep`` are always kept and not counted towards ``max_size``. The kept
+        strings stay in the same order.
+
+        Args:
+            max_size: Maximum number of strings kept, excluding the default string and
+                those in ``keep``. If not given, there is no limit.
+            min_count: Minimum number of occurrences of a kept string.
+            counts: Mapping from strings to their number of occurrences. Required if
+                ``min_count`` is greater than 1.
+            keep: Strings to always keep, if they are in the store.
+
+        Returns:
+            The new store and an array mapping every old index to its new index. Indices
+            of dropped strings are mapped to the new index of the default string, or -1
+            if there is none.
+        """
+        import numpy as np  # type: ignore
+
+        if max_size is not None and max_size < 0:
+            raise ValueError("max size cannot be less than 0")
+        if min_count > 1 and counts is None:
+            raise ValueError("counts must be given if min_count is greater than 1")
+
+        always = set(keep)
+        if self.default is not None:
+            always.add(self.default)
+
+        kept = []
+        n = 0
+        for x in self:
+            if x in always:
+                kept.append(x)
+            elif (max_size is None or n < max_size) and (
+                counts is None or counts.get(x, 0) >= min_count
+            ):
+                kept.append(x)
+                n += 1
+
+        store = type(self)(kept, default=self.default)
+        fallback = -1 if self.default is None else store.index(self.default)
+        mapping = np.full(len(self), fallback, dtype=np.int64)
+        mapping[[self.index(x) for x in kept]] = np.arange(len(kept))
+        return store, mapping
+
+    @staticmethod
+    def remap(arr: "np.ndarray", mapping: "np.ndarray", chunk_size: int = 2 ** 20) -> None:
+        """Convert an array of indices in place using the given mapping.
+
+        This is done with `numpy.take` on chunks of ``chunk_size`` entries, so it also
+        works on large memory-mapped arrays (`numpy.memmap`) without loading them at once.
+        Note that indices mapped to -1 wrap around in arrays of unsigned data types.
+
+        Args:
+            arr: Array of indices to convert. Must be C-contiguous.
+            mapping: Array mapping old indices to new ones, as returned by
+                `~StringStore.prune`.
+            chunk_size: Number of entries converted at a time.
+        """
+        import numpy as np
+
+        if chunk_size <= 0:
+            raise ValueError("chunk size must be greater than 0")
+        if not arr.flags.c_contiguous:
+            raise ValueError("array must be C-contiguous")
+
+        flat = arr.reshape(-1)
+        for i in range(0, flat.size, chunk_size):
+            chunk = flat[i : i + chunk_size]
+            np.take(mapping, chunk, out=chunk)
+
     def index(self, s: str) -> int:
         try:
             return super().index(s)